@@ -0,0 +1,43 @@
+# Generated manually to add subtotal field to DetalleCompra
+
+from django.db import migrations, models
+from decimal import Decimal
+
+
+def calcular_subtotal_existente(apps, schema_editor):
+    """Calcula el subtotal para los registros existentes"""
+    DetalleCompra = apps.get_model('compras', 'DetalleCompra')
+    for detalle in DetalleCompra.objects.all():
+        detalle.subtotal = Decimal(str(detalle.cantidad)) * Decimal(str(detalle.costo_unitario))
+        detalle.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('compras', '0003_alter_compra_proveedor'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='detallecompra',
+            name='subtotal',
+            field=models.DecimalField(
+                decimal_places=2,
+                max_digits=12,
+                null=True,  # Temporalmente nullable para permitir la migración
+                blank=True
+            ),
+        ),
+        migrations.RunPython(calcular_subtotal_existente, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='detallecompra',
+            name='subtotal',
+            field=models.DecimalField(
+                decimal_places=2,
+                max_digits=12,
+                null=False,
+                blank=False
+            ),
+        ),
+    ]
@@ -1,12 +1,16 @@
 from rest_framework import serializers
 from django.db import transaction
 from decimal import Decimal
+from erp_minimarket.campos import CamposDinamicosSerializerMixin
+from inventario.models import Producto
+from inventario.serializers import ProductoEnLoteField
 from .models import Compra, DetalleCompra
 
 
 class DetalleCompraSerializer(serializers.ModelSerializer):
     producto_nombre = serializers.CharField(source='producto.nombre', read_only=True)
     producto_codigo = serializers.CharField(source='producto.codigo', read_only=True)
+    producto = ProductoEnLoteField(queryset=Producto.objects.all())
     cantidad = serializers.IntegerField(required=False, default=1)
     costo_unitario = serializers.DecimalField(max_digits=10, decimal_places=2, required=False, default=1)
 
@@ -29,11 +33,16 @@ class DetalleCompraSerializer(serializers.ModelSerializer):
         return super().to_internal_value(data)
 
 
-class CompraSerializer(serializers.ModelSerializer):
+class CompraSerializer(CamposDinamicosSerializerMixin, serializers.ModelSerializer):
     items = DetalleCompraSerializer(many=True, read_only=True)
     proveedor_nombre = serializers.CharField(source='proveedor.nombre', read_only=True)
     total_calculado = serializers.SerializerMethodField()
 
+    perfiles = {
+        'compacto': ['id', 'numero_factura', 'fecha', 'proveedor', 'proveedor_nombre', 'total', 'usuario'],
+    }
+    columnas_campos = {'items': ('items__producto',), 'total_calculado': ('items',)}
+
     class Meta:
         model = Compra
         fields = '__all__'
@@ -162,43 +171,31 @@ class CrearCompraSerializer(serializers.ModelSerializer):
         return compra
 
     def update(self, instance, validated_data):
-        """Actualizar una compra existente"""
+        """
+        Actualizar una compra existente: revierte las líneas anteriores y aplica las
+        nuevas, cada paso con un número constante de consultas.
+        """
         items_data = validated_data.pop('items', None)
         usuario = self.context['request'].user.username if self.context['request'].user.is_authenticated else 'Sistema'
         
         with transaction.atomic():
-            # Revertir los cambios de stock de la compra original
-            for detalle in instance.items.all():
-                producto = detalle.producto
-                stock_actual = producto.stock_actual
-                stock_nuevo = stock_actual - detalle.cantidad
-                
-                # Validar que no quede stock negativo
-                if stock_nuevo < 0:
-                    raise serializers.ValidationError(
-                        f'No se puede revertir la compra. El producto {producto.nombre} '
-                        f'tendría stock negativo ({stock_nuevo}).'
-                    )
-                
-                # Revertir stock
-                producto.stock_actual = stock_nuevo
-                
-                # Revertir costo (simplificado - en producción podría necesitar un historial de costos)
-                # Por ahora, mantenemos el costo actual
-                
-                producto.save()
-                
-                # Registrar movimiento de reversión
-                from inventario.models import MovimientoStock
-                MovimientoStock.objects.create(
-                    producto=producto,
-                    tipo='AJUSTE',
-                    cantidad=-detalle.cantidad,
-                    stock_anterior=stock_actual,
-                    stock_nuevo=stock_nuevo,
+            # Revertir los cambios de stock de la compra original en bloque
+            # (el costo promedio se mantiene; no existe historial de costos)
+            from inventario.servicios import (
+                aplicar_deltas_stock, deltas_de_detalles, StockInsuficienteError
+            )
+
+            try:
+                aplicar_deltas_stock(
+                    deltas_de_detalles(instance.items.all(), signo=-1),
                     motivo=f'Reversión de Compra #{instance.id}',
                     usuario=usuario
                 )
+            except StockInsuficienteError as e:
+                raise serializers.ValidationError(
+                    f'No se puede revertir la compra. El producto {e.producto_nombre} '
+                    f'tendría stock negativo ({e.stock_resultante}).'
+                )
             
             # Eliminar detalles antiguos
             instance.items.all().delete()
@@ -225,60 +222,55 @@ class CrearCompraSerializer(serializers.ModelSerializer):
             instance.usuario = usuario
             instance.save()
             
-            # Crear nuevos detalles
-            total = 0
+            # Crear nuevos detalles y aplicar la entrada de stock en bloque
+            # (un movimiento por producto; el costo queda en el promedio ponderado)
             if items_data:
-                from inventario.models import Producto
-                
+                productos = Producto.objects.in_bulk([item_data['producto'] for item_data in items_data])
+                detalles, deltas, costos = [], {}, {}
+                total = Decimal('0.00')
+
                 for item_data in items_data:
-                    # Obtener el ID del producto (puede venir como objeto o como ID)
-                    producto_id = item_data['producto']
-                    
-                    # Si es un objeto Producto, extraer el ID
-                    if hasattr(producto_id, 'id'):
-                        producto_id = producto_id.id
-                    # Si es un diccionario, extraer el ID
-                    elif isinstance(producto_id, dict) and 'id' in producto_id:
-                        producto_id = producto_id['id']
-                    # Asegurar que sea un entero
-                    producto_id = int(producto_id)
-                    
-                    try:
-                        producto = Producto.objects.get(id=producto_id)
-                    except Producto.DoesNotExist:
-                        raise serializers.ValidationError(f'El producto con ID {producto_id} no existe.')
-                    except (ValueError, TypeError):
-                        raise serializers.ValidationError(f'El producto debe ser un ID válido. Se recibió: {type(producto_id).__name__}')
-                    
+                    producto = productos.get(item_data['producto'])
+                    if producto is None:
+                        raise serializers.ValidationError(
+                            f'El producto con ID {item_data["producto"]} no existe.'
+                        )
+
                     # Usar valores por defecto si no se proporcionan
                     cantidad = item_data.get('cantidad', 1)
                     if cantidad is None or cantidad <= 0:
                         cantidad = 1
-                    
+
                     costo_unitario = item_data.get('costo_unitario', 1)
                     if costo_unitario is None or costo_unitario <= 0:
                         # Usar el costo del producto si está disponible
                         costo_unitario = float(producto.costo) if producto.costo and producto.costo > 0 else 1
-                    
+
                     # Convertir a Decimal para asegurar compatibilidad
                     costo_unitario = Decimal(str(costo_unitario))
-                    
-                    # Calcular subtotal antes de crear el objeto
                     subtotal_calculado = Decimal(str(cantidad)) * costo_unitario
 
-                    detalle = DetalleCompra.objects.create(
+                    detalles.append(DetalleCompra(
                         compra=instance,
                         producto=producto,
                         cantidad=cantidad,
                         costo_unitario=costo_unitario,
-                        subtotal=subtotal_calculado  # Calcular explícitamente el subtotal
-                    )
-                    detalle.aplicar_compra()
-                    # Usar el subtotal calculado
-                    total += float(subtotal_calculado)
+                        subtotal=subtotal_calculado
+                    ))
+                    deltas[producto.id] = deltas.get(producto.id, 0) + cantidad
+                    costos[producto.id] = costos.get(producto.id, Decimal('0')) + subtotal_calculado
+                    total += subtotal_calculado
+
+                DetalleCompra.objects.bulk_create(detalles)
+                aplicar_deltas_stock(
+                    deltas,
+                    motivo=f'Compra #{instance.id}',
+                    usuario=usuario,
+                    tipo_positivo='ENTRADA',
+                    costos_entrada=costos
+                )
 
-                # Convertir total a Decimal para guardarlo correctamente
-                instance.total = Decimal(str(total))
+                instance.total = total
                 instance.save()
 
         return instance
@@ -0,0 +1,108 @@
+from decimal import Decimal
+
+from django.db import connection, reset_queries
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from inventario.models import MovimientoStock, Producto
+from inventario.servicios import aplicar_deltas_stock
+from usuarios.models import Usuario
+
+from .models import Compra
+
+
+class ReversionCompraTest(TestCase):
+    """Eliminar o editar una compra cuesta las mismas consultas con N o 2N líneas"""
+
+    url = '/api/compras/'
+    lineas = 3
+
+    def setUp(self):
+        usuario = Usuario.objects.create_user(username='bodega', password='bodega', rol='ADMINISTRADOR')
+        self.client = APIClient()
+        self.client.force_authenticate(usuario)
+        self.productos = [
+            Producto.objects.create(
+                codigo=f'P{i}', nombre=f'Producto {i}', costo=Decimal('100'),
+                precio_venta=Decimal('150'), stock_actual=10
+            )
+            for i in range(2 * self.lineas)
+        ]
+
+    def crear_compra(self, lineas, cantidad=10):
+        response = self.client.post(self.url, {'items': [
+            {'producto': producto.id, 'cantidad': cantidad, 'costo_unitario': '100'}
+            for producto in self.productos[:lineas]
+        ]}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return Compra.objects.get(id=response.data['id'])
+
+    def actualizar(self, compra, cantidad, costo_unitario='100'):
+        return self.client.put(f'{self.url}{compra.id}/', {'items': [
+            {'producto': detalle.producto_id, 'cantidad': cantidad, 'costo_unitario': costo_unitario}
+            for detalle in compra.items.all()
+        ]}, format='json')
+
+    def test_eliminar_con_consultas_constantes(self):
+        compra = self.crear_compra(self.lineas)
+        # request_started vacía el registro de consultas: partir de cero en ambas mediciones
+        reset_queries()
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(self.client.delete(f'{self.url}{compra.id}/').status_code, 200)
+        esperadas = len(consultas)
+
+        compra = self.crear_compra(2 * self.lineas)
+        reset_queries()
+        with self.assertNumQueries(esperadas):
+            self.assertEqual(self.client.delete(f'{self.url}{compra.id}/').status_code, 200)
+
+        self.assertFalse(Compra.objects.exists())
+        self.assertEqual(set(Producto.objects.values_list('stock_actual', flat=True)), {10})
+
+    def test_actualizar_con_consultas_constantes(self):
+        compra = self.crear_compra(self.lineas)
+        # request_started vacía el registro de consultas: partir de cero en ambas mediciones
+        reset_queries()
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(self.actualizar(compra, 5).status_code, 200)
+        esperadas = len(consultas)
+
+        compra = self.crear_compra(2 * self.lineas)
+        reset_queries()
+        with self.assertNumQueries(esperadas):
+            response = self.actualizar(compra, 5)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['cantidad'] for item in response.data['items']], [5] * 2 * self.lineas)
+
+        stock = dict(Producto.objects.values_list('id', 'stock_actual'))
+        self.assertEqual(stock[self.productos[0].id], 20)
+        self.assertEqual(stock[self.productos[-1].id], 15)
+
+    def test_actualizar_recalcula_el_costo_promedio(self):
+        compra = self.crear_compra(1)
+
+        response = self.actualizar(compra, 10, costo_unitario='200')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total'], '2000.00')
+        producto = Producto.objects.get(id=self.productos[0].id)
+        # 10 en stock a $100 y 10 comprados a $200
+        self.assertEqual((producto.stock_actual, producto.costo), (20, Decimal('150.00')))
+        entrada = MovimientoStock.objects.filter(producto=producto).latest('id')
+        self.assertEqual((entrada.tipo, entrada.cantidad, entrada.stock_nuevo), ('ENTRADA', 10, 20))
+
+    def test_no_elimina_una_compra_ya_vendida(self):
+        compra = self.crear_compra(self.lineas)
+        aplicar_deltas_stock({self.productos[0].id: -15}, 'Venta', 'bodega')
+        movimientos = MovimientoStock.objects.count()
+
+        response = self.client.delete(f'{self.url}{compra.id}/')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Producto 0', response.data['error'])
+        self.assertTrue(Compra.objects.filter(id=compra.id).exists())
+        self.assertEqual(
+            [Producto.objects.get(id=producto.id).stock_actual for producto in self.productos[:2]], [5, 20]
+        )
+        self.assertEqual(MovimientoStock.objects.count(), movimientos)
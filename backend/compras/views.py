@@ -3,13 +3,14 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.db import transaction
-from django.core.cache import cache
+from inventario.cache import cache
+from erp_minimarket.campos import CamposDinamicosMixin
 from usuarios.permissions import PuedeCompras
 from .models import Compra, DetalleCompra
 from .serializers import CompraSerializer, CrearCompraSerializer, DetalleCompraSerializer
 
 
-class CompraViewSet(viewsets.ModelViewSet):
+class CompraViewSet(CamposDinamicosMixin, viewsets.ModelViewSet):
     queryset = Compra.objects.select_related('proveedor').prefetch_related('items__producto').all()
     serializer_class = CompraSerializer
     search_fields = ['numero_factura', 'proveedor__nombre']
@@ -65,6 +66,11 @@ class CompraViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(instance, data=request.data, partial=False)
         serializer.is_valid(raise_exception=True)
         compra = serializer.save()
+
+        # Las líneas se reemplazaron en la base; volver a precargarlas para la respuesta
+        from django.db.models import prefetch_related_objects
+        compra._prefetched_objects_cache = {}
+        prefetch_related_objects([compra], 'items__producto')
         
         return Response(
             CompraSerializer(compra).data,
@@ -78,38 +84,25 @@ class CompraViewSet(viewsets.ModelViewSet):
             instance = self.get_object()
             usuario = request.user.username if request.user.is_authenticated else 'Sistema'
             
-            # Revertir los cambios de stock de cada item
-            from inventario.models import MovimientoStock
-            
-            for detalle in instance.items.all():
-                producto = detalle.producto
-                stock_actual = producto.stock_actual
-                stock_nuevo = stock_actual - detalle.cantidad
-                
-                # Validar que no quede stock negativo
-                if stock_nuevo < 0:
-                    return Response(
-                        {
-                            'error': f'No se puede eliminar la compra. El producto {producto.nombre} '
-                                   f'tendría stock negativo ({stock_nuevo}).'
-                        },
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-                
-                # Revertir stock
-                producto.stock_actual = stock_nuevo
-                producto.save()
-                
-                # Registrar movimiento de reversión
-                MovimientoStock.objects.create(
-                    producto=producto,
-                    tipo='AJUSTE',
-                    cantidad=-detalle.cantidad,
-                    stock_anterior=stock_actual,
-                    stock_nuevo=stock_nuevo,
+            # Revertir los cambios de stock de todos los items en bloque
+            from inventario.servicios import (
+                aplicar_deltas_stock, deltas_de_detalles, StockInsuficienteError
+            )
+
+            try:
+                aplicar_deltas_stock(
+                    deltas_de_detalles(instance.items.all(), signo=-1),
                     motivo=f'Eliminación de Compra #{instance.id}',
                     usuario=usuario
                 )
+            except StockInsuficienteError as e:
+                return Response(
+                    {
+                        'error': f'No se puede eliminar la compra. El producto {e.producto_nombre} '
+                               f'tendría stock negativo ({e.stock_resultante}).'
+                    },
+                    status=status.HTTP_400_BAD_REQUEST
+                )
             
             # Eliminar la compra (los detalles se eliminan en cascada)
             self.perform_destroy(instance)
@@ -126,7 +119,13 @@ class CompraViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'])
     def exportar_csv(self, request):
-        """Exportar compras a Excel con diseño mejorado"""
+        """Exportar compras a Excel con diseño mejorado (o por línea en Parquet/Arrow con formato=parquet|arrow)"""
+        from reportes.columnar import FORMATOS_COLUMNARES
+
+        formato = request.query_params.get('formato')
+        if formato in FORMATOS_COLUMNARES:
+            return self._exportar_columnar(formato)
+
         from openpyxl import Workbook
         from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
         from openpyxl.utils import get_column_letter
@@ -254,3 +253,22 @@ class CompraViewSet(viewsets.ModelViewSet):
         wb.save(response)
         return response
 
+    def _exportar_columnar(self, formato):
+        """Una fila por línea de compra, con los datos de su compra, para análisis"""
+        from datetime import datetime
+        from reportes.columnar import respuesta_columnar
+
+        compras = self.get_queryset().order_by().values('id')
+        filas = DetalleCompra.objects.filter(compra__in=compras).order_by('compra__fecha', 'compra_id', 'id').values_list(
+            'compra_id', 'compra__numero_factura', 'compra__fecha', 'compra__usuario',
+            'compra__proveedor_id', 'compra__proveedor__nombre',
+            'producto_id', 'producto__codigo', 'producto__nombre',
+            'cantidad', 'costo_unitario', 'subtotal'
+        )
+        return respuesta_columnar(filas, [
+            ('compra_id', 'entero'), ('numero_factura', 'texto'), ('fecha', 'fecha_hora'), ('usuario', 'texto'),
+            ('proveedor_id', 'entero'), ('proveedor_nombre', 'texto'),
+            ('producto_id', 'entero'), ('producto_codigo', 'texto'), ('producto_nombre', 'texto'),
+            ('cantidad', 'entero'), ('costo_unitario', 'decimal'), ('subtotal', 'decimal'),
+        ], formato, f'compras_{datetime.now().strftime("%Y%m%d_%H%M%S")}')
+
@@ -0,0 +1,28 @@
+"""
+ASGI config for erp_minimarket project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+
+Un solo proceso atiende muchas conexiones largas (alertas en vivo, exportaciones
+transmitidas, envío de pedidos por SMTP) sin ocupar un worker por cada una:
+
+    uvicorn erp_minimarket.asgi:application --workers 4
+    gunicorn erp_minimarket.asgi:application -k uvicorn.workers.UvicornWorker -w 4
+
+Cada solicitud sincrónica corre en un hilo propio que no se reutiliza, así que las
+conexiones persistentes a la base de datos no se podrían volver a usar: bajo ASGI
+DB_CONN_MAX_AGE es 0 (también si está en .env) salvo que se defina como variable
+de entorno del proceso. Para reutilizar conexiones, DB_POOL o PgBouncer.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'erp_minimarket.settings')
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
+
+application = get_asgi_application()
@@ -0,0 +1,182 @@
+"""
+Soporte para el despliegue ASGI (erp_minimarket.asgi).
+
+Bajo ASGI las vistas sincrónicas siguen funcionando (cada solicitud corre en su
+propio hilo), pero una conexión larga o una espera de red ocupan ese hilo todo el
+tiempo. Para esos casos:
+
+- AccionesAsincronasMixin: acciones de ViewSet escritas con async def (DRF 3.14
+  solo ejecuta vistas sincrónicas). El ORM se usa con sync_to_async.
+- SondeoCompartido: una sola consulta por proceso para todos los clientes que
+  esperan el mismo dato (eventos en vivo).
+- iterar_en_hilo: recorre un iterable sincrónico (exportaciones con cursor de
+  servidor) sin bloquear el event loop; lo usa TransmisionAsincronaMiddleware.
+- EventosRenderer y evento_sse: respuestas Server-Sent Events.
+
+Bajo WSGI todo esto también funciona: Django ejecuta las vistas async en un event
+loop propio de la solicitud.
+"""
+import asyncio
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.db import connections
+from rest_framework.renderers import BaseRenderer
+
+from .json_rapido import OrjsonRenderer
+
+_json = OrjsonRenderer()
+
+
+def es_asgi(request):
+    """True si la solicitud llegó por el servidor ASGI (acepta requests de DRF)"""
+    return isinstance(getattr(request, '_request', request), ASGIRequest)
+
+
+def liberar_conexiones():
+    """
+    Cierra las conexiones a la base de datos del hilo actual que no estén dentro de
+    una transacción. Para hilos que no terminan en request_finished (pool de
+    sync_to_async) o antes de que una solicitud se quede esperando mucho tiempo.
+    """
+    for conexion in connections.all(initialized_only=True):
+        if not conexion.in_atomic_block:
+            conexion.close()
+
+
+async def iterar_en_hilo(iterable):
+    """
+    Iterador asíncrono sobre un iterable sincrónico: cada parte se obtiene con
+    sync_to_async en el hilo de la solicitud (el mismo del cursor de servidor y su
+    conexión), y el event loop queda libre mientras tanto.
+    """
+    iterador = iter(iterable)
+    siguiente = sync_to_async(next)
+    fin = object()
+    try:
+        while True:
+            parte = await siguiente(iterador, fin)
+            if parte is fin:
+                break
+            yield parte
+    finally:
+        if hasattr(iterador, 'close'):
+            await sync_to_async(iterador.close)()
+
+
+class SondeoCompartido:
+    """
+    Resultado de una función sincrónica compartido por todas las corrutinas del
+    proceso: se recalcula a lo más una vez cada `vigencia` segundos, en el pool de
+    hilos, sin importar cuántos clientes estén esperando.
+    """
+
+    def __init__(self, funcion):
+        self.funcion = funcion
+        self._loop = None
+
+    async def obtener(self, vigencia):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop, self._valor, self._instante, self._tarea = loop, None, None, None
+        if self._instante is not None and loop.time() - self._instante < vigencia:
+            return self._valor
+        if self._tarea is None:
+            self._tarea = loop.create_task(self._actualizar())
+        # shield: si un cliente se desconecta no se cancela la consulta de los demás
+        return await asyncio.shield(self._tarea)
+
+    async def _actualizar(self):
+        try:
+            self._valor = await sync_to_async(self._consultar, thread_sensitive=False)()
+            self._instante = asyncio.get_running_loop().time()
+            return self._valor
+        finally:
+            self._tarea = None
+
+    def _consultar(self):
+        try:
+            return self.funcion()
+        finally:
+            liberar_conexiones()
+
+
+class AccionesAsincronasMixin:
+    """
+    ViewSet con acciones async def. Las rutas cuyas acciones son todas async se
+    atienden sin ocupar un hilo: autenticación, permisos y throttling (que pueden
+    consultar la base de datos) corren con sync_to_async y luego se espera la acción.
+    Las demás rutas del ViewSet no cambian.
+    """
+
+    @classmethod
+    def as_view(cls, actions=None, **initkwargs):
+        vista = super().as_view(actions, **initkwargs)
+        if not actions or not all(iscoroutinefunction(getattr(cls, accion)) for accion in actions.values()):
+            return vista
+
+        async def vista_asincrona(request, *args, **kwargs):
+            return await vista(request, *args, **kwargs)
+
+        # cls, actions, initkwargs y csrf_exempt, como en la vista de DRF
+        vista_asincrona.__dict__.update(vista.__dict__)
+        vista_asincrona.__name__ = vista.__name__
+        vista_asincrona.__doc__ = vista.__doc__
+        return vista_asincrona
+
+    def dispatch(self, request, *args, **kwargs):
+        acciones = getattr(self, 'action_map', None) or {}
+        if acciones and all(iscoroutinefunction(getattr(self, accion)) for accion in acciones.values()):
+            return self._despachar_async(request, *args, **kwargs)
+        return super().dispatch(request, *args, **kwargs)
+
+    async def _despachar_async(self, request, *args, **kwargs):
+        """APIView.dispatch esperando la acción"""
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            if iscoroutinefunction(handler):
+                response = await handler(request, *args, **kwargs)
+            else:
+                response = await sync_to_async(handler)(request, *args, **kwargs)
+        except Exception as exc:
+            response = await sync_to_async(self.handle_exception)(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+
+def evento_sse(datos, evento=None, reintento=None):
+    """Un evento Server-Sent Events con `datos` en JSON (reintento en milisegundos)"""
+    lineas = []
+    if reintento is not None:
+        lineas.append(b'retry: %d' % reintento)
+    if evento:
+        lineas.append(b'event: ' + evento.encode())
+    lineas.append(b'data: ' + _json.render(datos))
+    return b'\n'.join(lineas) + b'\n\n'
+
+
+class EventosRenderer(BaseRenderer):
+    """
+    text/event-stream para las acciones que responden con eventos: la respuesta
+    normal es un StreamingHttpResponse; este renderer solo se usa para los errores
+    (autenticación, permisos), que llegan como un evento 'error'.
+    """
+    media_type = 'text/event-stream'
+    format = 'eventos'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return evento_sse(data, 'error')
@@ -0,0 +1,123 @@
+"""
+Campos a pedido en las lecturas de la API: ?fields=id,nombre,... o ?perfil=compacto.
+
+Se reducen tanto los campos serializados como las columnas que se leen de la base
+de datos (only(), select_related y prefetch_related solo de lo necesario), así
+que los campos calculados que no se piden (margen, imagen_url, items...) no
+cuestan nada.
+
+- El serializer declara sus perfiles (perfiles = {'compacto': [...]}) y, para los
+  campos que no salen de una columna del modelo, las columnas o relaciones que
+  necesitan (columnas_campos = {'margen': ('costo', 'precio_venta')}).
+- El ViewSet usa CamposDinamicosMixin; solo list y retrieve aceptan los parámetros.
+"""
+import re
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+_DISPLAY = re.compile(r'get_(\w+)_display')
+
+
+class CamposDinamicosSerializerMixin:
+    """Serializer que acepta campos=[...] y descarta los demás"""
+    perfiles = {}
+    columnas_campos = {}
+
+    def __init__(self, *args, campos=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if campos is not None:
+            for nombre in set(self.fields) - set(campos):
+                self.fields.pop(nombre)
+
+
+def _fuentes(serializer, nombre):
+    """Rutas del ORM (con __) que necesita un campo del serializer, o None si no se sabe"""
+    declaradas = getattr(serializer, 'columnas_campos', {})
+    if nombre in declaradas:
+        return list(declaradas[nombre])
+    campo = serializer.fields[nombre]
+    if campo.source == '*' or isinstance(campo, serializers.SerializerMethodField):
+        return None
+    display = _DISPLAY.fullmatch(campo.source)
+    return [display.group(1) if display else campo.source.replace('.', '__')]
+
+
+def reducir_consulta(queryset, serializer, campos):
+    """
+    Limita el queryset a lo que necesitan `campos` del serializer. Si algún campo
+    no declara de qué depende, el queryset queda igual.
+    """
+    modelo = queryset.model
+    columnas, relaciones, prefetch = set(), set(), set()
+    for nombre in campos:
+        fuentes = _fuentes(serializer, nombre)
+        if fuentes is None:
+            return queryset
+        for fuente in fuentes:
+            partes = fuente.split('__')
+            try:
+                campo = modelo._meta.get_field(partes[0])
+            except FieldDoesNotExist:
+                return queryset
+            if campo.one_to_many or campo.many_to_many:
+                prefetch.add(fuente)
+            elif campo.is_relation and len(partes) > 1:
+                columnas.add(fuente)
+                relaciones.add('__'.join(partes[:-1]))
+            else:
+                columnas.add(partes[0])
+
+    return (
+        queryset.select_related(None).select_related(*relaciones)
+        .prefetch_related(None).prefetch_related(*sorted(prefetch))
+        .only(*columnas or ['pk'])
+    )
+
+
+class CamposDinamicosMixin:
+    """
+    ViewSet con ?fields= (lista separada por comas) y ?perfil= (perfiles del
+    serializer) en list y retrieve. fields tiene prioridad sobre perfil.
+    """
+    acciones_campos = ('list', 'retrieve')
+
+    def campos_solicitados(self):
+        """Campos pedidos en la solicitud, o None para todos"""
+        if hasattr(self, '_campos_solicitados'):
+            return self._campos_solicitados
+
+        campos = None
+        if self.action in self.acciones_campos:
+            serializer_class = self.get_serializer_class()
+            fields = self.request.query_params.get('fields')
+            perfil = self.request.query_params.get('perfil')
+            if fields:
+                campos = [campo.strip() for campo in fields.split(',') if campo.strip()]
+                desconocidos = [c for c in campos if c not in serializer_class().fields]
+                if desconocidos:
+                    raise ValidationError({'fields': f'Campos desconocidos: {", ".join(desconocidos)}'})
+            elif perfil:
+                perfiles = getattr(serializer_class, 'perfiles', {})
+                if perfil not in perfiles:
+                    raise ValidationError({
+                        'perfil': f'Perfil desconocido. Opciones: {", ".join(perfiles) or "ninguna"}'
+                    })
+                campos = list(perfiles[perfil])
+
+        self._campos_solicitados = campos
+        return campos
+
+    def get_serializer(self, *args, **kwargs):
+        campos = self.campos_solicitados()
+        if campos is not None:
+            kwargs.setdefault('campos', campos)
+        return super().get_serializer(*args, **kwargs)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        campos = self.campos_solicitados()
+        if campos is not None:
+            queryset = reducir_consulta(queryset, self.get_serializer_class()(), campos)
+        return queryset
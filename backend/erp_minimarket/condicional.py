@@ -0,0 +1,65 @@
+"""
+GET condicional (ETag / Last-Modified) para los listados de catálogo.
+
+La versión de un listado se obtiene con un único agregado sobre el queryset
+filtrado: la última fecha_actualizacion y la cantidad de filas (que cambia al
+eliminar o desactivar), más las de las relaciones que aparecen en la respuesta
+(p. ej. el nombre de la categoría de cada producto). Si el cliente ya tiene esa
+versión, la respuesta es 304 Not Modified sin serializar nada.
+"""
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+
+class ListadoCondicionalMixin:
+    """
+    Mixin para ViewSets: agrega ETag y Last-Modified a list() y responde 304
+    cuando coinciden con If-None-Match / If-Modified-Since.
+
+    - campo_actualizacion: campo auto_now del modelo
+    - relaciones_version: relaciones (FK) cuyos cambios alteran la representación;
+      deben tener el mismo campo de actualización
+    """
+    campo_actualizacion = 'fecha_actualizacion'
+    relaciones_version = ()
+
+    def version_listado(self, queryset):
+        """(última actualización, ETag) del queryset en una sola consulta"""
+        campo = self.campo_actualizacion
+        agregados = {'ultima': Max(campo), 'cantidad': Count('pk')}
+        for relacion in self.relaciones_version:
+            agregados[f'{relacion}_ultima'] = Max(f'{relacion}__{campo}')
+            # Cuenta las filas con la relación asignada: baja si se elimina la relacionada
+            agregados[f'{relacion}_cantidad'] = Count(relacion)
+        version = queryset.select_related(None).order_by().aggregate(**agregados)
+
+        fechas = [version['ultima']] + [version[f'{r}_ultima'] for r in self.relaciones_version]
+        fechas = [fecha for fecha in fechas if fecha]
+        ultima = max(fechas) if fechas else None
+
+        # La misma versión se representa distinto según la URL (página, filtros) y el formato
+        texto = '|'.join([
+            self.request.get_full_path(),
+            getattr(self.request.accepted_renderer, 'format', ''),
+        ] + [f'{clave}={valor.isoformat() if hasattr(valor, "isoformat") else valor}'
+             for clave, valor in sorted(version.items())])
+        etag = quote_etag(hashlib.md5(texto.encode('utf-8')).hexdigest())
+        return ultima, f'W/{etag}'
+
+    def list(self, request, *args, **kwargs):
+        ultima, etag = self.version_listado(self.filter_queryset(self.get_queryset()))
+        last_modified = int(ultima.timestamp()) if ultima else None
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = super().list(request, *args, **kwargs)
+
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        # Sin esto el navegador podría reutilizar la respuesta sin revalidarla
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
@@ -0,0 +1,64 @@
+"""
+Renderer y parser JSON de la API basados en orjson.
+
+La salida es la misma que la de los de DRF:
+- los DecimalField de los serializers ya llegan como texto ('1500.00') y se
+  mantienen así; los Decimal sueltos (reportes, SerializerMethodField) se
+  convierten a número igual que con el JSONEncoder de DRF, que también se usa para
+  los demás tipos que orjson no conoce (textos traducibles, querysets, timedelta...)
+- fechas con hora en UTC terminan en 'Z'; con zona horaria, con su desplazamiento
+
+Sin orjson instalado se usan el renderer y el parser de DRF.
+"""
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+if ORJSON_AVAILABLE:
+    # OPT_NON_STR_KEYS: claves numéricas o de fecha, como las acepta json.dumps
+    OPCIONES = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+# Conversión de los tipos que orjson no serializa (Decimal -> float, etc.)
+_convertir = JSONEncoder().default
+
+
+class OrjsonRenderer(JSONRenderer):
+    """JSONRenderer de DRF con orjson (también bajo la API navegable)"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if not ORJSON_AVAILABLE:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+
+        opciones = OPCIONES
+        # orjson solo indenta con 2 espacios: cualquier indent pedido se respeta así
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            opciones |= orjson.OPT_INDENT_2
+
+        contenido = orjson.dumps(data, default=_convertir, option=opciones)
+        # Igual que DRF: JSON válido también como JavaScript
+        if b'\xe2\x80\xa8' in contenido or b'\xe2\x80\xa9' in contenido:
+            contenido = contenido.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return contenido
+
+
+class OrjsonParser(JSONParser):
+    """JSONParser de DRF con orjson para cuerpos en UTF-8"""
+    renderer_class = OrjsonRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', 'utf-8')
+        if not ORJSON_AVAILABLE or encoding.lower().replace('_', '-') not in ('utf-8', 'utf8'):
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
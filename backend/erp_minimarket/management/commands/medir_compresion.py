@@ -0,0 +1,94 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client
+
+from erp_minimarket.middleware import BROTLI_AVAILABLE, ZSTD_AVAILABLE
+from inventario.models import Categoria, MovimientoStock, Producto
+from inventario.servicios import registrar_cambios_productos
+from usuarios.models import Usuario
+
+
+class _Revertir(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide el efecto de CompresionMiddleware en listados y exportaciones grandes: '
+        'tamaño, tiempo en el servidor y tiempo estimado de descarga en un enlace lento '
+        '(los datos de prueba se crean y se descartan)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filas', type=int, default=3000, help='Productos y movimientos de prueba (por defecto 3000)')
+        parser.add_argument('--kbps', type=int, default=2000, help='Ancho de banda del enlace en kbit/s (por defecto 2000)')
+        parser.add_argument('--rtt', type=int, default=80, help='Latencia de ida y vuelta en ms (por defecto 80)')
+
+    def handle(self, *args, **options):
+        self.kbps = options['kbps']
+        self.rtt = options['rtt'] / 1000
+        codificaciones = ['identity', 'gzip']
+        if BROTLI_AVAILABLE:
+            codificaciones.append('br')
+        if ZSTD_AVAILABLE:
+            codificaciones.append('zstd')
+
+        try:
+            with transaction.atomic():
+                cliente = self._preparar(options['filas'])
+                self.stdout.write(f'Enlace simulado: {self.kbps} kbit/s, RTT {options["rtt"]} ms')
+                for nombre, url in (
+                    ('Catálogo completo (JSON)', '/api/inventario/productos/cambios/'),
+                    ('Movimientos (Arrow, transmitido)', '/api/inventario/movimientos/exportar_csv/?formato=arrow'),
+                    ('Productos (XLSX, ya comprimido)', '/api/inventario/productos/exportar_csv/'),
+                ):
+                    self.stdout.write(nombre)
+                    for codificacion in codificaciones:
+                        self._medir(cliente, url, codificacion)
+                raise _Revertir
+        except _Revertir:
+            pass
+
+    def _preparar(self, filas):
+        categoria = Categoria.objects.create(nombre='Medición de compresión')
+        productos = Producto.objects.bulk_create([
+            Producto(
+                codigo=f'MEDIR-COMP-{i}', nombre=f'Producto de prueba {i}', categoria=categoria,
+                descripcion='Descripción de prueba', costo=Decimal('990.50'),
+                precio_venta=Decimal('1490.00'), stock_actual=i % 50,
+            )
+            for i in range(filas)
+        ])
+        registrar_cambios_productos([producto.id for producto in productos])
+        MovimientoStock.objects.bulk_create([
+            MovimientoStock(
+                producto=productos[i], tipo='SALIDA', cantidad=1, stock_anterior=10,
+                stock_nuevo=9, motivo=f'Venta #{i}', usuario='medir_compresion',
+            )
+            for i in range(filas)
+        ])
+        usuario = Usuario.objects.create_user(
+            username='medir_compresion', password='medir_compresion', rol='ADMINISTRADOR'
+        )
+        cliente = Client(HTTP_HOST='localhost')
+        cliente.force_login(usuario)
+        return cliente
+
+    def _medir(self, cliente, url, codificacion):
+        mejor = None
+        for _ in range(3):
+            inicio = time.perf_counter()
+            response = cliente.get(url, HTTP_ACCEPT_ENCODING=codificacion)
+            cuerpo = b''.join(response.streaming_content) if response.streaming else response.content
+            segundos = time.perf_counter() - inicio
+            mejor = segundos if mejor is None else min(mejor, segundos)
+
+        enviada = response.get('Content-Encoding', 'identity')
+        transferencia = self.rtt + len(cuerpo) * 8 / (self.kbps * 1000)
+        self.stdout.write(
+            f'  {codificacion:>8} -> {enviada:<8} {len(cuerpo) / 1024:8.0f} KB  '
+            f'servidor {mejor * 1000:6.0f} ms  total estimado {(mejor + transferencia) * 1000:7.0f} ms'
+        )
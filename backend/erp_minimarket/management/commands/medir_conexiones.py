@@ -0,0 +1,88 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.signals import request_finished, request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from inventario.models import Producto
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide el costo de abrir una conexión a la base de datos en cada solicitud frente a '
+        'reutilizarla según la configuración actual (DB_CONN_MAX_AGE, health checks o pool)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--solicitudes',
+            type=int,
+            default=200,
+            help='Solicitudes simuladas por modo (por defecto 200)',
+        )
+        parser.add_argument(
+            '--base',
+            default='default',
+            help='Alias de DATABASES a medir (por defecto default)',
+        )
+
+    def handle(self, *args, **options):
+        conexion = connections[options['base']]
+        solicitudes = options['solicitudes']
+        ajustes = conexion.settings_dict
+        configuracion = (
+            f"CONN_MAX_AGE={ajustes['CONN_MAX_AGE']}, "
+            f"health checks={'sí' if ajustes.get('CONN_HEALTH_CHECKS') else 'no'}, "
+            f"pool={'sí' if ajustes.get('OPTIONS', {}).get('pool') else 'no'}"
+        )
+
+        # Una búsqueda por código como la del punto de venta, para comparar con el costo de conectar
+        codigo = Producto.objects.using(conexion.alias).values_list('codigo', flat=True).first() or ''
+        consulta = f'SELECT id, stock_actual FROM {Producto._meta.db_table} WHERE codigo = %s'
+
+        sin_reutilizar = self._medir(conexion, solicitudes, 0, consulta, codigo)
+        reutilizando = self._medir(conexion, solicitudes, ajustes['CONN_MAX_AGE'], consulta, codigo)
+
+        self.stdout.write(f'Solicitudes simuladas por modo: {solicitudes} (base "{conexion.alias}")')
+        for nombre, (segundos, conexiones) in (
+            ('Conexión nueva por solicitud (CONN_MAX_AGE=0)', sin_reutilizar),
+            (f'Configuración actual ({configuracion})', reutilizando),
+        ):
+            self.stdout.write(
+                f'  {nombre}: {segundos * 1000 / solicitudes:.2f} ms por solicitud, '
+                f'{conexiones} conexiones abiertas'
+            )
+
+        ahorro = (sin_reutilizar[0] - reutilizando[0]) * 1000 / solicitudes
+        self.stdout.write(self.style.SUCCESS(f'Costo de conexión evitado: {ahorro:.2f} ms por solicitud'))
+
+    def _medir(self, conexion, solicitudes, max_age, consulta, codigo):
+        """
+        Simula el ciclo de solicitudes de Django (request_started/request_finished cierran
+        las conexiones vencidas) con una consulta por solicitud.
+        Retorna (segundos, conexiones abiertas).
+        """
+        abiertas = []
+
+        def contar(sender, connection, **kwargs):
+            if connection.alias == conexion.alias:
+                abiertas.append(connection)
+
+        original = conexion.settings_dict['CONN_MAX_AGE']
+        conexion.close()
+        conexion.settings_dict['CONN_MAX_AGE'] = max_age
+        connection_created.connect(contar)
+        try:
+            inicio = time.perf_counter()
+            for _ in range(solicitudes):
+                request_started.send(sender=self.__class__)
+                with conexion.cursor() as cursor:
+                    cursor.execute(consulta, [codigo])
+                    cursor.fetchall()
+                request_finished.send(sender=self.__class__)
+            return time.perf_counter() - inicio, len(abiertas)
+        finally:
+            connection_created.disconnect(contar)
+            conexion.settings_dict['CONN_MAX_AGE'] = original
+            conexion.close()
@@ -0,0 +1,115 @@
+import io
+import json
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import RequestFactory
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from erp_minimarket.json_rapido import ORJSON_AVAILABLE, OrjsonParser, OrjsonRenderer
+from inventario.models import MovimientoStock, Producto
+from inventario.serializers import MovimientoStockSerializer, ProductoSerializer
+
+
+class _Revertir(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara el renderer/parser JSON de DRF con los de orjson sobre páginas grandes '
+        'de productos y movimientos de stock (los datos de prueba se crean y se descartan)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--filas',
+            type=int,
+            default=2000,
+            help='Filas por página (por defecto 2000)',
+        )
+        parser.add_argument(
+            '--repeticiones',
+            type=int,
+            default=5,
+            help='Repeticiones por medición; se informa la mejor (por defecto 5)',
+        )
+
+    def handle(self, *args, **options):
+        if not ORJSON_AVAILABLE:
+            raise CommandError('orjson no está instalado: la API usa el renderer de DRF')
+
+        filas = options['filas']
+        self.repeticiones = options['repeticiones']
+        try:
+            with transaction.atomic():
+                paginas = self._paginas(filas)
+                for nombre, datos in paginas:
+                    self._comparar(nombre, datos)
+                raise _Revertir
+        except _Revertir:
+            pass
+
+    def _paginas(self, filas):
+        """Datos serializados (como los de una página de la API) de productos y movimientos"""
+        faltan = filas - Producto.objects.count()
+        if faltan > 0:
+            Producto.objects.bulk_create([
+                Producto(
+                    codigo=f'MEDIR-JSON-{i}', nombre=f'Producto de prueba {i}',
+                    descripcion='Descripción de prueba con tildes y eñes',
+                    costo=Decimal('990.50'), precio_venta=Decimal('1490.00'), stock_actual=i % 50,
+                )
+                for i in range(faltan)
+            ])
+        faltan = filas - MovimientoStock.objects.count()
+        if faltan > 0:
+            productos = list(Producto.objects.values_list('id', flat=True)[:filas])
+            MovimientoStock.objects.bulk_create([
+                MovimientoStock(
+                    producto_id=productos[i % len(productos)], tipo='SALIDA', cantidad=1,
+                    stock_anterior=10, stock_nuevo=9, motivo=f'Venta #{i}', usuario='medir_json',
+                )
+                for i in range(faltan)
+            ])
+
+        request = RequestFactory().get('/', HTTP_HOST='localhost')
+        productos = Producto.objects.select_related('categoria', 'proveedor')[:filas]
+        movimientos = MovimientoStock.objects.select_related('producto')[:filas]
+        return [
+            ('productos', {'count': filas, 'results': ProductoSerializer(
+                productos, many=True, context={'request': request}).data}),
+            ('movimientos', {'count': filas, 'results': MovimientoStockSerializer(movimientos, many=True).data}),
+        ]
+
+    def _mejor(self, funcion):
+        mejor = None
+        for _ in range(self.repeticiones):
+            inicio = time.perf_counter()
+            resultado = funcion()
+            segundos = time.perf_counter() - inicio
+            mejor = segundos if mejor is None else min(mejor, segundos)
+        return mejor, resultado
+
+    def _comparar(self, nombre, datos):
+        drf, rapido = JSONRenderer(), OrjsonRenderer()
+        render_drf, cuerpo_drf = self._mejor(lambda: drf.render(datos))
+        render_rapido, cuerpo_rapido = self._mejor(lambda: rapido.render(datos))
+
+        parser_drf, parser_rapido = JSONParser(), OrjsonParser()
+        parse_drf, _ = self._mejor(lambda: parser_drf.parse(io.BytesIO(cuerpo_drf)))
+        parse_rapido, _ = self._mejor(lambda: parser_rapido.parse(io.BytesIO(cuerpo_drf)))
+
+        iguales = json.loads(cuerpo_drf) == json.loads(cuerpo_rapido)
+        self.stdout.write(
+            f'{nombre}: {len(datos["results"])} filas, {len(cuerpo_drf) / 1024:.0f} KB'
+            f'{"" if iguales else " (¡salida distinta!)"}'
+        )
+        for operacion, lento, rapido_ in (('render', render_drf, render_rapido), ('parse', parse_drf, parse_rapido)):
+            self.stdout.write(
+                f'  {operacion}: DRF {lento * 1000:.1f} ms, orjson {rapido_ * 1000:.1f} ms '
+                f'({lento / rapido_:.1f}x)'
+            )
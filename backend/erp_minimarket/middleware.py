@@ -1,8 +1,25 @@
 """
-Middleware personalizado para deshabilitar CSRF en rutas de API
+Middleware personalizado: CSRF en rutas de API, lecturas en la réplica de base de
+datos, compresión de respuestas y transmisión por partes bajo ASGI
 """
+import zlib
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.utils.cache import patch_vary_headers
 from django.utils.deprecation import MiddlewareMixin
 
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
 
 class DisableCSRFForAPI(MiddlewareMixin):
     """
@@ -13,4 +30,182 @@ class DisableCSRFForAPI(MiddlewareMixin):
             setattr(request, '_dont_enforce_csrf_checks', True)
 
 
+class LecturasEnReplicaMiddleware(MiddlewareMixin):
+    """
+    Envía a la réplica de base de datos las lecturas de reportes, exportaciones y
+    listados (ver erp_minimarket.routers). Después de una escritura deja una cookie
+    para que ese cliente lea del primario mientras la réplica se pone al día.
+    """
+    COOKIE = 'lectura_primario'
+
+    def process_request(self, request):
+        from .routers import activar_replica
+        activar_replica(False)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        from .routers import activar_replica, alias_replica, es_lectura_para_replica
+        if (
+            alias_replica()
+            and not request.COOKIES.get(self.COOKIE)
+            and es_lectura_para_replica(view_func, request.method)
+        ):
+            activar_replica(True)
+
+    def process_response(self, request, response):
+        from django.conf import settings
+        from .routers import alias_replica
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') and alias_replica():
+            response.set_cookie(
+                self.COOKIE, '1',
+                max_age=settings.DB_REPLICA_PEGAJOSIDAD_SEGUNDOS,
+                httponly=True, samesite='Lax'
+            )
+        return response
+
+
+def _nuevo_compresor(codificacion):
+    """
+    (comprimir_parte, terminar) para una codificación. Cada parte se vacía al
+    salir, para que las respuestas transmitidas lleguen al cliente a medida que se
+    generan.
+    """
+    if codificacion == 'zstd':
+        compresor = zstandard.ZstdCompressor(level=3).compressobj()
+        return (
+            lambda datos: compresor.compress(datos) + compresor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK),
+            compresor.flush,
+        )
+    if codificacion == 'br':
+        compresor = brotli.Compressor(quality=5)
+        return (lambda datos: compresor.process(datos) + compresor.flush(), compresor.finish)
+    # wbits=31: formato gzip (cabecera y CRC)
+    compresor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    return (lambda datos: compresor.compress(datos) + compresor.flush(zlib.Z_SYNC_FLUSH), compresor.flush)
+
+
+def _aceptadas(cabecera):
+    """{codificación: q} de un Accept-Encoding"""
+    aceptadas = {}
+    for parte in cabecera.split(','):
+        nombre, _, parametros = parte.partition(';')
+        nombre = nombre.strip().lower()
+        if not nombre:
+            continue
+        q = 1.0
+        parametros = parametros.strip().replace(' ', '')
+        if parametros.startswith('q='):
+            try:
+                q = float(parametros[2:])
+            except ValueError:
+                q = 0.0
+        aceptadas[nombre] = q
+    return aceptadas
+
+
+class CompresionMiddleware(MiddlewareMixin):
+    """
+    Comprime las respuestas con zstd, brotli o gzip según Accept-Encoding y lo
+    disponible en el servidor (en el orden de settings.COMPRESION_CODIFICACIONES).
+
+    - Solo los tipos de settings.COMPRESION_TIPOS (JSON, CSV, Arrow...): los XLSX,
+      Parquet e imágenes ya vienen comprimidos, y el HTML con tokens CSRF queda
+      fuera para no exponerlo a ataques tipo BREACH.
+    - Respuestas completas desde settings.COMPRESION_MIN_BYTES; las transmitidas
+      por partes (exportaciones) siempre, parte por parte.
+    """
+
+    def process_response(self, request, response):
+        from django.conf import settings
+
+        if response.has_header('Content-Encoding') or response.status_code == 206:
+            return response
+        tipo = response.get('Content-Type', '').split(';')[0].strip().lower()
+        if not any(tipo.startswith(permitido) for permitido in settings.COMPRESION_TIPOS):
+            return response
+        if not response.streaming and len(response.content) < settings.COMPRESION_MIN_BYTES:
+            return response
+
+        # La respuesta depende de Accept-Encoding aunque esta vez no se comprima
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        codificacion = self._elegir(request.META.get('HTTP_ACCEPT_ENCODING', ''), settings)
+        if codificacion is None:
+            return response
+
+        comprimir, terminar = _nuevo_compresor(codificacion)
+        if response.streaming:
+            contenido = response.streaming_content
+
+            if response.is_async:
+                async def comprimido():
+                    async for parte in contenido:
+                        datos = comprimir(parte)
+                        if datos:
+                            yield datos
+                    yield terminar()
+            else:
+                def comprimido():
+                    for parte in contenido:
+                        datos = comprimir(parte)
+                        if datos:
+                            yield datos
+                    yield terminar()
+
+            response.streaming_content = comprimido()
+            del response['Content-Length']
+        else:
+            datos = comprimir(response.content) + terminar()
+            if len(datos) >= len(response.content):
+                return response
+            response.content = datos
+            response['Content-Length'] = str(len(datos))
+
+        # Mismo contenido lógico, otros bytes: el ETag deja de ser fuerte
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = codificacion
+        return response
+
+    def _elegir(self, cabecera, settings):
+        aceptadas = _aceptadas(cabecera)
+        disponibles = {'gzip': True, 'br': BROTLI_AVAILABLE, 'zstd': ZSTD_AVAILABLE}
+        for codificacion in settings.COMPRESION_CODIFICACIONES:
+            if not disponibles.get(codificacion):
+                continue
+            if aceptadas.get(codificacion, aceptadas.get('*', 0)) > 0:
+                return codificacion
+        return None
+
+
+class TransmisionAsincronaMiddleware:
+    """
+    Bajo ASGI, Django 4.2 lee completas en memoria las respuestas transmitidas con
+    un iterador sincrónico (exportaciones) antes de enviarlas. Este middleware las
+    recorre parte por parte con iterar_en_hilo, en el hilo de la solicitud, para
+    que se sigan enviando a medida que se generan. Bajo WSGI no hace nada.
+    Va primero en MIDDLEWARE, para recibir la respuesta ya comprimida.
+
+    Es sincrónico y asincrónico a la vez: Django lo llama en el modo de la cadena
+    (get_response), sin adaptarlo a un hilo ni a un bucle de eventos.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.asincrono = iscoroutinefunction(get_response)
+        if self.asincrono:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.asincrono:
+            return self._transmitir(request)
+        return self.get_response(request)
 
+    async def _transmitir(self, request):
+        from .asincrono import iterar_en_hilo
+        response = await self.get_response(request)
+        if response.streaming and not response.is_async:
+            response.streaming_content = iterar_en_hilo(response.streaming_content)
+        return response
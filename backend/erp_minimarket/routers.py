@@ -0,0 +1,109 @@
+"""
+Enrutamiento de lecturas a la réplica de PostgreSQL (settings.DB_REPLICA_ALIAS).
+
+Solo las solicitudes que el middleware LecturasEnReplicaMiddleware marca como de
+solo lectura (reportes, exportaciones y listados) leen de la réplica; todo lo demás,
+y todas las escrituras, usan el primario. Si la réplica no está configurada o no
+responde, las lecturas vuelven al primario.
+
+Lectura de lo escrito:
+- dentro de una solicitud, después de la primera escritura todas las lecturas
+  siguientes van al primario;
+- entre solicitudes, el middleware deja una cookie después de cada escritura y
+  mientras dure (DB_REPLICA_PEGAJOSIDAD_SEGUNDOS) ese cliente lee del primario.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.utils import OperationalError
+
+# Acciones de ViewSet que leen de la réplica si la vista no define acciones_replica
+ACCIONES_REPLICA = ('list', 'exportar_csv', 'exportar_excel')
+
+# Se asigna al inicio de cada solicitud (también en hilos reutilizados) y se mantiene
+# hasta la siguiente: las respuestas transmitidas por partes consultan después de
+# que la vista retorna.
+_lectura_en_replica = ContextVar('lectura_en_replica', default=False)
+
+# Hasta cuándo (time.monotonic) no se reintenta conectar a una réplica caída
+_replica_caida_hasta = 0.0
+
+
+def alias_replica():
+    """Alias de la réplica, o None si no está configurada"""
+    alias = getattr(settings, 'DB_REPLICA_ALIAS', 'replica')
+    return alias if alias in settings.DATABASES else None
+
+
+def activar_replica(activa):
+    """Indica si las lecturas de la solicitud actual pueden ir a la réplica"""
+    _lectura_en_replica.set(activa)
+
+
+@contextmanager
+def lecturas_en_primario():
+    """
+    Las lecturas del bloque van al primario aunque la solicitud lea de la réplica:
+    para resultados que se guardan sin expiración, que una réplica atrasada dejaría
+    con datos anteriores a la última escritura.
+    """
+    token = _lectura_en_replica.set(False)
+    try:
+        yield
+    finally:
+        _lectura_en_replica.reset(token)
+
+
+def replica_disponible(alias):
+    global _replica_caida_hasta
+    if time.monotonic() < _replica_caida_hasta:
+        return False
+    try:
+        connections[alias].ensure_connection()
+    except OperationalError:
+        _replica_caida_hasta = time.monotonic() + getattr(settings, 'DB_REPLICA_REINTENTO_SEGUNDOS', 30)
+        return False
+    return True
+
+
+def es_lectura_para_replica(view_func, metodo):
+    """
+    True si la vista es una acción de ViewSet de solo lectura que puede usar la réplica:
+    las de acciones_replica de su clase ('__all__' = todas) o, por defecto, ACCIONES_REPLICA.
+    """
+    if metodo not in ('GET', 'HEAD'):
+        return False
+    clase = getattr(view_func, 'cls', None)
+    accion = (getattr(view_func, 'actions', None) or {}).get(metodo.lower())
+    if clase is None or accion is None:
+        return False
+    acciones = getattr(clase, 'acciones_replica', ACCIONES_REPLICA)
+    return acciones == '__all__' or accion in acciones
+
+
+class RouterReplica:
+    """Lecturas marcadas a la réplica; escrituras y migraciones siempre al primario"""
+
+    def db_for_read(self, model, **hints):
+        # La caché en base de datos (CACHE_BACKEND=base_datos) se lee siempre del
+        # primario: en la réplica podría leerse una versión ya invalidada
+        if _lectura_en_replica.get() and model._meta.app_label != 'django_cache':
+            alias = alias_replica()
+            if alias and replica_disponible(alias):
+                return alias
+        # Explícito: sin esto Django leería de la base de origen de la instancia (hints)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        _lectura_en_replica.set(False)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # La réplica es una copia física del primario: los objetos son los mismos
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != alias_replica()
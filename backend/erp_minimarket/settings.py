@@ -4,6 +4,7 @@ Django settings for erp_minimarket project.
 
 from pathlib import Path
 import os
+import django
 from decouple import config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -39,32 +40,88 @@ INSTALLED_APPS = [
     'compras',
     'ventas',
     'reportes',  # Nueva app de reportes
+    'erp_minimarket',  # Comandos de medición de la infraestructura (medir_*)
 ]
 
-# Caché (usando memoria local para desarrollo, cambiar a Redis en producción)
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
+# Caché
+# CACHE_BACKEND:
+# - 'memoria': en cada proceso; solo para desarrollo con un único worker (las
+#   invalidaciones no llegan a los demás workers)
+# - 'redis': compartida entre workers y servidores (CACHE_URL, requiere redis-py)
+# - 'archivo': compartida entre los workers de un mismo servidor (CACHE_DIR)
+# - 'base_datos': compartida vía PostgreSQL; requiere `python manage.py createcachetable`
+CACHE_BACKEND = config('CACHE_BACKEND', default='memoria')
+CACHE_URL = config('CACHE_URL', default='redis://127.0.0.1:6379/0')
+CACHE_DIR = config('CACHE_DIR', default=str(BASE_DIR / 'cache'))
+CACHE_TABLA = 'cache_compartida'
+CACHE_KEY_PREFIX = config('CACHE_KEY_PREFIX', default='minimarket')
+# Subir CACHE_VERSION deja obsoletas todas las claves (p. ej. al desplegar cambios de formato)
+CACHE_VERSION = config('CACHE_VERSION', default=1, cast=int)
+# Un alias por espacio de nombres; cada uno con su propio prefijo de claves
+CACHE_ESPACIOS = ('default', 'reportes', 'inventario')
+
+
+def _configurar_cache(espacio):
+    """Configuración de un alias de CACHES según CACHE_BACKEND"""
+    from django.core.exceptions import ImproperlyConfigured
+
+    prefijo = CACHE_KEY_PREFIX if espacio == 'default' else f'{CACHE_KEY_PREFIX}:{espacio}'
+    cache = {
+        'KEY_PREFIX': prefijo,
+        'VERSION': CACHE_VERSION,
         'TIMEOUT': 300,  # 5 minutos por defecto
-        'OPTIONS': {
-            'MAX_ENTRIES': 1000
-        }
     }
-}
+    if CACHE_BACKEND == 'redis':
+        cache['BACKEND'] = 'django.core.cache.backends.redis.RedisCache'
+        cache['LOCATION'] = CACHE_URL
+    elif CACHE_BACKEND == 'archivo':
+        # Un directorio por espacio: clear() borra el directorio completo
+        cache['BACKEND'] = 'django.core.cache.backends.filebased.FileBasedCache'
+        cache['LOCATION'] = os.path.join(CACHE_DIR, espacio)
+        cache['OPTIONS'] = {'MAX_ENTRIES': 10000}
+    elif CACHE_BACKEND == 'base_datos':
+        cache['BACKEND'] = 'django.core.cache.backends.db.DatabaseCache'
+        cache['LOCATION'] = CACHE_TABLA
+        cache['OPTIONS'] = {'MAX_ENTRIES': 10000}
+    elif CACHE_BACKEND == 'memoria':
+        cache['BACKEND'] = 'django.core.cache.backends.locmem.LocMemCache'
+        cache['LOCATION'] = f'minimarket-{espacio}'
+        cache['OPTIONS'] = {'MAX_ENTRIES': 1000}
+    else:
+        raise ImproperlyConfigured(
+            f"CACHE_BACKEND desconocido: '{CACHE_BACKEND}' (memoria, redis, archivo o base_datos)"
+        )
+    return cache
+
+
+CACHES = {espacio: _configurar_cache(espacio) for espacio in CACHE_ESPACIOS}
 
 MIDDLEWARE = [
+    'erp_minimarket.middleware.TransmisionAsincronaMiddleware',  # Solo actúa bajo ASGI
     'django.middleware.security.SecurityMiddleware',
+    'erp_minimarket.middleware.CompresionMiddleware',  # Antes que todo lo que lee o modifica el cuerpo
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'erp_minimarket.middleware.DisableCSRFForAPI',  # Deshabilitar CSRF para APIs
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'erp_minimarket.middleware.LecturasEnReplicaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Compresión de respuestas (CompresionMiddleware): codificaciones en orden de
+# preferencia ('br' requiere brotli y 'zstd' zstandard; sin ellos se usa gzip)
+COMPRESION_CODIFICACIONES = config('COMPRESION_CODIFICACIONES', default='zstd,br,gzip').split(',')
+COMPRESION_MIN_BYTES = config('COMPRESION_MIN_BYTES', default=1024, cast=int)
+COMPRESION_TIPOS = (
+    'application/json',
+    'text/csv',
+    'text/plain',
+    'application/vnd.apache.arrow.stream',
+)
+
 ROOT_URLCONF = 'erp_minimarket.urls'
 
 TEMPLATES = [
@@ -84,22 +141,82 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'erp_minimarket.wsgi.application'
+# Despliegue ASGI (uvicorn erp_minimarket.asgi:application): ver erp_minimarket/asgi.py
+ASGI_APPLICATION = 'erp_minimarket.asgi.application'
 
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# Reutilización de conexiones: cada hilo conserva su conexión durante DB_CONN_MAX_AGE
+# segundos (0 = una conexión nueva por solicitud) y, con DB_CONN_HEALTH_CHECKS, verifica
+# que siga viva antes de reutilizarla en una nueva solicitud.
+DB_CONN_MAX_AGE = config('DB_CONN_MAX_AGE', default=60, cast=int)
+DB_CONN_HEALTH_CHECKS = config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool)
+DB_CONNECT_TIMEOUT = config('DB_CONNECT_TIMEOUT', default=5, cast=int)
+
+# Pool de conexiones de psycopg (requiere Django >= 5.1 y psycopg[pool] 3). Reemplaza
+# las conexiones persistentes; en versiones anteriores de Django se ignora.
+DB_POOL = config('DB_POOL', default=False, cast=bool)
+DB_POOL_MIN = config('DB_POOL_MIN', default=2, cast=int)
+DB_POOL_MAX = config('DB_POOL_MAX', default=10, cast=int)
+DB_POOL_TIMEOUT = config('DB_POOL_TIMEOUT', default=10, cast=int)
+
+
+def _configurar_conexiones(base):
+    """Agrega a una base de DATABASES la reutilización de conexiones configurada"""
+    base['CONN_HEALTH_CHECKS'] = DB_CONN_HEALTH_CHECKS
+    base['OPTIONS'] = {'connect_timeout': DB_CONNECT_TIMEOUT}
+    if DB_POOL and django.VERSION >= (5, 1):
+        # Django no admite CONN_MAX_AGE junto con el pool
+        base['CONN_MAX_AGE'] = 0
+        base['OPTIONS']['pool'] = {
+            'min_size': DB_POOL_MIN,
+            'max_size': DB_POOL_MAX,
+            'timeout': DB_POOL_TIMEOUT,
+        }
+    else:
+        base['CONN_MAX_AGE'] = DB_CONN_MAX_AGE
+    return base
+
+
 DATABASES = {
-    'default': {
+    'default': _configurar_conexiones({
         'ENGINE': 'django.db.backends.postgresql',
         'NAME': config('DB_NAME', default='minimarket_db'),
         'USER': config('DB_USER', default='postgres'),
         'PASSWORD': config('DB_PASSWORD', default='postgres'),
         'HOST': config('DB_HOST', default='localhost'),
         'PORT': config('DB_PORT', default='5432'),
-    }
+    })
 }
 
+# Réplica de solo lectura (opcional): reportes, exportaciones y listados leen de ella
+# (ver erp_minimarket.routers). Sin DB_REPLICA_HOST todo usa la base principal.
+DB_REPLICA_ALIAS = 'replica'
+if config('DB_REPLICA_HOST', default=''):
+    DATABASES[DB_REPLICA_ALIAS] = _configurar_conexiones({
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': config('DB_REPLICA_NAME', default=DATABASES['default']['NAME']),
+        'USER': config('DB_REPLICA_USER', default=DATABASES['default']['USER']),
+        'PASSWORD': config('DB_REPLICA_PASSWORD', default=DATABASES['default']['PASSWORD']),
+        'HOST': config('DB_REPLICA_HOST'),
+        'PORT': config('DB_REPLICA_PORT', default=DATABASES['default']['PORT']),
+        # En tests la réplica es la misma base de pruebas que la principal
+        'TEST': {'MIRROR': 'default'},
+    })
+elif config('DB_REPLICA_TEST', default=False, cast=bool):
+    # Solo para correr las pruebas sin una segunda base: la réplica es un espejo de la
+    # base de pruebas, lo que permite probar el enrutamiento de lecturas
+    DATABASES[DB_REPLICA_ALIAS] = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+
+DATABASE_ROUTERS = ['erp_minimarket.routers.RouterReplica']
+
+# Segundos que un cliente lee del primario después de escribir (lectura de lo escrito)
+DB_REPLICA_PEGAJOSIDAD_SEGUNDOS = config('DB_REPLICA_PEGAJOSIDAD_SEGUNDOS', default=10, cast=int)
+# Segundos antes de reintentar una réplica que no respondió
+DB_REPLICA_REINTENTO_SEGUNDOS = config('DB_REPLICA_REINTENTO_SEGUNDOS', default=30, cast=int)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -160,7 +277,17 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',  # Requiere autenticación por defecto
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
-    'PAGE_SIZE': 50
+    'PAGE_SIZE': 50,
+    # JSON con orjson (misma salida que el de DRF; sin orjson usa el de DRF)
+    'DEFAULT_RENDERER_CLASSES': [
+        'erp_minimarket.json_rapido.OrjsonRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'erp_minimarket.json_rapido.OrjsonParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
 # CORS
@@ -218,3 +345,8 @@ EMAIL_HOST_USER = config('EMAIL_HOST_USER', default="")  # Tu email de Gmail
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default="")  # Contraseña de aplicación (App Password)
 DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default=EMAIL_HOST_USER)
 
+# Alertas de stock en vivo (/api/usuarios/alertas/eventos/): cada cuántos segundos se
+# revisan (una consulta por proceso para todos los clientes) y cuánto dura cada conexión
+# antes de que el navegador se reconecte
+ALERTAS_EVENTOS_INTERVALO = config('ALERTAS_EVENTOS_INTERVALO', default=3, cast=int)
+ALERTAS_EVENTOS_DURACION = config('ALERTAS_EVENTOS_DURACION', default=300, cast=int)
@@ -0,0 +1,486 @@
+import asyncio
+import json
+import socket
+import tempfile
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
+
+try:
+    from fakeredis import TcpFakeServer
+    FAKEREDIS_AVAILABLE = True
+except ImportError:
+    FAKEREDIS_AVAILABLE = False
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core import mail
+from django.core.cache import CacheHandler
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from inventario.models import MovimientoStock, PedidoProveedor, Producto, Proveedor
+from inventario.servicios import aplicar_deltas_stock
+from reportes import cache as cache_reportes
+from reportes.cache import incrementar_version, obtener_reporte
+from reportes.columnar import PYARROW_AVAILABLE
+from reportes.tests.base import ReportesTestCase
+from usuarios.models import AlertaStock, Usuario
+
+from .routers import RouterReplica, activar_replica
+
+
+@skipUnless(
+    settings.DB_REPLICA_ALIAS in settings.DATABASES, 'Requiere DB_REPLICA_TEST=True o DB_REPLICA_HOST'
+)
+class LecturasEnReplicaTest(ReportesTestCase):
+    """
+    En pruebas la réplica es un espejo de la base de pruebas: comprueba a qué base
+    se envía cada lectura, no el atraso de una réplica real ni la lectura de lo escrito
+    contra una segunda base.
+    """
+
+    def tearDown(self):
+        activar_replica(False)
+
+    def registrar_lecturas(self):
+        """Parchea RouterReplica.db_for_read para anotar a qué base va cada lectura"""
+        lecturas = []
+        db_for_read = RouterReplica.db_for_read
+
+        def registrar(router, model, **hints):
+            lecturas.append(db_for_read(router, model, **hints))
+            return lecturas[-1]
+
+        parche = mock.patch.object(RouterReplica, 'db_for_read', registrar)
+        parche.start()
+        self.addCleanup(parche.stop)
+        return lecturas
+
+    def test_lee_de_la_replica_configurada(self):
+        activar_replica(True)
+        self.assertEqual(RouterReplica().db_for_read(Producto), settings.DB_REPLICA_ALIAS)
+
+    @override_settings(DB_REPLICA_ALIAS='sin_replica')
+    def test_sin_replica_configurada_lee_del_primario(self):
+        activar_replica(True)
+        self.assertEqual(RouterReplica().db_for_read(Producto), 'default')
+
+    def test_despues_de_escribir_lee_del_primario(self):
+        activar_replica(True)
+        router = RouterReplica()
+        self.assertEqual(router.db_for_write(Producto), 'default')
+        self.assertEqual(router.db_for_read(Producto), 'default')
+
+    def test_reportes_y_listados_en_replica(self):
+        lecturas = self.registrar_lecturas()
+
+        self.client.get('/api/reportes/margen_productos/')
+        self.client.get('/api/inventario/productos/')
+        self.assertIn('replica', lecturas)
+
+        response = self.client.post('/api/inventario/categorias/', {'nombre': 'Snacks'}, format='json')
+        self.assertIn('lectura_primario', response.cookies)
+        lecturas.clear()
+        self.client.get('/api/inventario/productos/')
+        self.assertNotIn('replica', lecturas)
+
+    def test_periodos_cerrados_se_calculan_en_el_primario(self):
+        lecturas = self.registrar_lecturas()
+        hoy = timezone.localdate()
+        url = f'/api/reportes/ventas/serie/?desde={hoy - timedelta(days=7)}&hasta='
+
+        # Se guarda sin expiración: no puede venir de una réplica atrasada
+        self.assertEqual(self.client.get(f'{url}{hoy - timedelta(days=1)}').status_code, 200)
+        self.assertEqual(set(lecturas), {'default'})
+
+        # Periodo abierto: expira pronto y puede leerse de la réplica
+        lecturas.clear()
+        self.assertEqual(self.client.get(f'{url}{hoy}').status_code, 200)
+        self.assertEqual(set(lecturas), {'replica'})
+
+
+class CacheCompartidaTestMixin:
+    """
+    Invalidación entre workers: cada "worker" es un CacheHandler independiente (sus
+    propias conexiones al backend), como los procesos de gunicorn.
+    """
+
+    def configuracion(self):
+        raise NotImplementedError
+
+    def worker(self):
+        return CacheHandler(self.configuracion())
+
+    def test_invalidar_reporte_en_un_worker_llega_al_otro(self):
+        worker_a, worker_b = self.worker(), self.worker()
+        calculos = []
+
+        def reporte(worker):
+            with mock.patch.object(cache_reportes, 'cache', worker['reportes']):
+                return obtener_reporte('prueba', {}, lambda: calculos.append(1) or len(calculos), ['ventas'])
+
+        self.assertEqual(reporte(worker_a), 1)
+        self.assertEqual(reporte(worker_b), 1)  # calculado por A
+
+        with mock.patch.object(cache_reportes, 'cache', worker_b['reportes']):
+            with self.captureOnCommitCallbacks(execute=True):
+                incrementar_version('ventas')
+
+        self.assertEqual(reporte(worker_a), 2)
+        self.assertEqual(len(calculos), 2)
+
+    def test_borrar_clave_en_un_worker_llega_al_otro(self):
+        worker_a, worker_b = self.worker(), self.worker()
+        worker_a['inventario'].set('productos_activos', [1, 2, 3])
+        self.assertEqual(worker_b['inventario'].get('productos_activos'), [1, 2, 3])
+
+        worker_b['inventario'].delete('productos_activos')
+        self.assertIsNone(worker_a['inventario'].get('productos_activos'))
+
+    def test_espacios_y_versiones_no_comparten_claves(self):
+        worker = self.worker()
+        worker['reportes'].set('clave', 'reportes')
+        worker['inventario'].set('clave', 'inventario')
+        self.assertEqual(worker['reportes'].get('clave'), 'reportes')
+        self.assertEqual(worker['inventario'].get('clave'), 'inventario')
+
+        # Otra versión de la aplicación no ve las claves de la anterior
+        configuracion = self.configuracion()
+        configuracion['inventario']['VERSION'] = 2
+        self.assertIsNone(CacheHandler(configuracion)['inventario'].get('clave'))
+
+
+class CacheArchivoCompartidaTest(CacheCompartidaTestMixin, TestCase):
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.directorio = directorio.name
+
+    def configuracion(self):
+        return {
+            espacio: {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': f'{self.directorio}/{espacio}',
+                'KEY_PREFIX': f'minimarket:{espacio}',
+            }
+            for espacio in ('default', 'reportes', 'inventario')
+        }
+
+
+@skipUnless(FAKEREDIS_AVAILABLE, 'requiere fakeredis')
+class CacheRedisCompartidaTest(CacheCompartidaTestMixin, TestCase):
+    """Contra un servidor Redis local (fakeredis) escuchando en un puerto TCP"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            cls.puerto = s.getsockname()[1]
+        cls.servidor = TcpFakeServer(('127.0.0.1', cls.puerto), server_type='redis')
+        threading.Thread(target=cls.servidor.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.servidor.shutdown()
+        cls.servidor.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.addCleanup(self.worker()['default'].clear)
+
+    def configuracion(self):
+        return {
+            espacio: {
+                'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+                'LOCATION': f'redis://127.0.0.1:{self.puerto}/0',
+                'KEY_PREFIX': f'minimarket:{espacio}',
+            }
+            for espacio in ('default', 'reportes', 'inventario')
+        }
+
+
+class CatalogoCondicionalTest(ReportesTestCase):
+
+    def etag(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def test_sin_cambios_responde_304_con_una_consulta(self):
+        for url in ('/api/inventario/productos/', '/api/inventario/categorias/', '/api/inventario/proveedores/'):
+            with self.subTest(url=url):
+                etag = self.etag(url)
+                with self.assertNumQueries(1):
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response['ETag'], etag)
+
+                response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+                self.assertEqual(response.status_code, 304)
+
+    def test_cambios_generan_otro_etag(self):
+        url = '/api/inventario/productos/'
+        etag = self.etag(url)
+
+        # Stock actualizado en bloque (UPDATE sin save())
+        aplicar_deltas_stock({self.productos[1].id: 3}, 'Ajuste', 'admin')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        etag = self.etag(url)
+
+        # Cambia el nombre de la categoría que se muestra en cada producto
+        categoria = self.productos[0].categoria
+        categoria.nombre = 'Refrescos'
+        categoria.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        etag = self.etag(url)
+
+        nuevo = Producto.objects.create(
+            codigo='NUEVO', nombre='Nuevo', costo=Decimal('10'), precio_venta=Decimal('20')
+        )
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        etag = self.etag(url)
+
+        # Eliminar no deja ninguna fecha más reciente, pero cambia la cantidad
+        nuevo.delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_etag_distinto_por_pagina_y_filtro(self):
+        url = '/api/inventario/productos/'
+        self.assertNotEqual(self.etag(url), self.etag(f'{url}?activo=true'))
+
+
+class CamposDinamicosTest(ReportesTestCase):
+
+    def test_perfil_compacto_de_productos(self):
+        from inventario.serializers import ProductoSerializer
+
+        response = self.client.get('/api/inventario/productos/?perfil=compacto')
+        self.assertEqual(response.status_code, 200)
+        producto = response.data['results'][0]
+        self.assertEqual(set(producto), set(ProductoSerializer.perfiles['compacto']))
+        self.assertEqual(producto['categoria_nombre'], 'Bebidas')
+
+    def test_ventas_sin_lineas_no_las_consulta(self):
+        with self.assertNumQueries(2):  # conteo y página
+            response = self.client.get('/api/ventas/?perfil=compacto')
+        self.assertEqual(set(response.data['results'][0]), {'id', 'numero_boleta', 'fecha', 'total', 'usuario'})
+
+        with self.assertNumQueries(4):  # conteo, página, líneas y sus productos
+            response = self.client.get('/api/ventas/?fields=id,items')
+        self.assertEqual(len(response.data['results'][0]['items']), 3)
+
+    def test_fields_en_detalle_y_campos_desconocidos(self):
+        producto = self.productos[0]
+        response = self.client.get(f'/api/inventario/productos/{producto.id}/?fields=id,margen')
+        self.assertEqual(response.data, {'id': producto.id, 'margen': Decimal('50')})
+
+        self.assertEqual(self.client.get('/api/compras/?fields=id,precio').status_code, 400)
+        self.assertEqual(self.client.get('/api/compras/?perfil=minimo').status_code, 400)
+
+
+class JsonRapidoTest(ReportesTestCase):
+
+    def test_misma_salida_que_el_renderer_de_drf(self):
+        from django.utils.translation import gettext_lazy
+        from rest_framework.renderers import JSONRenderer
+
+        from erp_minimarket.json_rapido import OrjsonRenderer
+
+        ahora = timezone.now()
+        datos = {
+            'total': Decimal('1500.50'),
+            'precio': '1490.00',
+            'utc': ahora,
+            'local': timezone.localtime(ahora),
+            'dia': ahora.date(),
+            'texto': gettext_lazy('Sin stock \u2028 ñandú'),
+            'por_hora': {9: 3, 10: 5},
+            'duracion': timedelta(minutes=5),
+        }
+        esperado = JSONRenderer().render(datos)
+        self.assertEqual(OrjsonRenderer().render(datos).decode(), esperado.decode())
+
+    def test_api_usa_orjson_y_rechaza_json_invalido(self):
+        response = self.client.get('/api/inventario/productos/?perfil=compacto')
+        self.assertEqual(response.json()['results'][0]['precio_venta'], '150.00')
+
+        response = self.client.post(
+            '/api/inventario/categorias/', data='{"nombre": ', content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('JSON parse error', response.json()['detail'])
+
+
+class CompresionTest(ReportesTestCase):
+
+    def contenido(self, response):
+        if response.streaming:
+            return b''.join(response.streaming_content)
+        return response.content
+
+    def test_listado_json_con_gzip(self):
+        import gzip
+
+        url = '/api/ventas/'
+        plano = self.client.get(url)
+        self.assertNotIn('Content-Encoding', plano)
+        self.assertIn('Accept-Encoding', plano['Vary'])
+
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertLess(len(response.content), len(plano.content))
+        self.assertEqual(gzip.decompress(response.content), plano.content)
+
+        # q=0 rechaza la codificación
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip;q=0')
+        self.assertNotIn('Content-Encoding', response)
+
+    @skipUnless(PYARROW_AVAILABLE, 'requiere pyarrow')
+    def test_exportacion_transmitida_se_comprime_por_partes(self):
+        import gzip
+
+        url = '/api/ventas/exportar_csv/?formato=arrow'
+        plano = self.contenido(self.client.get(url))
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(self.contenido(response)), plano)
+
+    def test_no_recomprime_xlsx_ni_parquet(self):
+        for url in ('/api/inventario/productos/exportar_csv/', '/api/ventas/exportar_csv/?formato=parquet'):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, br, zstd')
+                self.assertEqual(response.status_code, 200)
+                self.assertNotIn('Content-Encoding', response)
+
+    def test_prefiere_zstd_y_brotli_si_estan_disponibles(self):
+        from erp_minimarket.middleware import BROTLI_AVAILABLE, ZSTD_AVAILABLE
+
+        url = '/api/ventas/'
+        plano = self.client.get(url).content
+        if ZSTD_AVAILABLE:
+            import zstandard
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, br, zstd')
+            self.assertEqual(response['Content-Encoding'], 'zstd')
+            self.assertEqual(zstandard.ZstdDecompressor().decompressobj().decompress(response.content), plano)
+        if BROTLI_AVAILABLE:
+            import brotli
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, br')
+            self.assertEqual(response['Content-Encoding'], 'br')
+            self.assertEqual(brotli.decompress(response.content), plano)
+
+
+@override_settings(DEFAULT_FROM_EMAIL='compras@minimarket.cl')
+class DespliegueAsgiTest(TransactionTestCase):
+    """Vistas asíncronas bajo ASGI (AsyncClient) y su comportamiento bajo WSGI (APIClient)"""
+
+    # Con DB_REPLICA_HOST las exportaciones leen de la réplica (espejo de la base de pruebas)
+    databases = '__all__'
+    eventos = '/api/usuarios/alertas/eventos/'
+
+    def setUp(self):
+        usuario = Usuario.objects.create_user(username='admin', password='admin', rol='ADMINISTRADOR')
+        self.proveedor = Proveedor.objects.create(nombre='Distribuidora', email='p@ejemplo.cl')
+        self.producto = Producto.objects.create(
+            codigo='A1', nombre='Arroz', proveedor=self.proveedor, costo=Decimal('100'),
+            precio_venta=Decimal('150'), stock_actual=2, stock_minimo=5
+        )
+        AlertaStock.objects.create(producto=self.producto)
+        self.asgi = AsyncClient()
+        self.asgi.force_login(usuario)
+        self.wsgi = APIClient()
+        self.wsgi.force_authenticate(usuario)
+
+    def datos_evento(self, evento):
+        self.assertIn(b'event: alertas\n', evento)
+        return json.loads(evento.split(b'data: ', 1)[1])
+
+    @override_settings(ALERTAS_EVENTOS_INTERVALO=1)
+    async def test_alertas_en_vivo(self):
+        response = await self.asgi.get(self.eventos, headers={'Accept': 'text/event-stream'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        contenido = response.streaming_content
+        try:
+            primero = await asyncio.wait_for(contenido.__anext__(), 5)
+            self.assertIn(b'retry: 1000\n', primero)
+            self.assertEqual(self.datos_evento(primero)['cantidad'], 1)
+
+            nueva = await sync_to_async(AlertaStock.objects.create)(producto=self.producto)
+            segundo = self.datos_evento(await asyncio.wait_for(contenido.__anext__(), 5))
+            self.assertEqual(segundo, {'cantidad': 2, 'ultima': nueva.id})
+        finally:
+            await contenido.aclose()
+
+    async def test_alertas_en_vivo_requiere_autenticacion(self):
+        response = await AsyncClient().get(self.eventos, headers={'Accept': 'text/event-stream'})
+        self.assertEqual(response.status_code, 403)
+        self.assertTrue(response.content.startswith(b'event: error\n'))
+
+    def test_alertas_bajo_wsgi_responden_el_estado_actual(self):
+        response = self.wsgi.get(self.eventos, HTTP_ACCEPT='text/event-stream')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.streaming)
+        self.assertIn(b'retry: 15000\n', response.content)
+        self.assertEqual(self.datos_evento(response.content)['cantidad'], 1)
+
+    async def test_enviar_pedido_asincrono(self):
+        url = f'/api/inventario/proveedores/{self.proveedor.id}/enviar_pedido/'
+        response = await self.asgi.post(
+            url, {'items': [{'producto': self.producto.id, 'cantidad': 4}], 'notas': 'Urgente'},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['p@ejemplo.cl'])
+        pedido = await PedidoProveedor.objects.aget(id=response.json()['pedido_id'])
+        self.assertEqual((pedido.total_items, pedido.usuario, pedido.notas), (4, 'admin', 'Urgente'))
+
+        response = await self.asgi.post(url, {'items': []}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_enviar_pedido_bajo_wsgi(self):
+        url = f'/api/inventario/proveedores/{self.proveedor.id}/enviar_pedido/'
+        response = self.wsgi.post(url, {'items': [{'producto': self.producto.id, 'cantidad': 2}]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(self.wsgi.post('/api/inventario/proveedores/0/enviar_pedido/', {}, format='json').status_code, 404)
+
+    @skipUnless(PYARROW_AVAILABLE, 'requiere pyarrow')
+    async def test_exportacion_se_transmite_sin_acumular(self):
+        import gzip
+        import pyarrow as pa
+
+        await MovimientoStock.objects.abulk_create([
+            MovimientoStock(
+                producto=self.producto, tipo='SALIDA', cantidad=1, stock_anterior=3,
+                stock_nuevo=2, motivo=f'Venta #{i}', usuario='admin'
+            )
+            for i in range(10)
+        ])
+        response = await self.asgi.get(
+            '/api/inventario/movimientos/exportar_csv/?formato=arrow', headers={'Accept-Encoding': 'gzip'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        contenido = b''.join([parte async for parte in response.streaming_content])
+        tabla = pa.ipc.open_stream(gzip.decompress(contenido)).read_all()
+        self.assertEqual(tabla.num_rows, 10)
+
+    def test_middleware_de_transmision_en_ambos_modos(self):
+        from .middleware import TransmisionAsincronaMiddleware
+
+        async def get_response_asincrono(request):
+            return None
+
+        self.assertTrue(iscoroutinefunction(TransmisionAsincronaMiddleware(get_response_asincrono)))
+        sincrono = TransmisionAsincronaMiddleware(lambda request: 'respuesta')
+        self.assertFalse(iscoroutinefunction(sincrono))
+        self.assertEqual(sincrono(None), 'respuesta')
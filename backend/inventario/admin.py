@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Proveedor, Categoria, Producto, MovimientoStock, PedidoProveedor
+from .models import Proveedor, Categoria, Producto, MovimientoStock, QuiebreStock, CambioProducto, PedidoProveedor
 
 
 @admin.register(Proveedor)
@@ -32,6 +32,20 @@ class MovimientoStockAdmin(admin.ModelAdmin):
     readonly_fields = ['fecha']
 
 
+@admin.register(QuiebreStock)
+class QuiebreStockAdmin(admin.ModelAdmin):
+    list_display = ['producto', 'inicio', 'fin']
+    list_filter = ['inicio']
+    search_fields = ['producto__codigo', 'producto__nombre']
+
+
+@admin.register(CambioProducto)
+class CambioProductoAdmin(admin.ModelAdmin):
+    list_display = ['producto_id', 'tipo', 'transaccion', 'fecha']
+    list_filter = ['tipo']
+    search_fields = ['producto_id']
+
+
 @admin.register(PedidoProveedor)
 class PedidoProveedorAdmin(admin.ModelAdmin):
     list_display = ['id', 'proveedor', 'fecha_envio', 'estado', 'total_items', 'usuario']
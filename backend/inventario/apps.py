@@ -6,3 +6,7 @@ class InventarioConfig(AppConfig):
     name = 'inventario'
     verbose_name = 'Inventario'
 
+
+    def ready(self):
+        # Intervalos de quiebre de stock
+        from . import signals  # noqa: F401
@@ -0,0 +1,9 @@
+"""
+Caché de inventario (alias 'inventario' de CACHES, con su propio prefijo de claves).
+
+Con un backend compartido, borrar una clave aquí la invalida en todos los workers.
+"""
+from django.core.cache import caches
+from django.utils.connection import ConnectionProxy
+
+cache = ConnectionProxy(caches, 'inventario')
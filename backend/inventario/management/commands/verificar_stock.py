@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from inventario.verificacion import verificar_cadena_stock
+
+
+class Command(BaseCommand):
+    help = 'Verifica que stock_actual coincida con la cadena de movimientos de stock de cada producto'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            help='Solo verifica productos con movimientos posteriores a la última marca verificada',
+        )
+        parser.add_argument(
+            '--no-actualizar-marca',
+            action='store_true',
+            help='No guardar la nueva marca al terminar (con inconsistencias nunca se guarda)',
+        )
+        parser.add_argument(
+            '--limite',
+            type=int,
+            default=100,
+            help='Máximo de cortes y descuadres a detallar (por defecto 100)',
+        )
+
+    def handle(self, *args, **options):
+        if options['limite'] < 1:
+            raise CommandError('--limite debe ser mayor que cero')
+
+        resultado = verificar_cadena_stock(
+            incremental=options['incremental'],
+            actualizar_marca=not options['no_actualizar_marca'],
+            limite=options['limite'],
+        )
+
+        self.stdout.write(
+            f"Modo: {resultado['modo']} | Productos verificados: {resultado['productos_verificados']} | "
+            f"Marca: movimiento #{resultado['marca_nueva']['movimiento_id']}"
+            + ('' if resultado['marca_actualizada'] else ' (no guardada)')
+        )
+
+        for corte in resultado['cortes']:
+            self.stdout.write(
+                f"  [CORTE] {corte['producto_codigo']} - movimiento #{corte['movimiento_id']}: "
+                f"stock_anterior={corte['stock_anterior']}, esperado={corte['stock_esperado']} "
+                f"(movimiento previo #{corte['movimiento_previo_id']})"
+            )
+        for descuadre in resultado['descuadres']:
+            self.stdout.write(
+                f"  [DESCUADRE] {descuadre['producto_codigo']}: stock_actual={descuadre['stock_actual']}, "
+                f"según movimientos={descuadre['stock_segun_movimientos']} "
+                + (
+                    f"(último movimiento #{descuadre['ultimo_movimiento_id']})"
+                    if descuadre['ultimo_movimiento_id'] else '(sin movimientos)'
+                )
+            )
+
+        if not resultado['consistente']:
+            raise CommandError(
+                f"Cadena de stock inconsistente: {resultado['total_cortes']} corte(s), "
+                f"{resultado['total_descuadres']} descuadre(s)"
+            )
+
+        self.stdout.write(self.style.SUCCESS('La cadena de stock es consistente'))
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:05
+
+from django.db import migrations, models
+import django.db.models.expressions
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0004_movimientostock_producto_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(condition=models.Q(('activo', True), ('stock_actual__lte', django.db.models.expressions.F('stock_minimo'))), fields=['nombre'], name='inventario_prod_bajo_stock_idx'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 4.2.7 on 2026-10-19 16:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def poblar_quiebres(apps, schema_editor):
+    """Construye los intervalos de quiebre a partir del historial de movimientos"""
+    MovimientoStock = apps.get_model('inventario', 'MovimientoStock')
+    QuiebreStock = apps.get_model('inventario', 'QuiebreStock')
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {QuiebreStock._meta.db_table} (producto_id, inicio, fin)
+            SELECT producto_id, fecha, siguiente
+            FROM (
+                SELECT producto_id, fecha, stock_nuevo <= 0 AS sin_stock,
+                       LEAD(fecha) OVER (PARTITION BY producto_id ORDER BY fecha, id) AS siguiente
+                FROM {MovimientoStock._meta.db_table}
+                WHERE (stock_anterior > 0) <> (stock_nuevo > 0)
+            ) cruces
+            WHERE sin_stock
+            """
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0005_producto_bajo_stock_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuiebreStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('inicio', models.DateTimeField()),
+                ('fin', models.DateTimeField(blank=True, null=True)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='quiebres', to='inventario.producto')),
+            ],
+            options={
+                'ordering': ['-inicio'],
+                'indexes': [
+                    models.Index(fields=['producto', 'inicio'], name='inventario_quiebre_prod_idx'),
+                    models.Index(fields=['inicio', 'fin'], name='inventario_quiebre_rango_idx'),
+                ],
+                'constraints': [
+                    models.UniqueConstraint(condition=models.Q(('fin__isnull', True)), fields=('producto',), name='inventario_quiebre_abierto_uniq'),
+                ],
+            },
+        ),
+        migrations.RunPython(poblar_quiebres, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.7 on 2026-10-19 19:10
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0006_quiebrestock'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='categoria',
+            name='fecha_actualizacion',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
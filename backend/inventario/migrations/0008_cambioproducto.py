@@ -0,0 +1,43 @@
+# Generated by Django 4.2.7 on 2026-10-19 19:40
+
+from django.db import migrations, models
+
+
+def registrar_productos_existentes(apps, schema_editor):
+    """Todos los productos actuales forman la versión inicial del catálogo"""
+    Producto = apps.get_model('inventario', 'Producto')
+    CambioProducto = apps.get_model('inventario', 'CambioProducto')
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {CambioProducto._meta.db_table} (producto_id, tipo, transaccion, fecha)
+            SELECT id, CASE WHEN activo THEN 'CREADO' ELSE 'DESACTIVADO' END,
+                   pg_current_xact_id()::text::bigint, NOW()
+            FROM {Producto._meta.db_table}
+            """
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0007_categoria_fecha_actualizacion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CambioProducto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('producto_id', models.BigIntegerField(unique=True)),
+                ('tipo', models.CharField(choices=[('CREADO', 'Creado'), ('ACTUALIZADO', 'Actualizado'), ('DESACTIVADO', 'Desactivado'), ('ELIMINADO', 'Eliminado')], max_length=15)),
+                ('transaccion', models.BigIntegerField(db_index=True)),
+                ('fecha', models.DateTimeField()),
+            ],
+            options={
+                'ordering': ['transaccion'],
+            },
+        ),
+        migrations.RunPython(registrar_productos_existentes, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import F, Q
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 
@@ -28,6 +29,7 @@ class Categoria(models.Model):
     nombre = models.CharField(max_length=100, unique=True)
     descripcion = models.TextField(null=True, blank=True)
     activa = models.BooleanField(default=True)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['nombre']
@@ -82,6 +84,12 @@ class Producto(models.Model):
             models.Index(fields=['codigo']),
             models.Index(fields=['codigo_barras']),
             models.Index(fields=['activo']),
+            # Solo contiene los productos activos bajo el mínimo (bajo_stock / dashboard)
+            models.Index(
+                fields=['nombre'],
+                name='inventario_prod_bajo_stock_idx',
+                condition=Q(activo=True, stock_actual__lte=F('stock_minimo')),
+            ),
         ]
 
     def __str__(self):
@@ -124,12 +132,67 @@ class MovimientoStock(models.Model):
         indexes = [
             models.Index(fields=['producto', '-fecha']),
             models.Index(fields=['tipo', '-fecha']),
+            # Recorrido de la cadena por producto (verificar_stock)
+            models.Index(fields=['producto', 'id'], name='inventario_mov_prod_id_idx'),
         ]
 
     def __str__(self):
         return f"{self.producto.codigo} - {self.tipo} - {self.cantidad}"
 
 
+class QuiebreStock(models.Model):
+    """Intervalo en que un producto estuvo sin stock (fin nulo: sigue sin stock)"""
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='quiebres')
+    inicio = models.DateTimeField()
+    fin = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-inicio']
+        indexes = [
+            models.Index(fields=['producto', 'inicio'], name='inventario_quiebre_prod_idx'),
+            # Consultas de solapamiento con un rango: inicio < hasta y (fin > desde o abierto)
+            models.Index(fields=['inicio', 'fin'], name='inventario_quiebre_rango_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['producto'],
+                condition=Q(fin__isnull=True),
+                name='inventario_quiebre_abierto_uniq'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.producto.codigo} sin stock desde {self.inicio:%Y-%m-%d %H:%M}"
+
+
+class CambioProducto(models.Model):
+    """
+    Último cambio de cada producto, para la sincronización incremental del catálogo
+    (GET /api/inventario/productos/cambios/).
+
+    transaccion es el id de la transacción de PostgreSQL que hizo el cambio
+    (pg_current_xact_id); ver inventario.servicios.cambios_productos_desde.
+    """
+    TIPOS = [
+        ('CREADO', 'Creado'),
+        ('ACTUALIZADO', 'Actualizado'),
+        ('DESACTIVADO', 'Desactivado'),
+        ('ELIMINADO', 'Eliminado'),
+    ]
+
+    # Sin FK: el registro sobrevive a la eliminación del producto
+    producto_id = models.BigIntegerField(unique=True)
+    tipo = models.CharField(max_length=15, choices=TIPOS)
+    transaccion = models.BigIntegerField(db_index=True)
+    fecha = models.DateTimeField()
+
+    class Meta:
+        ordering = ['transaccion']
+
+    def __str__(self):
+        return f"Producto #{self.producto_id} {self.tipo} (transacción {self.transaccion})"
+
+
 class PedidoProveedor(models.Model):
     """Modelo para registrar pedidos enviados a proveedores"""
     ESTADO_CHOICES = [
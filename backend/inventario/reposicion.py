@@ -0,0 +1,108 @@
+"""
+Sugerencia de pedido por proveedor.
+
+Para cada producto activo del proveedor:
+
+    venta_diaria = unidades vendidas en los últimos `dias` / `dias`
+    objetivo     = stock_minimo + venta_diaria * (dias_entrega + dias_cobertura)
+    sugerido     = objetivo - stock_actual - unidades ya pedidas y no recibidas
+
+La venta de cada producto se obtiene en una sola consulta agrupada (subconsulta
+por producto, sin multiplicar filas) y lo pendiente se suma desde los pedidos
+abiertos del proveedor.
+"""
+import math
+from datetime import timedelta
+
+from django.db.models import IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Producto, PedidoProveedor
+
+ESTADOS_PENDIENTES = ['ENVIADO', 'CONFIRMADO', 'EN_TRANSITO']
+
+
+def unidades_pendientes(proveedor):
+    """Unidades pedidas y aún no recibidas por producto ({producto_id: cantidad})"""
+    pedidos = PedidoProveedor.objects.filter(
+        proveedor=proveedor,
+        estado__in=ESTADOS_PENDIENTES
+    ).values_list('items', flat=True)
+
+    por_id, por_codigo = {}, {}
+    for items in pedidos:
+        for item in items or []:
+            cantidad = item.get('cantidad') or 0
+            # Los pedidos antiguos solo guardan el código del producto
+            if item.get('producto'):
+                por_id[item['producto']] = por_id.get(item['producto'], 0) + cantidad
+            elif item.get('codigo'):
+                por_codigo[item['codigo']] = por_codigo.get(item['codigo'], 0) + cantidad
+    return por_id, por_codigo
+
+
+def sugerir_pedido(proveedor, dias=30, dias_entrega=7, dias_cobertura=7, incluir_todos=False):
+    """
+    Calcula las cantidades a pedir para los productos del proveedor.
+
+    Retorna un diccionario cuyo campo 'items' ([{'producto', 'cantidad', ...}]) puede
+    enviarse tal cual a enviar_pedido.
+    """
+    from ventas.models import DetalleVenta
+
+    desde = timezone.now() - timedelta(days=dias)
+    vendidas = DetalleVenta.objects.filter(
+        producto=OuterRef('pk'),
+        venta__fecha__gte=desde
+    ).order_by().values('producto').annotate(total=Sum('cantidad')).values('total')
+
+    productos = Producto.objects.filter(
+        proveedor=proveedor,
+        activo=True
+    ).annotate(
+        vendidas=Coalesce(Subquery(vendidas, output_field=IntegerField()), Value(0))
+    ).values(
+        'id', 'codigo', 'nombre', 'unidad_medida', 'stock_actual', 'stock_minimo', 'vendidas'
+    ).order_by('nombre')
+
+    pendientes_id, pendientes_codigo = unidades_pendientes(proveedor)
+    horizonte = dias_entrega + dias_cobertura
+
+    items = []
+    for producto in productos:
+        venta_diaria = producto['vendidas'] / dias
+        pendiente = (
+            pendientes_id.get(producto['id'], 0) +
+            pendientes_codigo.get(producto['codigo'], 0)
+        )
+        objetivo = producto['stock_minimo'] + math.ceil(venta_diaria * horizonte)
+        cantidad = max(0, objetivo - producto['stock_actual'] - pendiente)
+
+        if cantidad == 0 and not incluir_todos:
+            continue
+
+        items.append({
+            'producto': producto['id'],
+            'codigo': producto['codigo'],
+            'nombre': producto['nombre'],
+            'unidad_medida': producto['unidad_medida'],
+            'stock_actual': producto['stock_actual'],
+            'stock_minimo': producto['stock_minimo'],
+            'vendidas_periodo': producto['vendidas'],
+            'venta_diaria': round(venta_diaria, 2),
+            'pendiente': pendiente,
+            'cantidad': cantidad,
+        })
+
+    return {
+        'proveedor': proveedor.id,
+        'proveedor_nombre': proveedor.nombre,
+        'parametros': {
+            'dias': dias,
+            'dias_entrega': dias_entrega,
+            'dias_cobertura': dias_cobertura,
+        },
+        'items': items,
+        'total_items': sum(item['cantidad'] for item in items),
+    }
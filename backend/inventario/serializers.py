@@ -1,25 +1,39 @@
 from rest_framework import serializers
+from erp_minimarket.campos import CamposDinamicosSerializerMixin
 from .models import Proveedor, Categoria, Producto, MovimientoStock, PedidoProveedor
 
 
-class ProveedorSerializer(serializers.ModelSerializer):
+class ProveedorSerializer(CamposDinamicosSerializerMixin, serializers.ModelSerializer):
+    perfiles = {'compacto': ['id', 'nombre', 'activo']}
+
     class Meta:
         model = Proveedor
         fields = '__all__'
 
 
-class CategoriaSerializer(serializers.ModelSerializer):
+class CategoriaSerializer(CamposDinamicosSerializerMixin, serializers.ModelSerializer):
+    perfiles = {'compacto': ['id', 'nombre']}
+
     class Meta:
         model = Categoria
         fields = '__all__'
 
 
-class ProductoSerializer(serializers.ModelSerializer):
+class ProductoSerializer(CamposDinamicosSerializerMixin, serializers.ModelSerializer):
     categoria_nombre = serializers.CharField(source='categoria.nombre', read_only=True)
     proveedor_nombre = serializers.CharField(source='proveedor.nombre', read_only=True)
     margen = serializers.SerializerMethodField()
     imagen_url = serializers.SerializerMethodField()
 
+    # Lo que usa el punto de venta: búsqueda por código, precio y stock
+    perfiles = {
+        'compacto': [
+            'id', 'codigo', 'codigo_barras', 'nombre', 'precio_venta', 'stock_actual',
+            'stock_minimo', 'unidad_medida', 'categoria', 'categoria_nombre', 'activo',
+        ],
+    }
+    columnas_campos = {'margen': ('costo', 'precio_venta'), 'imagen_url': ('imagen',)}
+
     class Meta:
         model = Producto
         fields = '__all__'
@@ -65,9 +79,15 @@ class ProductoSerializer(serializers.ModelSerializer):
         """Retorna la URL completa de la imagen"""
         if obj.imagen:
             request = self.context.get('request')
+            url = obj.imagen.url
+            if request and url.startswith('/'):
+                # build_absolute_uri valida el host en cada llamada: una vez por listado
+                if not hasattr(self, '_url_base'):
+                    self._url_base = request.build_absolute_uri('/')[:-1]
+                return self._url_base + url
             if request:
-                return request.build_absolute_uri(obj.imagen.url)
-            return obj.imagen.url
+                return request.build_absolute_uri(url)
+            return url
         return None
 
     def validate(self, data):
@@ -120,23 +140,85 @@ class ProductoSerializer(serializers.ModelSerializer):
         return data
 
 
-class MovimientoStockSerializer(serializers.ModelSerializer):
+class ProductoEnLoteField(serializers.PrimaryKeyRelatedField):
+    """
+    Producto de una línea (items de una venta o compra): la primera línea que se
+    valida carga los productos de todas las líneas del documento en una consulta,
+    en vez de una por línea. Ids inválidos o inexistentes se validan como siempre.
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, dict):
+            data = data.get('id')
+        producto = self._productos_del_documento().get(_como_id(data))
+        if producto is None:
+            return super().to_internal_value(data)
+        return producto
+
+    def _productos_del_documento(self):
+        raiz = self.root
+        productos = getattr(raiz, '_productos_en_lote', None)
+        if productos is None:
+            items = getattr(raiz, 'initial_data', {}).get('items') or []
+            ids = set()
+            for item in items:
+                producto = item.get('producto') if isinstance(item, dict) else None
+                if isinstance(producto, dict):
+                    producto = producto.get('id')
+                producto_id = _como_id(producto)
+                if producto_id is not None:
+                    ids.add(producto_id)
+            productos = raiz._productos_en_lote = self.get_queryset().in_bulk(ids)
+        return productos
+
+
+def _como_id(valor):
+    """Id entero de un valor recibido (int o texto con dígitos), o None"""
+    if isinstance(valor, int) and not isinstance(valor, bool):
+        return valor
+    if isinstance(valor, str) and valor.strip().isdigit():
+        return int(valor)
+    return None
+
+
+class ProductoBajoStockSerializer(serializers.ModelSerializer):
+    """Serializer compacto para el listado de stock bajo (dashboard)"""
+    categoria_nombre = serializers.CharField(source='categoria.nombre', read_only=True, default=None)
+
+    class Meta:
+        model = Producto
+        fields = [
+            'id', 'codigo', 'nombre', 'stock_actual', 'stock_minimo',
+            'unidad_medida', 'categoria_nombre', 'proveedor'
+        ]
+
+
+class MovimientoStockSerializer(CamposDinamicosSerializerMixin, serializers.ModelSerializer):
     producto_nombre = serializers.CharField(source='producto.nombre', read_only=True)
     producto_codigo = serializers.CharField(source='producto.codigo', read_only=True)
     tipo_display = serializers.CharField(source='get_tipo_display', read_only=True)
 
+    perfiles = {
+        'compacto': ['id', 'producto', 'producto_codigo', 'tipo', 'cantidad', 'stock_nuevo', 'fecha', 'usuario'],
+    }
+
     class Meta:
         model = MovimientoStock
         fields = '__all__'
         read_only_fields = ['stock_anterior', 'stock_nuevo', 'fecha']
 
 
-class PedidoProveedorSerializer(serializers.ModelSerializer):
+class PedidoProveedorSerializer(CamposDinamicosSerializerMixin, serializers.ModelSerializer):
     proveedor_nombre = serializers.CharField(source='proveedor.nombre', read_only=True)
     proveedor_email = serializers.CharField(source='proveedor.email', read_only=True)
     estado_display = serializers.CharField(source='get_estado_display', read_only=True)
     cantidad_productos = serializers.SerializerMethodField()
 
+    perfiles = {
+        'compacto': ['id', 'proveedor', 'proveedor_nombre', 'estado', 'fecha_envio', 'total_items'],
+    }
+    columnas_campos = {'cantidad_productos': ('items',)}
+
     class Meta:
         model = PedidoProveedor
         fields = '__all__'
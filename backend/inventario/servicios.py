@@ -0,0 +1,256 @@
+"""
+Operaciones de stock en bloque.
+
+Aplican deltas de stock a varios productos con un número constante de consultas:
+bloqueo de los productos afectados, un único UPDATE ... FROM (VALUES ...) y una
+inserción masiva de los movimientos correspondientes.
+
+También el registro de cambios del catálogo (CambioProducto) que usan las cajas
+para sincronizar solo lo que cambió.
+"""
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import CambioProducto, Producto, MovimientoStock, QuiebreStock
+
+
+class StockInsuficienteError(ValueError):
+    """El delta dejaría a un producto con stock negativo"""
+
+    def __init__(self, producto_nombre, stock_resultante):
+        self.producto_nombre = producto_nombre
+        self.stock_resultante = stock_resultante
+        super().__init__(
+            f'El producto {producto_nombre} tendría stock negativo ({stock_resultante}).'
+        )
+
+
+def deltas_de_detalles(detalles, signo):
+    """
+    Suma las cantidades de un queryset de detalles (DetalleVenta/DetalleCompra) por producto.
+
+    signo=1 suma stock (revertir una venta), signo=-1 lo descuenta (revertir una compra).
+    """
+    deltas = {}
+    for producto_id, cantidad in detalles.values_list('producto_id', 'cantidad'):
+        deltas[producto_id] = deltas.get(producto_id, 0) + signo * cantidad
+    return deltas
+
+
+def aplicar_deltas_stock(deltas, motivo, usuario, tipo_positivo='AJUSTE', tipo_negativo='AJUSTE',
+                         costos_entrada=None):
+    """
+    Aplica {producto_id: delta} al stock y registra un MovimientoStock por producto.
+
+    Los productos se bloquean (SELECT ... FOR UPDATE, en orden de id para evitar
+    deadlocks) antes de validar que ninguno quede con stock negativo. Los movimientos
+    de tipo ENTRADA/SALIDA registran la cantidad en valor absoluto; los AJUSTE con signo.
+
+    costos_entrada ({producto_id: costo total de lo que entra}, para compras) también
+    actualiza el costo de esos productos al promedio ponderado, como aplicar_compra.
+
+    Retorna la lista de cambios (producto_id, stock_anterior, stock_nuevo).
+    """
+    deltas = {producto_id: delta for producto_id, delta in deltas.items() if delta}
+    if not deltas:
+        return []
+
+    with transaction.atomic(savepoint=False):
+        productos = list(
+            Producto.objects.select_for_update()
+            .filter(id__in=deltas.keys())
+            .order_by('id')
+            .values('id', 'nombre', 'stock_actual', 'stock_minimo')
+        )
+
+        cambios = []
+        for producto in productos:
+            stock_anterior = producto['stock_actual']
+            stock_nuevo = stock_anterior + deltas[producto['id']]
+            if stock_nuevo < 0:
+                raise StockInsuficienteError(producto['nombre'], stock_nuevo)
+            cambios.append((producto['id'], stock_anterior, stock_nuevo, producto['stock_minimo']))
+
+        ahora = timezone.now()
+        costos_entrada = costos_entrada or {}
+        valores = ', '.join(['(%s, %s, %s::numeric)'] * len(cambios))
+        parametros = [ahora]
+        for producto_id, stock_anterior, stock_nuevo, _ in cambios:
+            parametros.extend([producto_id, stock_nuevo - stock_anterior, costos_entrada.get(producto_id)])
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                UPDATE {Producto._meta.db_table} AS p
+                SET stock_actual = p.stock_actual + v.delta,
+                    costo = CASE
+                        WHEN v.costo_entrada IS NULL OR p.stock_actual + v.delta <= 0 THEN p.costo
+                        ELSE (p.costo * p.stock_actual + v.costo_entrada) / (p.stock_actual + v.delta)
+                    END,
+                    fecha_actualizacion = %s
+                FROM (VALUES {valores}) AS v(id, delta, costo_entrada)
+                WHERE p.id = v.id
+                """,
+                parametros
+            )
+
+        movimientos = []
+        for producto_id, stock_anterior, stock_nuevo, _ in cambios:
+            delta = stock_nuevo - stock_anterior
+            tipo = tipo_positivo if delta > 0 else tipo_negativo
+            movimientos.append(MovimientoStock(
+                producto_id=producto_id,
+                tipo=tipo,
+                cantidad=abs(delta) if tipo in ('ENTRADA', 'SALIDA') else delta,
+                stock_anterior=stock_anterior,
+                stock_nuevo=stock_nuevo,
+                motivo=motivo,
+                usuario=usuario,
+            ))
+        MovimientoStock.objects.bulk_create(movimientos)
+
+        sincronizar_alertas(cambios)
+        registrar_cambios_productos([producto_id for producto_id, _, _, _ in cambios])
+        sincronizar_quiebres([
+            (m.producto_id, m.stock_anterior, m.stock_nuevo, m.fecha) for m in movimientos
+        ])
+
+        # bulk_create y el UPDATE no emiten señales: invalidar reportes explícitamente
+        from reportes.cache import incrementar_version
+        incrementar_version('inventario', [ahora])
+
+    return [(producto_id, anterior, nuevo) for producto_id, anterior, nuevo, _ in cambios]
+
+
+def registrar_cambios_productos(producto_ids, tipo='ACTUALIZADO'):
+    """
+    Marca los productos como cambiados por la transacción actual (una fila por
+    producto con su último cambio). Debe ejecutarse en la misma transacción que el
+    cambio, o después de confirmarlo.
+    """
+    producto_ids = list(producto_ids)
+    if not producto_ids:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {CambioProducto._meta.db_table} (producto_id, tipo, transaccion, fecha)
+            SELECT id, %s, pg_current_xact_id()::text::bigint, %s FROM UNNEST(%s::bigint[]) AS id
+            ON CONFLICT (producto_id) DO UPDATE
+            SET tipo = EXCLUDED.tipo, transaccion = EXCLUDED.transaccion, fecha = EXCLUDED.fecha
+            """,
+            [tipo, timezone.now(), producto_ids]
+        )
+
+
+def cambios_productos_desde(desde):
+    """
+    Retorna (version, cambios): la versión actual del catálogo y el queryset de
+    CambioProducto con lo cambiado desde `desde` (0 = todo el catálogo).
+
+    La versión es el xmin del snapshot de PostgreSQL: toda transacción con id menor
+    ya terminó y sus cambios se ven en la consulta de cambios, que se evalúa
+    después. Lo que hagan transacciones aún en curso queda con un id >= versión y
+    llega en la siguiente sincronización, así que no se pierde ningún cambio
+    aunque las transacciones confirmen en otro orden; a cambio, un producto puede
+    repetirse en dos sincronizaciones seguidas.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint')
+        version = cursor.fetchone()[0]
+
+    if desde:
+        cambios = CambioProducto.objects.filter(transaccion__gte=desde)
+    else:
+        cambios = CambioProducto.objects.exclude(tipo='ELIMINADO')
+    return version, cambios
+
+
+def sincronizar_alertas(cambios):
+    """
+    Crea o cierra alertas de stock bajo para una lista de
+    (producto_id, stock_anterior, stock_nuevo, stock_minimo) en consultas constantes.
+    """
+    from usuarios.models import AlertaStock
+
+    bajaron = [
+        producto_id for producto_id, anterior, nuevo, minimo in cambios
+        if anterior > minimo and nuevo <= minimo
+    ]
+    subieron = [
+        producto_id for producto_id, anterior, nuevo, minimo in cambios
+        if anterior <= minimo and nuevo > minimo
+    ]
+
+    if subieron:
+        AlertaStock.objects.filter(producto_id__in=subieron, leida=False).update(
+            leida=True,
+            fecha_lectura=timezone.now()
+        )
+
+    if bajaron:
+        con_alerta = set(
+            AlertaStock.objects.filter(producto_id__in=bajaron, leida=False)
+            .values_list('producto_id', flat=True)
+        )
+        AlertaStock.objects.bulk_create([
+            AlertaStock(producto_id=producto_id)
+            for producto_id in bajaron if producto_id not in con_alerta
+        ])
+
+
+def sincronizar_quiebres(cambios):
+    """
+    Abre o cierra intervalos de quiebre de stock para una lista de
+    (producto_id, stock_anterior, stock_nuevo, fecha del movimiento) en consultas constantes.
+    """
+    from django.db.models import Case, DateTimeField, Value, When
+
+    agotados = {
+        producto_id: fecha for producto_id, anterior, nuevo, fecha in cambios
+        if anterior > 0 and nuevo <= 0
+    }
+    repuestos = {
+        producto_id: fecha for producto_id, anterior, nuevo, fecha in cambios
+        if anterior <= 0 and nuevo > 0
+    }
+
+    if repuestos:
+        QuiebreStock.objects.filter(producto_id__in=repuestos, fin__isnull=True).update(fin=Case(
+            *[When(producto_id=producto_id, then=Value(fecha)) for producto_id, fecha in repuestos.items()],
+            output_field=DateTimeField()
+        ))
+
+    if agotados:
+        abiertos = set(
+            QuiebreStock.objects.filter(producto_id__in=agotados, fin__isnull=True)
+            .values_list('producto_id', flat=True)
+        )
+        QuiebreStock.objects.bulk_create([
+            QuiebreStock(producto_id=producto_id, inicio=fecha)
+            for producto_id, fecha in agotados.items() if producto_id not in abiertos
+        ])
+
+
+def reconstruir_quiebres():
+    """
+    Recalcula los intervalos de quiebre desde MovimientoStock: cada movimiento que
+    deja el stock en cero abre un intervalo que cierra el siguiente que lo repone.
+    Retorna la cantidad de intervalos generados.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {QuiebreStock._meta.db_table}')
+        cursor.execute(
+            f"""
+            INSERT INTO {QuiebreStock._meta.db_table} (producto_id, inicio, fin)
+            SELECT producto_id, fecha, siguiente
+            FROM (
+                SELECT producto_id, fecha, stock_nuevo <= 0 AS sin_stock,
+                       LEAD(fecha) OVER (PARTITION BY producto_id ORDER BY fecha, id) AS siguiente
+                FROM {MovimientoStock._meta.db_table}
+                WHERE (stock_anterior > 0) <> (stock_nuevo > 0)
+            ) cruces
+            WHERE sin_stock
+            """
+        )
+        return cursor.rowcount
@@ -0,0 +1,52 @@
+"""
+Mantenimiento de los intervalos de quiebre de stock y del registro de cambios del catálogo.
+
+Los movimientos creados uno a uno (ventas, compras, ajustes manuales) abren o cierran
+el intervalo aquí; aplicar_deltas_stock usa bulk_create, que no emite señales, y
+llama a sincronizar_quiebres directamente.
+
+Lo mismo con CambioProducto: los save()/delete() de productos se registran aquí y el
+UPDATE en bloque de aplicar_deltas_stock llama a registrar_cambios_productos.
+"""
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .models import Categoria, MovimientoStock, Producto, Proveedor
+from .servicios import registrar_cambios_productos, sincronizar_quiebres
+
+
+@receiver(post_save, sender=MovimientoStock)
+def registrar_quiebre(sender, instance, created, **kwargs):
+    if created:
+        sincronizar_quiebres(
+            [(instance.producto_id, instance.stock_anterior, instance.stock_nuevo, instance.fecha)]
+        )
+
+
+@receiver(post_save, sender=Producto)
+def registrar_cambio_producto(sender, instance, created, **kwargs):
+    if created:
+        tipo = 'CREADO'
+    else:
+        tipo = 'ACTUALIZADO' if instance.activo else 'DESACTIVADO'
+    registrar_cambios_productos([instance.pk], tipo)
+
+
+@receiver(post_delete, sender=Producto)
+def registrar_eliminacion_producto(sender, instance, **kwargs):
+    registrar_cambios_productos([instance.pk], 'ELIMINADO')
+
+
+@receiver(post_save, sender=Categoria)
+@receiver(post_save, sender=Proveedor)
+@receiver(pre_delete, sender=Categoria)
+@receiver(pre_delete, sender=Proveedor)
+def registrar_cambio_relacionado(sender, instance, **kwargs):
+    """
+    Los productos muestran el nombre de su categoría y proveedor; al eliminarlos,
+    Django les asigna NULL con un UPDATE que no pasa por save()
+    """
+    campo = 'categoria' if sender is Categoria else 'proveedor'
+    registrar_cambios_productos(
+        Producto.objects.filter(**{campo: instance}).values_list('id', flat=True)
+    )
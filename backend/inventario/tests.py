@@ -0,0 +1,396 @@
+import threading
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core import mail
+from django.db import connection, reset_queries, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from usuarios.models import AlertaStock, Configuracion, Usuario
+from ventas.models import DetalleVenta, Venta
+
+from .models import Categoria, MovimientoStock, PedidoProveedor, Producto, Proveedor
+from .servicios import StockInsuficienteError, aplicar_deltas_stock
+from .verificacion import CLAVE_MARCA, LIMITE_MAXIMO, obtener_marca, verificar_cadena_stock
+
+
+class VerificacionStockTest(TestCase):
+    """Cadena de movimientos: stock_anterior de cada uno = stock_nuevo del anterior"""
+
+    url = '/api/inventario/productos/verificar_stock/'
+
+    def setUp(self):
+        usuario = Usuario.objects.create_user(username='admin', password='admin', rol='ADMINISTRADOR')
+        self.client = APIClient()
+        self.client.force_authenticate(usuario)
+        self.productos = [
+            Producto.objects.create(
+                codigo=f'V{i}', nombre=f'Producto {i}', costo=Decimal('100'),
+                precio_venta=Decimal('150'), stock_actual=0
+            )
+            for i in range(2)
+        ]
+        ids = [producto.id for producto in self.productos]
+        aplicar_deltas_stock(dict.fromkeys(ids, 10), 'Compra', 'admin')
+        aplicar_deltas_stock(dict.fromkeys(ids, -3), 'Venta', 'admin')
+
+    def romper_cadena(self, producto, stock_anterior):
+        """Movimiento que no continúa la cadena (el stock final sigue cuadrando)"""
+        return MovimientoStock.objects.create(
+            producto=producto, tipo='AJUSTE', cantidad=0, stock_anterior=stock_anterior,
+            stock_nuevo=Producto.objects.get(id=producto.id).stock_actual, motivo='Prueba', usuario='admin'
+        )
+
+    def test_cadena_consistente(self):
+        resultado = verificar_cadena_stock()
+        self.assertEqual(resultado['modo'], 'completo')
+        self.assertTrue(resultado['consistente'])
+        self.assertEqual(resultado['productos_verificados'], 2)
+
+    def test_corte_en_la_cadena(self):
+        roto = self.romper_cadena(self.productos[0], stock_anterior=5)
+
+        resultado = verificar_cadena_stock()
+        self.assertFalse(resultado['consistente'])
+        self.assertEqual((resultado['total_cortes'], resultado['total_descuadres']), (1, 0))
+        corte = resultado['cortes'][0]
+        self.assertEqual(corte['movimiento_id'], roto.id)
+        self.assertEqual((corte['stock_anterior'], corte['stock_esperado']), (5, 7))
+
+    def test_descuadre_con_el_ultimo_movimiento_y_sin_movimientos(self):
+        Producto.objects.filter(id=self.productos[0].id).update(stock_actual=50)
+        sin_movimientos = Producto.objects.create(
+            codigo='V9', nombre='Sin historial', costo=Decimal('100'),
+            precio_venta=Decimal('150'), stock_actual=8
+        )
+
+        resultado = verificar_cadena_stock()
+        self.assertEqual(resultado['total_descuadres'], 2)
+        descuadres = {d['producto_id']: d for d in resultado['descuadres']}
+        self.assertEqual(descuadres[self.productos[0].id]['stock_segun_movimientos'], 7)
+        self.assertEqual(descuadres[sin_movimientos.id]['stock_segun_movimientos'], 0)
+        self.assertIsNone(descuadres[sin_movimientos.id]['ultimo_movimiento_id'])
+
+    def test_incremental_avanza_y_respeta_la_marca(self):
+        primero, segundo = self.productos
+        roto = self.romper_cadena(primero, stock_anterior=5)
+
+        # Con un corte la marca no avanza: la siguiente verificación lo vuelve a informar
+        for _ in range(2):
+            resultado = verificar_cadena_stock(incremental=True, actualizar_marca=True)
+            self.assertEqual((resultado['modo'], resultado['total_cortes']), ('completo', 1))
+            self.assertFalse(resultado['marca_actualizada'])
+            self.assertIsNone(obtener_marca())
+
+        # Corregido el corte, la marca avanza hasta el último movimiento
+        MovimientoStock.objects.filter(id=roto.id).update(stock_anterior=7)
+        resultado = verificar_cadena_stock(incremental=True, actualizar_marca=True)
+        self.assertTrue(resultado['consistente'])
+        marca = obtener_marca()
+        self.assertEqual(marca['movimiento_id'], MovimientoStock.objects.order_by('-id').first().id)
+
+        # Sin cambios desde la marca no se revisa ningún producto
+        resultado = verificar_cadena_stock(incremental=True, actualizar_marca=True)
+        self.assertEqual((resultado['modo'], resultado['productos_verificados']), ('incremental', 0))
+
+        # Solo se revisa lo nuevo
+        aplicar_deltas_stock({primero.id: -1}, 'Venta', 'admin')
+        resultado = verificar_cadena_stock(incremental=True, actualizar_marca=True)
+        self.assertEqual(resultado['productos_verificados'], 1)
+        self.assertTrue(resultado['consistente'])
+        self.assertGreater(obtener_marca()['movimiento_id'], marca['movimiento_id'])
+        marca = obtener_marca()
+
+        # Un corte posterior a la marca aparece en cada verificación hasta corregirlo
+        self.romper_cadena(segundo, stock_anterior=1)
+        for _ in range(2):
+            resultado = verificar_cadena_stock(incremental=True, actualizar_marca=True)
+            self.assertEqual(resultado['modo'], 'incremental')
+            self.assertEqual([c['producto_id'] for c in resultado['cortes']], [segundo.id])
+            self.assertEqual(obtener_marca(), marca)
+
+    def test_api_no_avanza_la_marca_y_valida_el_limite(self):
+        response = self.client.get(self.url, {'incremental': 'true'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['consistente'])
+        self.assertFalse(Configuracion.objects.filter(clave=CLAVE_MARCA).exists())
+
+        for limite in ('-1', '0', 'abc'):
+            with self.subTest(limite=limite):
+                self.assertEqual(self.client.get(self.url, {'limite': limite}).status_code, 400)
+
+        Producto.objects.filter(id=self.productos[0].id).update(stock_actual=50)
+        response = self.client.get(self.url, {'limite': LIMITE_MAXIMO * 10})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_descuadres'], 1)
+
+
+class DeltasStockTest(TestCase):
+    """aplicar_deltas_stock: todo o nada, en un número constante de consultas"""
+
+    def setUp(self):
+        self.productos = [
+            Producto.objects.create(
+                codigo=f'D{i}', nombre=f'Producto {i}', costo=Decimal('100'),
+                precio_venta=Decimal('150'), stock_actual=5, stock_minimo=2
+            )
+            for i in range(3)
+        ]
+
+    def test_stock_insuficiente_no_aplica_ningun_delta(self):
+        primero, segundo, tercero = self.productos
+
+        with self.assertRaises(StockInsuficienteError) as error, transaction.atomic():
+            aplicar_deltas_stock({primero.id: 3, segundo.id: -6, tercero.id: -1}, 'Venta', 'admin')
+
+        self.assertEqual((error.exception.producto_nombre, error.exception.stock_resultante), ('Producto 1', -1))
+        self.assertEqual(set(Producto.objects.values_list('stock_actual', flat=True)), {5})
+        self.assertFalse(MovimientoStock.objects.exists())
+        self.assertFalse(AlertaStock.objects.exists())
+
+    def test_consultas_constantes(self):
+        ids = [producto.id for producto in self.productos]
+        with CaptureQueriesContext(connection) as consultas:
+            aplicar_deltas_stock({ids[0]: -4}, 'Venta', 'admin', tipo_negativo='SALIDA')
+        esperadas = len(consultas)
+        with self.assertNumQueries(esperadas):
+            aplicar_deltas_stock(dict.fromkeys(ids[1:], -4), 'Venta', 'admin', tipo_negativo='SALIDA')
+
+        self.assertEqual(set(Producto.objects.values_list('stock_actual', flat=True)), {1})
+        self.assertEqual(set(MovimientoStock.objects.values_list('tipo', 'cantidad')), {('SALIDA', 4)})
+        self.assertEqual(AlertaStock.objects.filter(leida=False).count(), 3)
+
+
+class BajoStockTest(TestCase):
+    """Listado de stock bajo: perfil compacto, paginación e índice parcial"""
+
+    url = '/api/inventario/productos/bajo_stock/'
+
+    def setUp(self):
+        usuario = Usuario.objects.create_user(username='admin', password='admin', rol='ADMINISTRADOR')
+        self.client = APIClient()
+        self.client.force_authenticate(usuario)
+        categoria = Categoria.objects.create(nombre='Abarrotes')
+        for i, (stock, activo) in enumerate([(0, True), (2, True), (5, True), (1, True), (3, True), (1, False), (9, True)]):
+            Producto.objects.create(
+                codigo=f'B{i}', nombre=f'Producto {i}', costo=Decimal('100'), precio_venta=Decimal('150'),
+                stock_actual=stock, stock_minimo=5, activo=activo, categoria=categoria
+            )
+
+    def test_lista_completa_sin_paginar(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p['codigo'] for p in response.data], ['B0', 'B1', 'B2', 'B3', 'B4'])
+        self.assertIn('margen', response.data[0])
+
+    def test_pagina_compacta(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, {'compacto': 'true', 'page_size': 2, 'page': 2})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 5)
+        self.assertIsNotNone(response.data['next'])
+        self.assertIsNotNone(response.data['previous'])
+        self.assertEqual([p['codigo'] for p in response.data['results']], ['B2', 'B3'])
+        self.assertEqual(set(response.data['results'][0]), {
+            'id', 'codigo', 'nombre', 'stock_actual', 'stock_minimo',
+            'unidad_medida', 'categoria_nombre', 'proveedor'
+        })
+        self.assertEqual(response.data['results'][0]['categoria_nombre'], 'Abarrotes')
+
+        ultima = self.client.get(self.url, {'compacto': 'true', 'page_size': 2, 'page': 3})
+        self.assertEqual([p['codigo'] for p in ultima.data['results']], ['B4'])
+        self.assertIsNone(ultima.data['next'])
+
+    def test_el_filtro_usa_el_indice_parcial(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT pg_get_expr(i.indpred, i.indrelid) FROM pg_index i "
+                "JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = 'inventario_prod_bajo_stock_idx'"
+            )
+            self.assertEqual(cursor.fetchone()[0], '(activo AND (stock_actual <= stock_minimo))')
+
+        reset_queries()
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.get(self.url, {'compacto': 'true'})
+        consulta = consultas.captured_queries[-1]['sql']
+
+        # El planificador solo puede usar el índice parcial si el filtro implica su condición
+        self.assertIn('inventario_prod_bajo_stock_idx', self.plan(consulta))
+        self.assertNotIn('inventario_prod_bajo_stock_idx', self.plan(consulta.replace('<=', '>=')))
+
+    def plan(self, consulta):
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('SET LOCAL enable_bitmapscan = off')
+            cursor.execute(f'EXPLAIN {consulta}')
+            return '\n'.join(fila[0] for fila in cursor.fetchall())
+
+
+@override_settings(DEFAULT_FROM_EMAIL='minimarket@example.com')
+class PedidoProveedorTest(TestCase):
+    """Sugerencia de pedido y su envío al proveedor"""
+
+    def setUp(self):
+        usuario = Usuario.objects.create_user(username='admin', password='admin', rol='ADMINISTRADOR')
+        self.client = APIClient()
+        self.client.force_authenticate(usuario)
+        self.proveedor = Proveedor.objects.create(nombre='Distribuidora', email='ventas@distribuidora.cl')
+        otro = Proveedor.objects.create(nombre='Otro', email='otro@example.com')
+
+        def producto(codigo, stock, **kwargs):
+            return Producto.objects.create(
+                codigo=codigo, nombre=f'Producto {codigo}', costo=Decimal('100'), precio_venta=Decimal('150'),
+                stock_actual=stock, stock_minimo=5, **{'proveedor': self.proveedor, **kwargs}
+            )
+
+        self.vendido = producto('A', 2)
+        self.surtido = producto('B', 50)
+        inactivo = producto('C', 0, activo=False)
+        ajeno = producto('D', 0, proveedor=otro)
+
+        # 30 unidades en los últimos 30 días (1 diaria) y 90 de hace dos meses
+        for fecha, cantidad in ((timezone.now() - timedelta(days=3), 30), (timezone.now() - timedelta(days=60), 90)):
+            venta = Venta.objects.create(numero_boleta=f'BOL-{cantidad}', fecha=fecha, usuario='admin')
+            for vendido in (self.vendido, inactivo, ajeno):
+                DetalleVenta.objects.create(
+                    venta=venta, producto=vendido, cantidad=cantidad, precio_unitario=Decimal('150')
+                )
+
+    def url(self, accion):
+        return f'/api/inventario/proveedores/{self.proveedor.id}/{accion}/'
+
+    def test_sugerencia_segun_venta_diaria(self):
+        response = self.client.get(self.url('sugerencia_pedido'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['parametros'], {'dias': 30, 'dias_entrega': 7, 'dias_cobertura': 7})
+        # objetivo = mínimo 5 + 1 diaria * 14 días; faltan 19 - 2
+        [item] = response.data['items']
+        self.assertEqual(
+            (item['producto'], item['vendidas_periodo'], item['venta_diaria'], item['cantidad']),
+            (self.vendido.id, 30, 1.0, 17)
+        )
+        self.assertEqual(response.data['total_items'], 17)
+
+        todos = self.client.get(self.url('sugerencia_pedido'), {'todos': 'true', 'dias_cobertura': 0})
+        self.assertEqual(
+            [(item['codigo'], item['cantidad']) for item in todos.data['items']], [('A', 10), ('B', 0)]
+        )
+
+    def test_sugerencia_valida_los_dias(self):
+        for parametros in ({'dias': 'x'}, {'dias': 0}, {'dias_entrega': -1}):
+            with self.subTest(parametros=parametros):
+                response = self.client.get(self.url('sugerencia_pedido'), parametros)
+                self.assertEqual(response.status_code, 400)
+
+    def test_la_sugerencia_enviada_queda_pendiente(self):
+        sugerencia = self.client.get(self.url('sugerencia_pedido')).data
+
+        response = self.client.post(self.url('enviar_pedido'), {'items': sugerencia['items']}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mail.outbox[0].to, ['ventas@distribuidora.cl'])
+        pedido = PedidoProveedor.objects.get(id=response.data['pedido_id'])
+        self.assertEqual((pedido.total_items, pedido.items[0]['producto']), (17, self.vendido.id))
+
+        # Lo ya pedido se descuenta de la siguiente sugerencia
+        self.assertEqual(self.client.get(self.url('sugerencia_pedido')).data['items'], [])
+
+    def test_enviar_pedido_rechaza_productos_inexistentes(self):
+        items = [
+            {'producto': self.vendido.id, 'cantidad': 1},
+            {'producto': 999999, 'cantidad': 1},
+            {'producto': 'abc', 'cantidad': 1},
+            {'cantidad': 1},
+        ]
+
+        response = self.client.post(self.url('enviar_pedido'), {'items': items}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['productos_no_encontrados'], [999999, 'abc', None])
+        self.assertEqual(mail.outbox, [])
+        self.assertFalse(PedidoProveedor.objects.exists())
+
+
+class CambiosCatalogoTest(TransactionTestCase):
+    """Con transacciones reales: la versión depende de qué transacciones ya terminaron"""
+
+    url = '/api/inventario/productos/cambios/'
+
+    def setUp(self):
+        usuario = Usuario.objects.create_user(username='caja', password='caja', rol='VENDEDOR')
+        self.client = APIClient()
+        self.client.force_authenticate(usuario)
+        self.productos = [
+            Producto.objects.create(
+                codigo=f'C{i}', nombre=f'Producto {i}', costo=Decimal('100'),
+                precio_venta=Decimal('150'), stock_actual=10
+            )
+            for i in range(2)
+        ]
+
+    def sincronizar(self, desde=0):
+        response = self.client.get(self.url, {'desde': desde})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def ids(self, datos):
+        return sorted(producto['id'] for producto in datos['productos'])
+
+    def test_solo_retorna_lo_cambiado(self):
+        primero, segundo = self.productos
+        inicial = self.sincronizar()
+        self.assertTrue(inicial['completo'])
+        self.assertEqual(self.ids(inicial), [primero.id, segundo.id])
+
+        self.assertEqual(self.sincronizar(inicial['version'])['productos'], [])
+
+        aplicar_deltas_stock({primero.id: -3}, 'Venta', 'caja')
+        datos = self.sincronizar(inicial['version'])
+        self.assertEqual(self.ids(datos), [primero.id])
+        self.assertEqual(datos['productos'][0]['stock_actual'], 7)
+
+        segundo.activo = False
+        segundo.save()
+        datos = self.sincronizar(datos['version'])
+        self.assertEqual(self.ids(datos), [segundo.id])
+        self.assertFalse(datos['productos'][0]['activo'])
+
+        segundo_id = segundo.id
+        segundo.delete()
+        datos = self.sincronizar(datos['version'])
+        self.assertEqual(datos['productos'], [])
+        self.assertEqual(datos['eliminados'], [segundo_id])
+
+    def test_cambio_de_una_transaccion_en_curso_llega_despues(self):
+        producto = self.productos[0]
+        escrito, confirmar = threading.Event(), threading.Event()
+
+        def venta_lenta():
+            try:
+                with transaction.atomic():
+                    aplicar_deltas_stock({producto.id: -1}, 'Venta', 'caja')
+                    escrito.set()
+                    confirmar.wait(10)
+            finally:
+                connection.close()
+
+        hilo = threading.Thread(target=venta_lenta)
+        hilo.start()
+        escrito.wait(10)
+        durante = self.sincronizar(self.sincronizar()['version'])
+        confirmar.set()
+        hilo.join()
+
+        self.assertEqual(durante['productos'], [])
+        datos = self.sincronizar(durante['version'])
+        self.assertEqual(self.ids(datos), [producto.id])
+        self.assertEqual(datos['productos'][0]['stock_actual'], 9)
+
+    def test_version_invalida(self):
+        self.assertEqual(self.client.get(self.url, {'desde': 'abc'}).status_code, 400)
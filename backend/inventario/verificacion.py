@@ -0,0 +1,234 @@
+"""
+Verificación de consistencia entre Producto.stock_actual y la cadena de MovimientoStock.
+
+Cada movimiento registra stock_anterior y stock_nuevo, por lo que la cadena de un
+producto es consistente cuando el stock_anterior de cada movimiento coincide con el
+stock_nuevo del movimiento previo, y el último stock_nuevo coincide con stock_actual.
+"""
+import json
+
+from django.db import connection
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Producto, MovimientoStock
+
+CLAVE_MARCA = 'verificacion_stock_marca'
+
+# Máximo de cortes/descuadres que se detallan en una respuesta de la API
+LIMITE_MAXIMO = 5000
+
+
+def obtener_marca():
+    """Retorna la última marca verificada ({'movimiento_id', 'fecha'}) o None"""
+    from usuarios.models import Configuracion
+
+    valor = Configuracion.obtener_valor(CLAVE_MARCA, '')
+    if not valor:
+        return None
+    try:
+        marca = json.loads(valor)
+        return {
+            'movimiento_id': int(marca['movimiento_id']),
+            'fecha': marca['fecha'],
+        }
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def guardar_marca(marca):
+    """Guarda la marca hasta la cual la cadena quedó verificada"""
+    from usuarios.models import Configuracion
+
+    Configuracion.establecer_valor(
+        CLAVE_MARCA,
+        json.dumps(marca),
+        'Último movimiento de stock verificado por verificar_stock'
+    )
+
+
+def _productos_afectados(marca):
+    """IDs de productos con movimientos o cambios posteriores a la marca"""
+    con_movimientos = MovimientoStock.objects.filter(
+        id__gt=marca['movimiento_id']
+    ).values_list('producto_id', flat=True).distinct()
+
+    ids = set(con_movimientos)
+
+    fecha = parse_datetime(marca['fecha']) if marca.get('fecha') else None
+    if fecha:
+        ids.update(
+            Producto.objects.filter(fecha_actualizacion__gt=fecha).values_list('id', flat=True)
+        )
+    return sorted(ids)
+
+
+def _buscar_cortes(productos_ids, marca_id, limite):
+    """
+    Movimientos cuyo stock_anterior no coincide con el stock_nuevo del movimiento previo.
+
+    En modo incremental solo se revisa, por producto, desde el último movimiento ya
+    verificado (el ancla) en adelante, usando el índice (producto, id).
+    """
+    movimientos = MovimientoStock._meta.db_table
+    productos = Producto._meta.db_table
+
+    if productos_ids is None:
+        origen = f'SELECT id, producto_id, fecha, stock_anterior, stock_nuevo FROM {movimientos}'
+        params = {}
+    else:
+        origen = f"""
+            SELECT m.id, m.producto_id, m.fecha, m.stock_anterior, m.stock_nuevo
+            FROM unnest(%(productos)s::bigint[]) AS a(producto_id)
+            CROSS JOIN LATERAL (
+                SELECT COALESCE(MAX(x.id), 0) AS desde_id
+                FROM {movimientos} x
+                WHERE x.producto_id = a.producto_id AND x.id <= %(marca)s
+            ) ancla
+            JOIN {movimientos} m ON m.producto_id = a.producto_id AND m.id >= ancla.desde_id
+        """
+        params = {'productos': list(productos_ids), 'marca': marca_id}
+
+    sql = f"""
+        SELECT c.producto_id, p.codigo, p.nombre, c.id, c.movimiento_previo,
+               c.fecha, c.stock_anterior, c.stock_previo,
+               COUNT(*) OVER () AS total
+        FROM (
+            SELECT o.*,
+                   LAG(o.stock_nuevo) OVER w AS stock_previo,
+                   LAG(o.id) OVER w AS movimiento_previo
+            FROM ({origen}) o
+            WINDOW w AS (PARTITION BY o.producto_id ORDER BY o.id)
+        ) c
+        JOIN {productos} p ON p.id = c.producto_id
+        WHERE c.movimiento_previo IS NOT NULL
+          AND c.stock_anterior <> c.stock_previo
+        ORDER BY c.producto_id, c.id
+        LIMIT %(limite)s
+    """
+    params['limite'] = limite
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        filas = cursor.fetchall()
+
+    total = filas[0][-1] if filas else 0
+    cortes = [
+        {
+            'producto_id': fila[0],
+            'producto_codigo': fila[1],
+            'producto_nombre': fila[2],
+            'movimiento_id': fila[3],
+            'movimiento_previo_id': fila[4],
+            'fecha': fila[5].isoformat(),
+            'stock_anterior': fila[6],
+            'stock_esperado': fila[7],
+        }
+        for fila in filas
+    ]
+    return cortes, total
+
+
+def _buscar_descuadres(productos_ids, limite):
+    """
+    Productos cuyo stock_actual difiere del stock_nuevo de su último movimiento.
+    Un producto sin movimientos debería tener stock 0.
+    """
+    movimientos = MovimientoStock._meta.db_table
+    productos = Producto._meta.db_table
+
+    filtro = ''
+    params = {'limite': limite}
+    if productos_ids is not None:
+        filtro = 'AND p.id = ANY(%(productos)s::bigint[])'
+        params['productos'] = list(productos_ids)
+
+    sql = f"""
+        SELECT p.id, p.codigo, p.nombre, p.stock_actual, COALESCE(u.stock_nuevo, 0), u.id,
+               COUNT(*) OVER () AS total
+        FROM {productos} p
+        LEFT JOIN LATERAL (
+            SELECT m.id, m.stock_nuevo
+            FROM {movimientos} m
+            WHERE m.producto_id = p.id
+            ORDER BY m.id DESC
+            LIMIT 1
+        ) u ON TRUE
+        WHERE p.stock_actual <> COALESCE(u.stock_nuevo, 0) {filtro}
+        ORDER BY p.id
+        LIMIT %(limite)s
+    """
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        filas = cursor.fetchall()
+
+    total = filas[0][-1] if filas else 0
+    descuadres = [
+        {
+            'producto_id': fila[0],
+            'producto_codigo': fila[1],
+            'producto_nombre': fila[2],
+            'stock_actual': fila[3],
+            'stock_segun_movimientos': fila[4],
+            'ultimo_movimiento_id': fila[5],
+        }
+        for fila in filas
+    ]
+    return descuadres, total
+
+
+def verificar_cadena_stock(incremental=False, actualizar_marca=False, limite=None):
+    """
+    Verifica la cadena de movimientos de stock.
+
+    - incremental: solo revisa productos con movimientos (o cambios) posteriores a la
+      última marca verificada. Sin marca previa se hace una verificación completa.
+    - actualizar_marca: guarda la nueva marca al terminar (uso nocturno), solo si la
+      cadena es consistente: con cortes o descuadres sin corregir la marca no avanza y
+      la próxima verificación incremental los vuelve a revisar e informar.
+    - limite: máximo de cortes/descuadres a detallar (los totales siempre se informan).
+    """
+    marca_anterior = obtener_marca() if incremental else None
+
+    # La nueva marca se toma antes de verificar para no saltar movimientos concurrentes
+    marca_nueva = {
+        'movimiento_id': MovimientoStock.objects.aggregate(ultimo=Max('id'))['ultimo'] or 0,
+        'fecha': timezone.now().isoformat(),
+    }
+
+    if marca_anterior:
+        modo = 'incremental'
+        productos_ids = _productos_afectados(marca_anterior)
+        productos_verificados = len(productos_ids)
+        marca_id = marca_anterior['movimiento_id']
+    else:
+        modo = 'completo'
+        productos_ids = None
+        productos_verificados = Producto.objects.count()
+        marca_id = 0
+
+    if productos_ids == []:
+        cortes, total_cortes, descuadres, total_descuadres = [], 0, [], 0
+    else:
+        cortes, total_cortes = _buscar_cortes(productos_ids, marca_id, limite)
+        descuadres, total_descuadres = _buscar_descuadres(productos_ids, limite)
+
+    consistente = total_cortes == 0 and total_descuadres == 0
+    marca_actualizada = actualizar_marca and consistente
+    if marca_actualizada:
+        guardar_marca(marca_nueva)
+
+    return {
+        'modo': modo,
+        'marca_anterior': marca_anterior,
+        'marca_nueva': marca_nueva,
+        'marca_actualizada': marca_actualizada,
+        'productos_verificados': productos_verificados,
+        'consistente': consistente,
+        'total_cortes': total_cortes,
+        'total_descuadres': total_descuadres,
+        'cortes': cortes,
+        'descuadres': descuadres,
+    }
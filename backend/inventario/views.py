@@ -2,34 +2,78 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.pagination import PageNumberPagination
 from django.db import transaction
 from django.db.models import F
 from django.utils import timezone
-from django.core.cache import cache
+from .cache import cache
 from django.views.decorators.cache import cache_page
 from django.utils.decorators import method_decorator
+from erp_minimarket.asincrono import AccionesAsincronasMixin
+from erp_minimarket.campos import CamposDinamicosMixin
+from erp_minimarket.condicional import ListadoCondicionalMixin
 from usuarios.permissions import PuedeProductos, EsAdministradorOReadOnly
 from .models import Proveedor, Categoria, Producto, MovimientoStock, PedidoProveedor
 from .serializers import (
     ProveedorSerializer,
     CategoriaSerializer,
     ProductoSerializer,
+    ProductoBajoStockSerializer,
     MovimientoStockSerializer,
     PedidoProveedorSerializer
 )
 
 
-class ProveedorViewSet(viewsets.ModelViewSet):
+class BajoStockPagination(PageNumberPagination):
+    """Paginación opcional del listado de stock bajo (?page=&page_size=)"""
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+class ProveedorViewSet(AccionesAsincronasMixin, ListadoCondicionalMixin, CamposDinamicosMixin, viewsets.ModelViewSet):
     queryset = Proveedor.objects.filter(activo=True)
     serializer_class = ProveedorSerializer
     search_fields = ['nombre', 'rut', 'contacto']
     permission_classes = [IsAuthenticated, EsAdministradorOReadOnly]  # Lectura para todos, escritura solo admin
 
     @action(detail=True, methods=['post'])
-    def enviar_pedido(self, request, pk=None):
-        """Enviar correo de pedido a un proveedor"""
+    async def enviar_pedido(self, request, pk=None):
+        """
+        Enviar correo de pedido a un proveedor.
+
+        Asíncrona: la espera del servidor SMTP no ocupa un worker. Las consultas y el
+        registro del pedido corren con sync_to_async y el envío en el pool de hilos.
+        """
+        from asgiref.sync import sync_to_async
         from django.core.mail import send_mail
-        from django.template.loader import render_to_string
+
+        preparado = await sync_to_async(self._preparar_pedido)(request)
+        if isinstance(preparado, Response):
+            return preparado
+
+        try:
+            await sync_to_async(send_mail, thread_sensitive=False)(
+                subject=preparado['asunto'],
+                message=preparado['mensaje_texto'],
+                from_email=preparado['from_email'],
+                recipient_list=[preparado['proveedor'].email],
+                html_message=preparado['mensaje_html'],
+                fail_silently=False,
+            )
+            pedido = await sync_to_async(self._registrar_pedido)(request, preparado)
+
+            return Response({
+                'mensaje': f'Correo enviado exitosamente a {pedido.email_enviado}',
+                'email_enviado': True,
+                'destinatario': pedido.email_enviado,
+                'pedido_id': pedido.id
+            }, status=status.HTTP_200_OK)
+
+        except Exception as e:
+            return self._error_correo(e)
+
+    def _preparar_pedido(self, request):
+        """Proveedor y contenido del correo de enviar_pedido, o la Response de error"""
         from django.conf import settings
         from datetime import datetime
         from usuarios.models import Configuracion
@@ -55,26 +99,40 @@ class ProveedorViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Obtener información de los productos
-        productos_info = []
+        # Obtener información de los productos (una sola consulta); todos deben existir
+        ids = []
         for item in items:
-            try:
-                producto = Producto.objects.get(id=item.get('producto'))
-                cantidad = item.get('cantidad', 1)
-                productos_info.append({
-                    'codigo': producto.codigo,
-                    'nombre': producto.nombre,
-                    'cantidad': cantidad,
-                    'unidad_medida': producto.unidad_medida,
-                })
-            except Producto.DoesNotExist:
-                continue
-        
-        if not productos_info:
+            producto_id = item.get('producto')
+            if isinstance(producto_id, str) and producto_id.strip().isdigit():
+                producto_id = int(producto_id)
+            if not isinstance(producto_id, int) or isinstance(producto_id, bool):
+                producto_id = None
+            ids.append(producto_id)
+        productos = Producto.objects.in_bulk([producto_id for producto_id in ids if producto_id is not None])
+        no_encontrados = [
+            item.get('producto') for item, producto_id in zip(items, ids) if producto_id not in productos
+        ]
+
+        if no_encontrados:
             return Response(
-                {'error': 'No se encontraron productos válidos'},
+                {
+                    'error': 'Algunos productos del pedido no existen',
+                    'productos_no_encontrados': no_encontrados
+                },
                 status=status.HTTP_400_BAD_REQUEST
             )
+
+        productos_info = []
+        for item, producto_id in zip(items, ids):
+            producto = productos[producto_id]
+            cantidad = item.get('cantidad', 1)
+            productos_info.append({
+                'producto': producto.id,
+                'codigo': producto.codigo,
+                'nombre': producto.nombre,
+                'cantidad': cantidad,
+                'unidad_medida': producto.unidad_medida,
+            })
         
         # Formatear fecha estimada
         fecha_estimada_str = ''
@@ -289,79 +347,115 @@ Este es un correo automático generado por nuestro sistema de gestión.
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
         
-        try:
-            send_mail(
-                subject=asunto,
-                message=mensaje_texto,
-                from_email=from_email,
-                recipient_list=[proveedor.email],
-                html_message=mensaje_html,
-                fail_silently=False,
+        return {
+            'proveedor': proveedor,
+            'asunto': asunto,
+            'mensaje_texto': mensaje_texto,
+            'mensaje_html': mensaje_html,
+            'from_email': from_email,
+            'productos_info': productos_info,
+            'notas': notas,
+            'fecha_estimada': fecha_estimada,
+        }
+
+    def _registrar_pedido(self, request, preparado):
+        """Guarda en el historial el pedido ya enviado"""
+        from .models import PedidoProveedor
+        from datetime import datetime as dt
+        
+        fecha_estimada_obj = None
+        if preparado['fecha_estimada']:
+            try:
+                fecha_estimada_obj = dt.strptime(preparado['fecha_estimada'], '%Y-%m-%d').date()
+            except:
+                pass
+        
+        productos_info = preparado['productos_info']
+        total_items = sum(item['cantidad'] for item in productos_info)
+        
+        return PedidoProveedor.objects.create(
+            proveedor=preparado['proveedor'],
+            fecha_estimada_entrega=fecha_estimada_obj,
+            notas=preparado['notas'],
+            email_enviado=preparado['proveedor'].email,
+            usuario=request.user.username if request.user.is_authenticated else 'Sistema',
+            items=productos_info,
+            total_items=total_items,
+            estado='ENVIADO'
+        )
+
+    def _error_correo(self, e):
+        """Response con un mensaje claro para los errores comunes de envío"""
+        error_msg = str(e)
+        # Mensajes más claros para errores comunes de Gmail
+        if '535' in error_msg or 'BadCredentials' in error_msg or 'Username and Password not accepted' in error_msg:
+            mensaje_error = (
+                'Error de autenticación con Gmail. Por favor, verifica:\n'
+                '1. Que estés usando una "Contraseña de aplicación" (App Password) y no tu contraseña normal\n'
+                '2. Que la contraseña de aplicación sea correcta\n'
+                '3. Que la verificación en dos pasos esté habilitada en tu cuenta de Gmail\n'
+                'Para generar una contraseña de aplicación: https://myaccount.google.com/apppasswords'
             )
-            
-            # Guardar el pedido en el historial
-            from .models import PedidoProveedor
-            from datetime import datetime as dt
-            
-            fecha_estimada_obj = None
-            if fecha_estimada:
-                try:
-                    fecha_estimada_obj = dt.strptime(fecha_estimada, '%Y-%m-%d').date()
-                except:
-                    pass
-            
-            total_items = sum(item['cantidad'] for item in productos_info)
-            
-            pedido = PedidoProveedor.objects.create(
-                proveedor=proveedor,
-                fecha_estimada_entrega=fecha_estimada_obj,
-                notas=notas,
-                email_enviado=proveedor.email,
-                usuario=request.user.username if request.user.is_authenticated else 'Sistema',
-                items=productos_info,
-                total_items=total_items,
-                estado='ENVIADO'
+        elif 'Connection refused' in error_msg or 'Network' in error_msg:
+            mensaje_error = 'Error de conexión con el servidor de correo. Verifica tu conexión a internet.'
+        elif 'timeout' in error_msg.lower():
+            mensaje_error = 'Tiempo de espera agotado al conectar con el servidor de correo.'
+        elif 'Invalid address' in error_msg or 'from_email' in error_msg.lower():
+            mensaje_error = (
+                'Error de configuración de correo. El campo "from_email" está vacío.\n'
+                'Por favor, configura las siguientes variables en tu archivo .env:\n'
+                '1. EMAIL_HOST_USER=tu-email@gmail.com\n'
+                '2. EMAIL_HOST_PASSWORD=tu-contraseña-de-aplicación\n'
+                '3. DEFAULT_FROM_EMAIL=tu-email@gmail.com\n\n'
+                'Consulta el archivo CONFIGURACION_EMAIL.md para más detalles.'
             )
-            
-            return Response({
-                'mensaje': f'Correo enviado exitosamente a {proveedor.email}',
-                'email_enviado': True,
-                'destinatario': proveedor.email,
-                'pedido_id': pedido.id
-            }, status=status.HTTP_200_OK)
-            
-        except Exception as e:
-            error_msg = str(e)
-            # Mensajes más claros para errores comunes de Gmail
-            if '535' in error_msg or 'BadCredentials' in error_msg or 'Username and Password not accepted' in error_msg:
-                mensaje_error = (
-                    'Error de autenticación con Gmail. Por favor, verifica:\n'
-                    '1. Que estés usando una "Contraseña de aplicación" (App Password) y no tu contraseña normal\n'
-                    '2. Que la contraseña de aplicación sea correcta\n'
-                    '3. Que la verificación en dos pasos esté habilitada en tu cuenta de Gmail\n'
-                    'Para generar una contraseña de aplicación: https://myaccount.google.com/apppasswords'
-                )
-            elif 'Connection refused' in error_msg or 'Network' in error_msg:
-                mensaje_error = 'Error de conexión con el servidor de correo. Verifica tu conexión a internet.'
-            elif 'timeout' in error_msg.lower():
-                mensaje_error = 'Tiempo de espera agotado al conectar con el servidor de correo.'
-            elif 'Invalid address' in error_msg or 'from_email' in error_msg.lower():
-                mensaje_error = (
-                    'Error de configuración de correo. El campo "from_email" está vacío.\n'
-                    'Por favor, configura las siguientes variables en tu archivo .env:\n'
-                    '1. EMAIL_HOST_USER=tu-email@gmail.com\n'
-                    '2. EMAIL_HOST_PASSWORD=tu-contraseña-de-aplicación\n'
-                    '3. DEFAULT_FROM_EMAIL=tu-email@gmail.com\n\n'
-                    'Consulta el archivo CONFIGURACION_EMAIL.md para más detalles.'
-                )
-            else:
-                mensaje_error = f'Error al enviar el correo: {error_msg}'
-            
+        else:
+            mensaje_error = f'Error al enviar el correo: {error_msg}'
+        
+        return Response(
+            {'error': mensaje_error},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+    @action(detail=True, methods=['get'])
+    def sugerencia_pedido(self, request, pk=None):
+        """
+        Sugerencia de pedido para los productos del proveedor.
+
+        Parámetros: dias (ventas consideradas, 30), dias_entrega (7), dias_cobertura (7)
+        y todos=true para incluir productos sin cantidad sugerida. Los 'items' de la
+        respuesta se pueden enviar directamente a enviar_pedido.
+        """
+        from .reposicion import sugerir_pedido
+
+        proveedor = self.get_object()
+
+        try:
+            dias = int(request.query_params.get('dias', 30))
+            dias_entrega = int(request.query_params.get('dias_entrega', 7))
+            dias_cobertura = int(request.query_params.get('dias_cobertura', 7))
+        except ValueError:
             return Response(
-                {'error': mensaje_error},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                {'error': 'Los parámetros de días deben ser números enteros'},
+                status=status.HTTP_400_BAD_REQUEST
             )
 
+        if dias <= 0 or dias_entrega < 0 or dias_cobertura < 0:
+            return Response(
+                {'error': 'Los parámetros de días deben ser positivos'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        incluir_todos = request.query_params.get('todos', 'false').lower() == 'true'
+        sugerencia = sugerir_pedido(
+            proveedor,
+            dias=dias,
+            dias_entrega=dias_entrega,
+            dias_cobertura=dias_cobertura,
+            incluir_todos=incluir_todos
+        )
+        return Response(sugerencia)
+
     @action(detail=False, methods=['get'])
     def exportar_csv(self, request):
         """Exportar proveedores a Excel con diseño mejorado"""
@@ -490,17 +584,19 @@ Este es un correo automático generado por nuestro sistema de gestión.
         return response
 
 
-class CategoriaViewSet(viewsets.ModelViewSet):
+class CategoriaViewSet(ListadoCondicionalMixin, CamposDinamicosMixin, viewsets.ModelViewSet):
     queryset = Categoria.objects.filter(activa=True)
     serializer_class = CategoriaSerializer
     search_fields = ['nombre']
     permission_classes = [IsAuthenticated, EsAdministradorOReadOnly]  # Lectura para todos, escritura solo admin
 
 
-class ProductoViewSet(viewsets.ModelViewSet):
+class ProductoViewSet(ListadoCondicionalMixin, CamposDinamicosMixin, viewsets.ModelViewSet):
     queryset = Producto.objects.select_related('categoria', 'proveedor').all()
     serializer_class = ProductoSerializer
     search_fields = ['codigo', 'nombre', 'codigo_barras']
+    relaciones_version = ('categoria', 'proveedor')  # categoria_nombre y proveedor_nombre
+    acciones_campos = ('list', 'retrieve', 'cambios')
     permission_classes = [IsAuthenticated, PuedeProductos]  # Solo administradores pueden gestionar productos
 
     def get_queryset(self):
@@ -841,16 +937,107 @@ class ProductoViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
     def bajo_stock(self, request):
-        """Productos con stock bajo el mínimo - Accesible para todos los autenticados"""
+        """
+        Productos con stock bajo el mínimo - Accesible para todos los autenticados
+
+        El filtro coincide con el índice parcial inventario_prod_bajo_stock_idx, por lo
+        que solo se leen los productos bajo el mínimo. Parámetros opcionales:
+        - compacto=true: solo los campos que usa el dashboard
+        - page / page_size: respuesta paginada (sin ellos se retorna la lista completa)
+        """
+        compacto = request.query_params.get('compacto', 'false').lower() == 'true'
+
         productos = Producto.objects.filter(
             activo=True,
             stock_actual__lte=F('stock_minimo')
+        ).order_by('nombre')
+
+        if compacto:
+            productos = productos.select_related('categoria').only(
+                'id', 'codigo', 'nombre', 'stock_actual', 'stock_minimo',
+                'unidad_medida', 'categoria__nombre', 'proveedor_id'
+            )
+            serializer_class = ProductoBajoStockSerializer
+        else:
+            productos = productos.select_related('categoria', 'proveedor')
+            serializer_class = ProductoSerializer
+
+        contexto = self.get_serializer_context()
+        if 'page' in request.query_params or 'page_size' in request.query_params:
+            paginador = BajoStockPagination()
+            pagina = paginador.paginate_queryset(productos, request, view=self)
+            serializer = serializer_class(pagina, many=True, context=contexto)
+            return paginador.get_paginated_response(serializer.data)
+
+        serializer = serializer_class(productos, many=True, context=contexto)
+        return Response(serializer.data)
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
+    def cambios(self, request):
+        """
+        Sincronización incremental del catálogo para las cajas.
+
+        - desde: versión retornada por la sincronización anterior (0 u omitido =
+          catálogo completo)
+        - fields / perfil: campos de cada producto (p. ej. perfil=compacto)
+
+        Retorna la nueva versión, los productos creados o modificados desde `desde`
+        (incluidos los desactivados y los cambios de stock) y los ids eliminados.
+        Siempre lee del primario: la versión depende de las transacciones en curso.
+        """
+        from .servicios import cambios_productos_desde
+
+        try:
+            desde = int(request.query_params.get('desde') or 0)
+            if desde < 0:
+                raise ValueError
+        except ValueError:
+            return Response(
+                {'error': 'desde debe ser una versión (entero no negativo)'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        version, cambios = cambios_productos_desde(desde)
+        productos = self.filter_queryset(
+            Producto.objects.select_related('categoria', 'proveedor').filter(
+                id__in=cambios.values('producto_id')
+            ).order_by('id')
         )
+        eliminados = cambios.filter(tipo='ELIMINADO').values_list('producto_id', flat=True)
+
         serializer = self.get_serializer(productos, many=True)
-        return Response(serializer.data)
+        return Response({
+            'version': version,
+            'completo': not desde,
+            'productos': serializer.data,
+            'eliminados': list(eliminados) if desde else [],
+        })
+
+    @action(detail=False, methods=['get'])
+    def verificar_stock(self, request):
+        """Verifica stock_actual contra la cadena de movimientos (no avanza la marca nocturna)"""
+        from .verificacion import LIMITE_MAXIMO, verificar_cadena_stock
+
+        incremental = request.query_params.get('incremental', 'false').lower() == 'true'
+        try:
+            limite = int(request.query_params.get('limite', 500))
+        except ValueError:
+            return Response(
+                {'error': 'El límite debe ser un número entero'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if limite < 1:
+            return Response(
+                {'error': 'El límite debe ser mayor que cero'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        limite = min(limite, LIMITE_MAXIMO)
 
+        resultado = verificar_cadena_stock(incremental=incremental, limite=limite)
+        return Response(resultado)
 
-class MovimientoStockViewSet(viewsets.ReadOnlyModelViewSet):
+
+class MovimientoStockViewSet(CamposDinamicosMixin, viewsets.ReadOnlyModelViewSet):
     queryset = MovimientoStock.objects.select_related('producto').all()
     serializer_class = MovimientoStockSerializer
     permission_classes = [IsAuthenticated]
@@ -887,7 +1074,13 @@ class MovimientoStockViewSet(viewsets.ReadOnlyModelViewSet):
     
     @action(detail=False, methods=['get'])
     def exportar_csv(self, request):
-        """Exportar movimientos a Excel con diseño mejorado"""
+        """Exportar movimientos a Excel con diseño mejorado (o a Parquet/Arrow con formato=parquet|arrow)"""
+        from reportes.columnar import FORMATOS_COLUMNARES
+
+        formato = request.query_params.get('formato')
+        if formato in FORMATOS_COLUMNARES:
+            return self._exportar_columnar(formato)
+
         from openpyxl import Workbook
         from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
         from openpyxl.utils import get_column_letter
@@ -1032,8 +1225,24 @@ class MovimientoStockViewSet(viewsets.ReadOnlyModelViewSet):
         wb.save(response)
         return response
 
+    def _exportar_columnar(self, formato):
+        """Movimientos en orden cronológico, con el código y nombre del producto"""
+        from datetime import datetime
+        from reportes.columnar import respuesta_columnar
+
+        filas = self.get_queryset().select_related(None).order_by('fecha', 'id').values_list(
+            'id', 'fecha', 'producto_id', 'producto__codigo', 'producto__nombre', 'tipo',
+            'cantidad', 'stock_anterior', 'stock_nuevo', 'motivo', 'usuario'
+        )
+        return respuesta_columnar(filas, [
+            ('id', 'entero'), ('fecha', 'fecha_hora'), ('producto_id', 'entero'),
+            ('producto_codigo', 'texto'), ('producto_nombre', 'texto'), ('tipo', 'texto'),
+            ('cantidad', 'entero'), ('stock_anterior', 'entero'), ('stock_nuevo', 'entero'),
+            ('motivo', 'texto'), ('usuario', 'texto'),
+        ], formato, f'movimientos_stock_{datetime.now().strftime("%Y%m%d_%H%M%S")}')
+
 
-class PedidoProveedorViewSet(viewsets.ReadOnlyModelViewSet):
+class PedidoProveedorViewSet(CamposDinamicosMixin, viewsets.ReadOnlyModelViewSet):
     """ViewSet para gestionar el historial de pedidos a proveedores"""
     queryset = PedidoProveedor.objects.all().select_related('proveedor')
     serializer_class = PedidoProveedorSerializer
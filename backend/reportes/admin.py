@@ -1,3 +1,24 @@
 from django.contrib import admin
+from .models import VentaDiaProducto, VentaDiaUsuario, VentaHora
 
-# Register your models here.
+
+@admin.register(VentaHora)
+class VentaHoraAdmin(admin.ModelAdmin):
+    list_display = ['fecha', 'hora', 'dia_semana', 'cantidad_ventas', 'total']
+    list_filter = ['dia_semana']
+    date_hierarchy = 'fecha'
+
+
+@admin.register(VentaDiaProducto)
+class VentaDiaProductoAdmin(admin.ModelAdmin):
+    list_display = ['fecha', 'producto', 'unidades', 'total', 'costo']
+    list_select_related = ['producto']
+    search_fields = ['producto__codigo', 'producto__nombre']
+    date_hierarchy = 'fecha'
+
+
+@admin.register(VentaDiaUsuario)
+class VentaDiaUsuarioAdmin(admin.ModelAdmin):
+    list_display = ['fecha', 'usuario', 'cantidad_ventas', 'total']
+    search_fields = ['usuario']
+    date_hierarchy = 'fecha'
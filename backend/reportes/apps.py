@@ -5,3 +5,7 @@ class ReportesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'reportes'
     verbose_name = 'Reportes'
+
+    def ready(self):
+        # Invalidación de la caché de reportes
+        from . import signals  # noqa: F401
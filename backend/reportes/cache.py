@@ -0,0 +1,153 @@
+"""
+Caché de resultados de reportes.
+
+Cada reporte guarda su conjunto de datos calculado (no la respuesta), de modo que
+JSON, CSV y Excel se generan desde el mismo resultado. La clave incluye los
+parámetros del reporte y la versión de los datos de los que depende:
+
+- Periodos cerrados (terminan antes de hoy): se usan las versiones por mes de cada
+  dominio y el resultado se guarda sin expiración. Se calcula leyendo del primario:
+  una réplica atrasada lo dejaría guardado con datos anteriores a la versión.
+- Periodos abiertos o reportes sin periodo: se usa la versión global de cada
+  dominio y el resultado expira a los TIEMPO_PERIODO_ABIERTO segundos.
+
+Todas las claves incluyen además la versión del catálogo (productos, categorías y
+proveedores): los reportes muestran sus nombres, y editarlos no corresponde a un
+mes en particular. Es una versión aparte de la de 'inventario', que cambia con
+cada movimiento de stock y dejaría sin caché a los periodos cerrados.
+
+Las rutas de escritura incrementan las versiones con incrementar_version() (ver
+reportes/signals.py), lo que deja obsoletas las claves anteriores.
+
+Usa el alias 'reportes' de CACHES (prefijo propio). Con un backend compartido
+(redis, archivo o base de datos) las versiones son las mismas para todos los
+workers, así que una invalidación en uno vale para todos.
+"""
+import hashlib
+import json
+import time
+from contextlib import nullcontext
+from datetime import date, datetime
+
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+from django.utils.connection import ConnectionProxy
+
+from erp_minimarket.routers import lecturas_en_primario
+
+DOMINIOS = ('ventas', 'compras', 'inventario')
+CATALOGO = 'catalogo'
+TIEMPO_PERIODO_ABIERTO = 60 * 60
+PREFIJO = 'reportes'
+
+cache = ConnectionProxy(caches, 'reportes')
+
+
+def _clave_version(dominio, periodo=None):
+    return f'{PREFIJO}:version:{dominio}:{periodo or "global"}'
+
+
+def _periodo(fecha):
+    """Periodo mensual ('YYYY-MM') de una fecha o datetime"""
+    if isinstance(fecha, datetime):
+        fecha = timezone.localtime(fecha) if timezone.is_aware(fecha) else fecha
+    return f'{fecha.year:04d}-{fecha.month:02d}'
+
+
+def _periodos_entre(desde, hasta):
+    """Periodos mensuales que cubre el rango [desde, hasta]"""
+    periodos = []
+    año, mes = desde.year, desde.month
+    while (año, mes) <= (hasta.year, hasta.month):
+        periodos.append(f'{año:04d}-{mes:02d}')
+        mes += 1
+        if mes > 12:
+            año, mes = año + 1, 1
+    return periodos
+
+
+def obtener_version(dominio, periodo=None):
+    """
+    Versión actual de un dominio (global o de un periodo).
+
+    Una versión ausente (nunca creada o descartada por el backend) se inicializa con
+    la hora actual en nanosegundos y no con 1, para que nunca coincida con una
+    versión usada antes y no se sirvan resultados antiguos.
+    """
+    clave = _clave_version(dominio, periodo)
+    version = cache.get(clave)
+    if version is None:
+        cache.add(clave, time.time_ns(), None)
+        version = cache.get(clave)
+    return version
+
+
+def _incrementar(clave):
+    try:
+        cache.incr(clave)
+    except ValueError:
+        cache.add(clave, time.time_ns(), None)
+
+
+def incrementar_version(dominio, fechas=()):
+    """
+    Invalida los reportes de un dominio: la versión global y la de los meses de
+    `fechas`. Dentro de una transacción se aplica al confirmarla, para que ningún
+    reporte calculado con datos no confirmados quede guardado con la versión nueva.
+    """
+    claves = {_clave_version(dominio)}
+    claves.update(_clave_version(dominio, _periodo(fecha)) for fecha in fechas if fecha)
+
+    def aplicar():
+        for clave in claves:
+            _incrementar(clave)
+
+    transaction.on_commit(aplicar)
+
+
+def _serializar_parametros(parametros):
+    def convertir(valor):
+        if isinstance(valor, (date, datetime)):
+            return valor.isoformat()
+        return str(valor)
+    texto = json.dumps(parametros, sort_keys=True, default=convertir)
+    return hashlib.md5(texto.encode('utf-8')).hexdigest()
+
+
+def obtener_reporte(nombre, parametros, calcular, dominios, desde=None, hasta=None, con_fecha=False):
+    """
+    Retorna el conjunto de datos del reporte desde la caché o lo calcula con calcular().
+
+    - parametros: diccionario con los parámetros que determinan el resultado
+    - dominios: dominios de datos de los que depende ('ventas', 'compras', 'inventario')
+    - desde/hasta: fechas (date) del periodo del reporte, si tiene
+    - con_fecha: retornar (datos, fecha en que se calcularon) en lugar de solo los datos
+    """
+    cerrado = hasta is not None and hasta < timezone.localdate()
+
+    if cerrado:
+        periodos = _periodos_entre(desde or hasta, hasta)
+        versiones = [
+            f'{dominio}@{periodo}={obtener_version(dominio, periodo)}'
+            for dominio in dominios for periodo in periodos
+        ]
+        timeout = None
+    else:
+        versiones = [f'{dominio}={obtener_version(dominio)}' for dominio in dominios]
+        timeout = TIEMPO_PERIODO_ABIERTO
+    versiones.append(f'{CATALOGO}={obtener_version(CATALOGO)}')
+
+    clave = ':'.join([
+        PREFIJO, nombre, _serializar_parametros(parametros),
+        hashlib.md5('|'.join(versiones).encode('utf-8')).hexdigest()
+    ])
+
+    guardado = cache.get(clave)
+    if guardado is None:
+        with lecturas_en_primario() if cerrado else nullcontext():
+            guardado = (timezone.now(), calcular())
+        cache.set(clave, guardado, timeout)
+
+    generado, datos = guardado
+    return (datos, generado) if con_fecha else datos
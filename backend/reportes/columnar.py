@@ -0,0 +1,147 @@
+"""
+Exportación en formatos columnares (Parquet y Arrow IPC) con tipos de datos.
+
+Las exportaciones de tablas (ventas, compras, movimientos) leen el queryset con
+un cursor de servidor y escriben lotes de filas a medida que llegan: la respuesta
+se transmite por partes y nunca se carga la tabla completa en memoria.
+
+Requiere pyarrow; sin él, los formatos columnares responden con un error.
+"""
+from django.http import StreamingHttpResponse
+from rest_framework import status
+from rest_framework.response import Response
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+# formato -> (content type, extensión del archivo)
+FORMATOS_COLUMNARES = {
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrows'),
+}
+
+# Filas por lote (row group en Parquet, record batch en Arrow)
+TAMANO_LOTE = 50000
+
+
+def _tipo_arrow(tipo):
+    return {
+        'entero': pa.int64(),
+        'texto': pa.string(),
+        'decimal': pa.decimal128(14, 2),
+        'fecha_hora': pa.timestamp('us', tz='UTC'),
+        'fecha': pa.date32(),
+        'booleano': pa.bool_(),
+        'real': pa.float64(),
+    }[tipo]
+
+
+class _Sumidero:
+    """Archivo de solo escritura que acumula los bytes escritos hasta retirarlos"""
+
+    def __init__(self):
+        self._partes = []
+        self._posicion = 0
+        self.closed = False
+
+    def write(self, datos):
+        datos = bytes(datos)
+        self._partes.append(datos)
+        self._posicion += len(datos)
+        return len(datos)
+
+    def tell(self):
+        return self._posicion
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def retirar(self):
+        datos = b''.join(self._partes)
+        self._partes = []
+        return datos
+
+
+def _nuevo_escritor(archivo, esquema, formato):
+    if formato == 'parquet':
+        return pq.ParquetWriter(archivo, esquema, compression='zstd')
+    return pa.ipc.new_stream(archivo, esquema)
+
+
+def _lote(filas, esquema):
+    columnas = list(zip(*filas))
+    return pa.RecordBatch.from_arrays(
+        [pa.array(valores, type=campo.type) for valores, campo in zip(columnas, esquema)],
+        schema=esquema
+    )
+
+
+def _generar_lotes(filas, esquema, formato, tamano_lote):
+    sumidero = _Sumidero()
+    escritor = _nuevo_escritor(pa.PythonFile(sumidero, mode='w'), esquema, formato)
+
+    pendientes = []
+    for fila in filas:
+        pendientes.append(fila)
+        if len(pendientes) >= tamano_lote:
+            escritor.write_batch(_lote(pendientes, esquema))
+            pendientes = []
+            yield sumidero.retirar()
+    if pendientes:
+        escritor.write_batch(_lote(pendientes, esquema))
+    escritor.close()
+    yield sumidero.retirar()
+
+
+def _sin_pyarrow():
+    return Response(
+        {'error': 'La exportación Parquet/Arrow requiere pyarrow instalado en el servidor'},
+        status=status.HTTP_501_NOT_IMPLEMENTED
+    )
+
+
+def _respuesta(contenido, formato, nombre_archivo):
+    content_type, extension = FORMATOS_COLUMNARES[formato]
+    response = StreamingHttpResponse(contenido, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{nombre_archivo}.{extension}"'
+    return response
+
+
+def respuesta_columnar(filas, columnas, formato, nombre_archivo, tamano_lote=TAMANO_LOTE):
+    """
+    Respuesta transmitida por lotes con las filas en formato Parquet o Arrow.
+
+    - filas: queryset de values_list() (se recorre con iterator()) o iterable de tuplas
+    - columnas: lista de (nombre, tipo) en el orden de las tuplas; tipos: 'entero',
+      'texto', 'decimal', 'fecha_hora', 'fecha', 'booleano', 'real'
+    """
+    if not PYARROW_AVAILABLE:
+        return _sin_pyarrow()
+
+    if hasattr(filas, 'iterator'):
+        filas = filas.iterator(chunk_size=tamano_lote)
+    esquema = pa.schema([(nombre, _tipo_arrow(tipo)) for nombre, tipo in columnas])
+    return _respuesta(_generar_lotes(filas, esquema, formato, tamano_lote), formato, nombre_archivo)
+
+
+def respuesta_columnar_registros(registros, formato, nombre_archivo):
+    """
+    Respuesta Parquet/Arrow para una lista de diccionarios (tabla de un reporte).
+    Los tipos de cada columna se deducen de los valores.
+    """
+    if not PYARROW_AVAILABLE:
+        return _sin_pyarrow()
+
+    tabla = pa.Table.from_pylist(registros)
+    sumidero = _Sumidero()
+    escritor = _nuevo_escritor(pa.PythonFile(sumidero, mode='w'), tabla.schema, formato)
+    escritor.write_table(tabla)
+    escritor.close()
+    return _respuesta([sumidero.retirar()], formato, nombre_archivo)
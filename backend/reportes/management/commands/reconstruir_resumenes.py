@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from inventario.servicios import reconstruir_quiebres
+from reportes.resumenes import reconstruir_ventas_dia, reconstruir_ventas_hora
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye desde cero las tablas de resumen de reportes (ventas por hora y por día, quiebres de stock)'
+
+    def handle(self, *args, **options):
+        filas = reconstruir_ventas_hora()
+        self.stdout.write(self.style.SUCCESS(f'VentaHora reconstruido: {filas} filas'))
+        filas_producto, filas_usuario = reconstruir_ventas_dia()
+        self.stdout.write(self.style.SUCCESS(
+            f'VentaDiaProducto reconstruido: {filas_producto} filas; VentaDiaUsuario: {filas_usuario} filas'
+        ))
+        intervalos = reconstruir_quiebres()
+        self.stdout.write(self.style.SUCCESS(f'QuiebreStock reconstruido: {intervalos} intervalos'))
@@ -0,0 +1,61 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:20
+
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def poblar_ventas_hora(apps, schema_editor):
+    """Construye el resumen por hora a partir de las ventas existentes"""
+    Venta = apps.get_model('ventas', 'Venta')
+    VentaHora = apps.get_model('reportes', 'VentaHora')
+    zona = settings.TIME_ZONE
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {VentaHora._meta.db_table} (fecha, hora, dia_semana, cantidad_ventas, total)
+            SELECT (v.fecha AT TIME ZONE %s)::date,
+                   EXTRACT(HOUR FROM v.fecha AT TIME ZONE %s)::smallint,
+                   (EXTRACT(ISODOW FROM v.fecha AT TIME ZONE %s) - 1)::smallint,
+                   COUNT(*),
+                   COALESCE(SUM(v.total), 0)
+            FROM {Venta._meta.db_table} v
+            GROUP BY 1, 2, 3
+            """,
+            [zona, zona, zona]
+        )
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('ventas', '0003_alter_venta_fecha'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VentaHora',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('hora', models.PositiveSmallIntegerField()),
+                ('dia_semana', models.PositiveSmallIntegerField(help_text='0 = lunes ... 6 = domingo')),
+                ('cantidad_ventas', models.IntegerField(default=0)),
+                ('total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+            ],
+            options={
+                'verbose_name': 'Venta por hora',
+                'verbose_name_plural': 'Ventas por hora',
+                'ordering': ['fecha', 'hora'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='ventahora',
+            constraint=models.UniqueConstraint(fields=('fecha', 'hora'), name='reportes_ventahora_fecha_hora_uniq'),
+        ),
+        migrations.RunPython(poblar_ventas_hora, migrations.RunPython.noop),
+    ]
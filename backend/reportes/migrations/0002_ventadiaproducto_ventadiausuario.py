@@ -0,0 +1,91 @@
+# Generated by Django 4.2.7 on 2026-10-19 17:40
+
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def poblar_ventas_dia(apps, schema_editor):
+    """Construye los resúmenes diarios por producto y por usuario desde las ventas existentes"""
+    Venta = apps.get_model('ventas', 'Venta')
+    DetalleVenta = apps.get_model('ventas', 'DetalleVenta')
+    VentaDiaProducto = apps.get_model('reportes', 'VentaDiaProducto')
+    VentaDiaUsuario = apps.get_model('reportes', 'VentaDiaUsuario')
+    zona = settings.TIME_ZONE
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {VentaDiaProducto._meta.db_table} (fecha, producto_id, unidades, total, costo)
+            SELECT (v.fecha AT TIME ZONE %s)::date, d.producto_id,
+                   SUM(d.cantidad), COALESCE(SUM(d.subtotal), 0),
+                   COALESCE(SUM(d.cantidad * d.costo_unitario), 0)
+            FROM {DetalleVenta._meta.db_table} d
+            JOIN {Venta._meta.db_table} v ON v.id = d.venta_id
+            GROUP BY 1, 2
+            """,
+            [zona]
+        )
+        cursor.execute(
+            f"""
+            INSERT INTO {VentaDiaUsuario._meta.db_table} (fecha, usuario, cantidad_ventas, total)
+            SELECT (v.fecha AT TIME ZONE %s)::date, v.usuario, COUNT(*), COALESCE(SUM(v.total), 0)
+            FROM {Venta._meta.db_table} v
+            GROUP BY 1, 2
+            """,
+            [zona]
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0006_quiebrestock'),
+        ('ventas', '0004_detalleventa_costo_unitario'),
+        ('reportes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VentaDiaUsuario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('usuario', models.CharField(max_length=100)),
+                ('cantidad_ventas', models.IntegerField(default=0)),
+                ('total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+            ],
+            options={
+                'verbose_name': 'Venta diaria por usuario',
+                'verbose_name_plural': 'Ventas diarias por usuario',
+                'ordering': ['fecha', 'usuario'],
+            },
+        ),
+        migrations.CreateModel(
+            name='VentaDiaProducto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('unidades', models.IntegerField(default=0)),
+                ('total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('costo', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='inventario.producto')),
+            ],
+            options={
+                'verbose_name': 'Venta diaria por producto',
+                'verbose_name_plural': 'Ventas diarias por producto',
+                'ordering': ['fecha', 'producto'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='ventadiausuario',
+            constraint=models.UniqueConstraint(fields=('fecha', 'usuario'), name='reportes_ventadiausuario_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='ventadiaproducto',
+            constraint=models.UniqueConstraint(fields=('fecha', 'producto'), name='reportes_ventadiaproducto_uniq'),
+        ),
+        migrations.RunPython(poblar_ventas_dia, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,71 @@
 from django.db import models
+from decimal import Decimal
 
-# Create your models here.
+
+class VentaHora(models.Model):
+    """
+    Resumen de ventas por fecha y hora local.
+
+    Se mantiene de forma incremental desde las señales de Venta (reportes/signals.py)
+    y se puede reconstruir con el comando reconstruir_resumenes.
+    """
+    fecha = models.DateField()
+    hora = models.PositiveSmallIntegerField()
+    dia_semana = models.PositiveSmallIntegerField(help_text='0 = lunes ... 6 = domingo')
+    cantidad_ventas = models.IntegerField(default=0)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+
+    class Meta:
+        ordering = ['fecha', 'hora']
+        verbose_name = 'Venta por hora'
+        verbose_name_plural = 'Ventas por hora'
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'hora'], name='reportes_ventahora_fecha_hora_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} {self.hora:02d}h - {self.cantidad_ventas} ventas"
+
+
+class VentaDiaProducto(models.Model):
+    """
+    Resumen diario (fecha local) de unidades, venta y costo por producto.
+
+    Se mantiene de forma incremental desde las señales de Venta/DetalleVenta y desde
+    las modificaciones en bloque de líneas de venta (ventas.serializers).
+    """
+    fecha = models.DateField()
+    producto = models.ForeignKey('inventario.Producto', on_delete=models.CASCADE, related_name='+')
+    unidades = models.IntegerField(default=0)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    costo = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+
+    class Meta:
+        ordering = ['fecha', 'producto']
+        verbose_name = 'Venta diaria por producto'
+        verbose_name_plural = 'Ventas diarias por producto'
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'producto'], name='reportes_ventadiaproducto_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} - producto {self.producto_id}: {self.unidades} u."
+
+
+class VentaDiaUsuario(models.Model):
+    """Resumen diario (fecha local) de cantidad y total de ventas por usuario"""
+    fecha = models.DateField()
+    usuario = models.CharField(max_length=100)
+    cantidad_ventas = models.IntegerField(default=0)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+
+    class Meta:
+        ordering = ['fecha', 'usuario']
+        verbose_name = 'Venta diaria por usuario'
+        verbose_name_plural = 'Ventas diarias por usuario'
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'usuario'], name='reportes_ventadiausuario_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} - {self.usuario}: {self.cantidad_ventas} ventas"
@@ -0,0 +1,176 @@
+"""
+Pronóstico de demanda por producto.
+
+La historia de ventas se carga en una matriz productos x días (una consulta agrupada
+por producto y día local) y todos los cálculos se hacen sobre la matriz completa con
+NumPy, sin recorrer productos en Python:
+
+    factor[p, d]  = venta media del día de semana d / venta media diaria   (estacionalidad)
+    nivel[p]      = promedio exponencial (alfa) de la venta desestacionalizada
+    pronostico    = nivel[p] * factor[p, día de semana de cada día futuro]
+
+Los días de cobertura son los días hasta que el pronóstico acumulado alcanza el
+stock actual; la fecha de quiebre es hoy + días de cobertura.
+"""
+from datetime import datetime, timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from inventario.models import Producto
+
+# Días "virtuales" de venta media que se suman a cada día de semana al estimar la
+# estacionalidad, para que pocos datos no produzcan factores extremos.
+SUAVIZADO_ESTACIONAL = 2
+
+
+def matriz_demanda(producto_ids, desde, hasta):
+    """
+    Unidades vendidas por producto y día local en [desde, hasta].
+
+    Retorna un arreglo (len(producto_ids), días) donde la fila i corresponde a
+    producto_ids[i] (ordenados ascendentemente) y la columna j a desde + j días.
+    """
+    from ventas.models import DetalleVenta, Venta
+
+    producto_ids = np.asarray(producto_ids, dtype=np.int64)
+    dias = (hasta - desde).days + 1
+    matriz = np.zeros((len(producto_ids), dias), dtype=np.float64)
+    if not len(producto_ids) or dias <= 0:
+        return matriz
+
+    inicio = timezone.make_aware(datetime.combine(desde, datetime.min.time()))
+    fin = inicio + timedelta(days=dias)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT dv.producto_id,
+                   (v.fecha AT TIME ZONE %s)::date - %s::date,
+                   SUM(dv.cantidad)
+            FROM {DetalleVenta._meta.db_table} dv
+            JOIN {Venta._meta.db_table} v ON v.id = dv.venta_id
+            WHERE v.fecha >= %s AND v.fecha < %s
+            GROUP BY 1, 2
+            """,
+            [settings.TIME_ZONE, desde, inicio, fin]
+        )
+        filas = np.array(cursor.fetchall(), dtype=np.int64).reshape(-1, 3)
+
+    # Ubicar cada producto en su fila; se descartan los que no están en producto_ids
+    posiciones = np.searchsorted(producto_ids, filas[:, 0])
+    posiciones = np.minimum(posiciones, len(producto_ids) - 1)
+    validas = producto_ids[posiciones] == filas[:, 0]
+    matriz[posiciones[validas], filas[validas, 1]] = filas[validas, 2]
+    return matriz
+
+
+def factores_semanales(matriz, dias_semana):
+    """Factor de estacionalidad (productos x 7) según el día de semana de cada columna"""
+    indicador = np.zeros((matriz.shape[1], 7))
+    indicador[np.arange(matriz.shape[1]), dias_semana] = 1
+
+    media = matriz.mean(axis=1, keepdims=True) if matriz.shape[1] else np.zeros((len(matriz), 1))
+    suma_por_dia = matriz @ indicador
+    conteo_por_dia = indicador.sum(axis=0)
+
+    numerador = suma_por_dia + SUAVIZADO_ESTACIONAL * media
+    denominador = (conteo_por_dia + SUAVIZADO_ESTACIONAL) * media
+    return np.divide(
+        numerador, denominador,
+        out=np.ones_like(numerador), where=denominador > 0
+    )
+
+
+def suavizado_exponencial(matriz, alfa, mascara=None):
+    """
+    Nivel por producto: promedio de las columnas con pesos alfa * (1 - alfa)^antigüedad.
+
+    Las celdas con mascara False (días sin venta esperable) no entran al promedio.
+    """
+    dias = matriz.shape[1]
+    pesos = alfa * (1 - alfa) ** np.arange(dias - 1, -1, -1)
+    if mascara is None:
+        mascara = np.ones_like(matriz, dtype=bool)
+
+    suma = np.where(mascara, matriz, 0) @ pesos
+    peso_total = mascara @ pesos
+    return np.divide(suma, peso_total, out=np.zeros_like(suma), where=peso_total > 0)
+
+
+def dias_hasta_quiebre(pronostico, stock):
+    """
+    Días (desde hoy) hasta que la demanda acumulada alcanza el stock.
+
+    -1 si el stock no se agota dentro del horizonte del pronóstico.
+    """
+    acumulado = np.cumsum(pronostico, axis=1)
+    agotado = acumulado >= stock[:, None]
+    dias = np.where(agotado.any(axis=1), agotado.argmax(axis=1), -1)
+    return np.where(stock <= 0, 0, dias)
+
+
+def pronosticar_demanda(productos=None, dias_historia=56, horizonte=30, alfa=0.3):
+    """
+    Pronóstico de demanda y fecha de quiebre de los productos activos.
+
+    - productos: queryset de Producto a considerar (por defecto todos los activos)
+    - dias_historia: días completos de ventas (hasta ayer) usados para estimar
+    - horizonte: días a pronosticar desde hoy
+    - alfa: factor del suavizado exponencial (0 < alfa <= 1)
+    """
+    hoy = timezone.localdate()
+    desde = hoy - timedelta(days=dias_historia)
+    hasta = hoy - timedelta(days=1)
+
+    if productos is None:
+        productos = Producto.objects.filter(activo=True)
+    filas = list(
+        productos.order_by('id').values_list('id', 'codigo', 'nombre', 'stock_actual')
+    )
+    ids = np.fromiter((f[0] for f in filas), dtype=np.int64, count=len(filas))
+    stock = np.fromiter((f[3] for f in filas), dtype=np.float64, count=len(filas))
+
+    historia = matriz_demanda(ids, desde, hasta)
+    dias_semana_historia = (desde.weekday() + np.arange(historia.shape[1])) % 7
+    dias_semana_futuro = (hoy.weekday() + np.arange(horizonte)) % 7
+
+    factores = factores_semanales(historia, dias_semana_historia)
+    factores_historia = factores[:, dias_semana_historia]
+    desestacionalizada = np.divide(
+        historia, factores_historia,
+        out=np.zeros_like(historia), where=factores_historia > 0
+    )
+    nivel = suavizado_exponencial(desestacionalizada, alfa, mascara=factores_historia > 0)
+
+    pronostico = nivel[:, None] * factores[:, dias_semana_futuro]
+    dias_quiebre = dias_hasta_quiebre(pronostico, stock)
+    venta_historia = historia.sum(axis=1)
+    demanda_horizonte = pronostico.sum(axis=1)
+
+    resultado = []
+    for i, (producto_id, codigo, nombre, stock_actual) in enumerate(filas):
+        dias = int(dias_quiebre[i])
+        resultado.append({
+            'id': producto_id,
+            'codigo': codigo,
+            'nombre': nombre,
+            'stock_actual': stock_actual,
+            'vendidas_historia': int(venta_historia[i]),
+            'venta_diaria_estimada': round(float(nivel[i]), 2),
+            'demanda_horizonte': round(float(demanda_horizonte[i]), 1),
+            'dias_cobertura': dias if dias >= 0 else None,
+            'fecha_quiebre': hoy + timedelta(days=dias) if dias >= 0 else None,
+        })
+
+    resultado.sort(key=lambda p: (p['dias_cobertura'] is None, p['dias_cobertura'] or 0, p['codigo']))
+    return {
+        'fecha': hoy,
+        'parametros': {
+            'dias_historia': dias_historia,
+            'horizonte': horizonte,
+            'alfa': alfa,
+        },
+        'productos': resultado,
+    }
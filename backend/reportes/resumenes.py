@@ -0,0 +1,149 @@
+"""
+Mantenimiento de las tablas de resumen de reportes.
+
+Las tablas se actualizan de forma incremental (sumando o restando la contribución de
+cada venta o línea con INSERT ... ON CONFLICT) dentro de la misma transacción que la
+venta, y se pueden reconstruir completas con el comando reconstruir_resumenes.
+"""
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import VentaDiaProducto, VentaDiaUsuario, VentaHora
+
+
+def acumular_venta_hora(fecha, cantidad, total):
+    """Suma (o resta, con valores negativos) una venta al resumen de su fecha y hora local"""
+    local = timezone.localtime(fecha)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {VentaHora._meta.db_table} AS r (fecha, hora, dia_semana, cantidad_ventas, total)
+            VALUES (%s, %s, %s, %s, %s)
+            ON CONFLICT (fecha, hora) DO UPDATE
+            SET cantidad_ventas = r.cantidad_ventas + EXCLUDED.cantidad_ventas,
+                total = r.total + EXCLUDED.total
+            """,
+            [local.date(), local.hour, local.weekday(), cantidad, total or 0]
+        )
+
+
+def acumular_venta_usuario(fecha, usuario, cantidad, total):
+    """Suma (o resta, con valores negativos) una venta al resumen diario de su usuario"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {VentaDiaUsuario._meta.db_table} AS r (fecha, usuario, cantidad_ventas, total)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (fecha, usuario) DO UPDATE
+            SET cantidad_ventas = r.cantidad_ventas + EXCLUDED.cantidad_ventas,
+                total = r.total + EXCLUDED.total
+            """,
+            [timezone.localtime(fecha).date(), usuario or '', cantidad, total or 0]
+        )
+
+
+def acumular_lineas_venta(fecha, lineas, signo=1):
+    """
+    Suma (signo=1) o resta (signo=-1) líneas de venta al resumen diario por producto.
+
+    lineas: iterable de (producto_id, cantidad, subtotal, costo_unitario). Se aplican
+    en una sola sentencia, agrupadas por producto.
+    """
+    por_producto = {}
+    for producto_id, cantidad, subtotal, costo_unitario in lineas:
+        unidades, total, costo = por_producto.get(producto_id, (0, 0, 0))
+        por_producto[producto_id] = (
+            unidades + signo * cantidad,
+            total + signo * (subtotal or 0),
+            costo + signo * cantidad * (costo_unitario or 0),
+        )
+    if not por_producto:
+        return
+
+    dia = timezone.localtime(fecha).date()
+    parametros = []
+    for producto_id, (unidades, total, costo) in por_producto.items():
+        parametros.extend([dia, producto_id, unidades, total, costo])
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {VentaDiaProducto._meta.db_table} AS r (fecha, producto_id, unidades, total, costo)
+            VALUES {', '.join(['(%s, %s, %s, %s, %s)'] * len(por_producto))}
+            ON CONFLICT (fecha, producto_id) DO UPDATE
+            SET unidades = r.unidades + EXCLUDED.unidades,
+                total = r.total + EXCLUDED.total,
+                costo = r.costo + EXCLUDED.costo
+            """,
+            parametros
+        )
+
+
+def lineas_de_venta(venta_id):
+    """Líneas guardadas de una venta en el formato de acumular_lineas_venta"""
+    from ventas.models import DetalleVenta
+
+    return list(DetalleVenta.objects.filter(venta_id=venta_id).values_list(
+        'producto_id', 'cantidad', 'subtotal', 'costo_unitario'
+    ))
+
+
+def reconstruir_ventas_hora():
+    """Recalcula VentaHora completo desde Venta. Retorna la cantidad de filas generadas."""
+    from ventas.models import Venta
+
+    zona = settings.TIME_ZONE
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {VentaHora._meta.db_table}')
+        cursor.execute(
+            f"""
+            INSERT INTO {VentaHora._meta.db_table} (fecha, hora, dia_semana, cantidad_ventas, total)
+            SELECT (v.fecha AT TIME ZONE %s)::date,
+                   EXTRACT(HOUR FROM v.fecha AT TIME ZONE %s)::smallint,
+                   (EXTRACT(ISODOW FROM v.fecha AT TIME ZONE %s) - 1)::smallint,
+                   COUNT(*),
+                   COALESCE(SUM(v.total), 0)
+            FROM {Venta._meta.db_table} v
+            GROUP BY 1, 2, 3
+            """,
+            [zona, zona, zona]
+        )
+        return cursor.rowcount
+
+
+def reconstruir_ventas_dia():
+    """
+    Recalcula VentaDiaProducto y VentaDiaUsuario completos desde Venta/DetalleVenta.
+    Retorna la cantidad de filas generadas en cada tabla.
+    """
+    from ventas.models import DetalleVenta, Venta
+
+    zona = settings.TIME_ZONE
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {VentaDiaProducto._meta.db_table}')
+        cursor.execute(
+            f"""
+            INSERT INTO {VentaDiaProducto._meta.db_table} (fecha, producto_id, unidades, total, costo)
+            SELECT (v.fecha AT TIME ZONE %s)::date, d.producto_id,
+                   SUM(d.cantidad), COALESCE(SUM(d.subtotal), 0),
+                   COALESCE(SUM(d.cantidad * d.costo_unitario), 0)
+            FROM {DetalleVenta._meta.db_table} d
+            JOIN {Venta._meta.db_table} v ON v.id = d.venta_id
+            GROUP BY 1, 2
+            """,
+            [zona]
+        )
+        filas_producto = cursor.rowcount
+
+        cursor.execute(f'DELETE FROM {VentaDiaUsuario._meta.db_table}')
+        cursor.execute(
+            f"""
+            INSERT INTO {VentaDiaUsuario._meta.db_table} (fecha, usuario, cantidad_ventas, total)
+            SELECT (v.fecha AT TIME ZONE %s)::date, v.usuario, COUNT(*), COALESCE(SUM(v.total), 0)
+            FROM {Venta._meta.db_table} v
+            GROUP BY 1, 2
+            """,
+            [zona]
+        )
+        return filas_producto, cursor.rowcount
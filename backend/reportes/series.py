@@ -0,0 +1,179 @@
+"""
+Series de tiempo de ventas sobre los resúmenes diarios (VentaDiaProducto, VentaDiaUsuario).
+
+Las series son densas: incluyen todos los períodos del rango, con cero en los
+períodos sin ventas, para que el cliente pueda graficarlas sin completar huecos.
+Las semanas empiezan el lunes; el primer y el último período pueden quedar
+parcialmente fuera del rango [desde, hasta] y solo suman los días dentro de él.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import DateField, F, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+
+from .models import VentaDiaProducto, VentaDiaUsuario
+
+GRANULARIDADES = ('dia', 'semana', 'mes')
+AGRUPACIONES = ('producto', 'categoria', 'usuario')
+
+# Campo del resumen por producto que identifica cada serie y su nombre visible
+_CAMPOS_GRUPO = {
+    'producto': ('producto_id', 'producto__codigo', 'producto__nombre'),
+    'categoria': ('producto__categoria_id', None, 'producto__categoria__nombre'),
+}
+
+
+def inicio_periodo(fecha, granularidad):
+    """Primer día del período (día, semana desde el lunes o mes) que contiene a fecha"""
+    if granularidad == 'semana':
+        return fecha - timedelta(days=fecha.weekday())
+    if granularidad == 'mes':
+        return fecha.replace(day=1)
+    return fecha
+
+
+def periodos(desde, hasta, granularidad):
+    """Inicio de cada período que toca el rango [desde, hasta], en orden"""
+    resultado = []
+    actual = inicio_periodo(desde, granularidad)
+    while actual <= hasta:
+        resultado.append(actual)
+        if granularidad == 'dia':
+            actual += timedelta(days=1)
+        elif granularidad == 'semana':
+            actual += timedelta(days=7)
+        else:
+            actual = (actual + timedelta(days=32)).replace(day=1)
+    return resultado
+
+
+def _expresion_periodo(granularidad):
+    if granularidad == 'semana':
+        return TruncWeek('fecha', output_field=DateField())
+    if granularidad == 'mes':
+        return TruncMonth('fecha', output_field=DateField())
+    return F('fecha')
+
+
+def serie_ventas(desde, hasta, granularidad='dia', agrupar=None, limite=None, solo_ventas=False):
+    """
+    Ventas entre desde y hasta (fechas locales, inclusive) por período.
+
+    - totales: cantidad de ventas, total vendido, unidades y margen de cada período
+    - series: con agrupar ('producto', 'categoria' o 'usuario'), una serie por grupo
+      ordenadas por total vendido descendente; limite deja solo las primeras
+
+    Usa dos consultas agrupadas: una sobre el resumen por usuario (ventas y total)
+    y otra sobre el resumen por producto (unidades, total y costo). Con solo_ventas
+    (sin agrupar o agrupando por usuario) se omite la segunda y los totales no
+    incluyen unidades ni margen.
+    """
+    con_productos = not solo_ventas or agrupar in _CAMPOS_GRUPO
+    inicios = periodos(desde, hasta, granularidad)
+    posicion = {inicio: i for i, inicio in enumerate(inicios)}
+    n = len(inicios)
+
+    def ceros(valor=0):
+        return [valor] * n
+
+    totales = {
+        'cantidad_ventas': ceros(),
+        'total': ceros(Decimal('0.00')),
+    }
+    if con_productos:
+        totales['unidades'] = ceros()
+        totales['margen'] = ceros(Decimal('0.00'))
+    series = {}
+
+    # Resumen por usuario: cantidad de ventas y total (y las series por usuario)
+    campos_usuario = ['periodo', 'usuario'] if agrupar == 'usuario' else ['periodo']
+    por_usuario = VentaDiaUsuario.objects.filter(
+        fecha__gte=desde, fecha__lte=hasta
+    ).annotate(periodo=_expresion_periodo(granularidad)).values(*campos_usuario).annotate(
+        cantidad_ventas=Sum('cantidad_ventas'),
+        total=Sum('total'),
+    ).order_by()
+    for fila in por_usuario:
+        i = posicion[fila['periodo']]
+        totales['cantidad_ventas'][i] += fila['cantidad_ventas']
+        totales['total'][i] += fila['total']
+        if agrupar == 'usuario':
+            serie = series.setdefault(fila['usuario'], {
+                'clave': fila['usuario'],
+                'nombre': fila['usuario'],
+                'cantidad_ventas': ceros(),
+                'total': ceros(Decimal('0.00')),
+            })
+            serie['cantidad_ventas'][i] += fila['cantidad_ventas']
+            serie['total'][i] += fila['total']
+
+    # Resumen por producto: unidades y margen (y las series por producto o categoría)
+    campo_clave, campo_codigo, campo_nombre = _CAMPOS_GRUPO.get(agrupar, (None, None, None))
+    campos_producto = ['periodo'] + [c for c in (campo_clave, campo_codigo, campo_nombre) if c]
+    por_producto = VentaDiaProducto.objects.none() if not con_productos else VentaDiaProducto.objects.filter(
+        fecha__gte=desde, fecha__lte=hasta
+    ).annotate(periodo=_expresion_periodo(granularidad)).values(*campos_producto).annotate(
+        unidades=Sum('unidades'),
+        total=Sum('total'),
+        costo=Sum('costo'),
+    ).order_by()
+    for fila in por_producto:
+        i = posicion[fila['periodo']]
+        margen = fila['total'] - fila['costo']
+        totales['unidades'][i] += fila['unidades']
+        totales['margen'][i] += margen
+        if campo_clave:
+            clave = fila[campo_clave]
+            serie = series.get(clave)
+            if serie is None:
+                serie = series[clave] = {
+                    'clave': clave,
+                    'nombre': fila[campo_nombre] or 'Sin categoría',
+                    'unidades': ceros(),
+                    'total': ceros(Decimal('0.00')),
+                    'margen': ceros(Decimal('0.00')),
+                }
+                if campo_codigo:
+                    serie['codigo'] = fila[campo_codigo]
+            serie['unidades'][i] += fila['unidades']
+            serie['total'][i] += fila['total']
+            serie['margen'][i] += margen
+
+    # Los grupos que quedaron en cero (ventas anuladas o movidas) no forman serie
+    ordenadas = sorted(
+        (s for s in series.values() if any(s['total']) or any(s.get('unidades', s.get('cantidad_ventas')))),
+        key=lambda s: (-sum(s['total']), str(s['nombre']))
+    )
+
+    return {
+        'desde': desde,
+        'hasta': hasta,
+        'granularidad': granularidad,
+        'agrupar': agrupar,
+        'periodos': inicios,
+        'totales': totales,
+        'series': ordenadas[:limite] if limite else ordenadas,
+        'cantidad_series': len(ordenadas),
+    }
+
+
+def tablas_serie(datos):
+    """
+    La serie en formato largo, para exportar: 'totales' con una fila por período y
+    'series' con una fila por grupo y período.
+    """
+    totales = datos['totales']
+    filas_totales = [
+        dict({'periodo': periodo}, **{campo: valores[i] for campo, valores in totales.items()})
+        for i, periodo in enumerate(datos['periodos'])
+    ]
+    filas_series = [
+        dict(
+            {'periodo': periodo, 'clave': serie['clave'], 'nombre': serie['nombre']},
+            **{campo: valor[i] for campo, valor in serie.items() if isinstance(valor, list)}
+        )
+        for serie in datos['series']
+        for i, periodo in enumerate(datos['periodos'])
+    ]
+    return {'totales': filas_totales, 'series': filas_series}
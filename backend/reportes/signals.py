@@ -0,0 +1,164 @@
+"""
+Invalidación de la caché de reportes ante cambios en ventas, compras e inventario.
+
+Los detalles de venta/compra no invalidan la caché por sí mismos: toda escritura de
+líneas ocurre junto con un save() o delete() de su Venta/Compra.
+
+Las mismas señales de Venta mantienen los resúmenes por hora (VentaHora) y por
+usuario (VentaDiaUsuario); las de DetalleVenta, el resumen por producto
+(VentaDiaProducto). bulk_create/bulk_update de líneas no envían señales y quien los
+usa actualiza ese resumen por su cuenta.
+"""
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from compras.models import Compra
+from inventario.models import Categoria, MovimientoStock, Producto, Proveedor
+from ventas.models import DetalleVenta, Venta
+
+from .cache import CATALOGO, incrementar_version
+from .resumenes import acumular_lineas_venta, acumular_venta_hora, acumular_venta_usuario, lineas_de_venta
+
+
+@receiver(pre_save, sender=Venta)
+@receiver(pre_save, sender=Compra)
+def registrar_valores_anteriores(sender, instance, **kwargs):
+    """
+    Recuerda la fecha, el total y el usuario previos: permiten invalidar también el
+    mes de origen al mover una venta/compra y descontar su aporte anterior de los
+    resúmenes.
+    """
+    instance._fecha_anterior = None
+    instance._total_anterior = None
+    instance._usuario_anterior = None
+    if instance.pk:
+        anterior = sender.objects.filter(pk=instance.pk).values_list('fecha', 'total', 'usuario').first()
+        if anterior:
+            instance._fecha_anterior, instance._total_anterior, instance._usuario_anterior = anterior
+
+
+@receiver(post_save, sender=Venta)
+def actualizar_resumen_venta(sender, instance, created, **kwargs):
+    fecha_anterior = getattr(instance, '_fecha_anterior', None)
+    if not created and fecha_anterior is not None:
+        acumular_venta_hora(fecha_anterior, -1, -(instance._total_anterior or 0))
+        acumular_venta_usuario(fecha_anterior, instance._usuario_anterior, -1, -(instance._total_anterior or 0))
+
+        # Cambio de día: las líneas guardadas pasan al resumen del nuevo día
+        if timezone.localtime(fecha_anterior).date() != timezone.localtime(instance.fecha).date():
+            lineas = lineas_de_venta(instance.pk)
+            acumular_lineas_venta(fecha_anterior, lineas, signo=-1)
+            acumular_lineas_venta(instance.fecha, lineas)
+    acumular_venta_hora(instance.fecha, 1, instance.total)
+    acumular_venta_usuario(instance.fecha, instance.usuario, 1, instance.total)
+
+
+@receiver(pre_delete, sender=Venta)
+def descontar_lineas_venta(sender, instance, **kwargs):
+    """Descuenta todas las líneas de una vez; el borrado en cascada de cada una se ignora"""
+    acumular_lineas_venta(instance.fecha, lineas_de_venta(instance.pk), signo=-1)
+
+
+@receiver(post_delete, sender=Venta)
+def descontar_resumen_venta(sender, instance, **kwargs):
+    acumular_venta_hora(instance.fecha, -1, -(instance.total or 0))
+    acumular_venta_usuario(instance.fecha, instance.usuario, -1, -(instance.total or 0))
+
+
+@receiver(pre_save, sender=DetalleVenta)
+def registrar_linea_anterior(sender, instance, **kwargs):
+    instance._linea_anterior = None
+    if instance.pk:
+        instance._linea_anterior = sender.objects.filter(pk=instance.pk).values_list(
+            'producto_id', 'cantidad', 'subtotal', 'costo_unitario'
+        ).first()
+
+
+@receiver(post_save, sender=DetalleVenta)
+def actualizar_resumen_linea(sender, instance, **kwargs):
+    fecha = instance.venta.fecha
+    anterior = getattr(instance, '_linea_anterior', None)
+    if anterior:
+        acumular_lineas_venta(fecha, [anterior], signo=-1)
+    acumular_lineas_venta(fecha, [(
+        instance.producto_id, instance.cantidad, instance.subtotal, instance.costo_unitario
+    )])
+
+
+@receiver(post_delete, sender=DetalleVenta)
+def descontar_resumen_linea(sender, instance, origin=None, **kwargs):
+    # Borrado en cascada desde su venta: ya lo descontó descontar_lineas_venta.
+    # Borrado marcado con resumen_ajustado (CrearVentaSerializer._sincronizar_items):
+    # lo descuenta quien borra, con la fecha que ya conoce
+    if getattr(origin, 'model', type(origin)) is not DetalleVenta or getattr(origin, 'resumen_ajustado', False):
+        return
+    acumular_lineas_venta(instance.venta.fecha, [(
+        instance.producto_id, instance.cantidad, instance.subtotal, instance.costo_unitario
+    )], signo=-1)
+
+
+@receiver(post_save, sender=Venta)
+@receiver(post_delete, sender=Venta)
+def invalidar_reportes_ventas(sender, instance, **kwargs):
+    incrementar_version('ventas', [instance.fecha, getattr(instance, '_fecha_anterior', None)])
+
+
+@receiver(post_save, sender=Compra)
+@receiver(post_delete, sender=Compra)
+def invalidar_reportes_compras(sender, instance, **kwargs):
+    incrementar_version('compras', [instance.fecha, getattr(instance, '_fecha_anterior', None)])
+
+
+@receiver(post_save, sender=MovimientoStock)
+def invalidar_reportes_movimientos(sender, instance, **kwargs):
+    incrementar_version('inventario', [instance.fecha])
+
+
+# Campos del producto que muestran los reportes: solo cambiarlos toca el catálogo
+CAMPOS_CATALOGO_PRODUCTO = ('nombre', 'codigo', 'codigo_barras', 'categoria', 'proveedor')
+
+
+def _catalogo_producto(producto):
+    return tuple(
+        getattr(producto, Producto._meta.get_field(campo).attname) for campo in CAMPOS_CATALOGO_PRODUCTO
+    )
+
+
+@receiver(pre_save, sender=Producto)
+def registrar_catalogo_anterior(sender, instance, update_fields=None, **kwargs):
+    """
+    Recuerda los campos de catálogo previos: ventas, compras y ajustes guardan el
+    producto solo para cambiar su stock, y eso no debe invalidar los periodos cerrados.
+    """
+    instance._catalogo_anterior = None
+    if not instance.pk:
+        return
+    if update_fields is not None and not {
+        campo.removesuffix('_id') for campo in update_fields
+    } & set(CAMPOS_CATALOGO_PRODUCTO):
+        # save(update_fields=...) sin campos de catálogo: no cambian
+        instance._catalogo_anterior = _catalogo_producto(instance)
+        return
+    instance._catalogo_anterior = sender.objects.filter(pk=instance.pk).values_list(
+        *CAMPOS_CATALOGO_PRODUCTO
+    ).first()
+
+
+@receiver(post_save, sender=Producto)
+def invalidar_reportes_producto(sender, instance, created, **kwargs):
+    incrementar_version('inventario')
+    anterior = getattr(instance, '_catalogo_anterior', None)
+    if created or anterior != _catalogo_producto(instance):
+        incrementar_version(CATALOGO)
+
+
+@receiver(post_delete, sender=Producto)
+@receiver(post_save, sender=Proveedor)
+@receiver(post_delete, sender=Proveedor)
+@receiver(post_save, sender=Categoria)
+@receiver(post_delete, sender=Categoria)
+def invalidar_reportes_inventario(sender, instance, **kwargs):
+    # Nombres del catálogo: también en los reportes de periodos cerrados
+    incrementar_version('inventario')
+    incrementar_version(CATALOGO)
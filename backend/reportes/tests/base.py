@@ -0,0 +1,74 @@
+"""
+Datos de prueba compartidos por las pruebas que consultan reportes y listados.
+
+El runner solo recorre los módulos test*.py: las pruebas de cada aplicación
+importan ReportesTestCase desde aquí.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connections
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from compras.models import Compra, DetalleCompra
+from inventario.models import Categoria, MovimientoStock, Producto, Proveedor
+from usuarios.models import Usuario
+from ventas.models import DetalleVenta, Venta
+
+from ..cache import cache
+
+
+class ReportesTestCase(TestCase):
+    """Datos mínimos de ventas, compras y movimientos para los reportes"""
+
+    def setUp(self):
+        cache.clear()
+        # Los reportes y listados leen de la réplica (en pruebas, un espejo de la base
+        # principal): comparte la conexión, y la transacción de la prueba, con el primario
+        alias = settings.DB_REPLICA_ALIAS
+        if alias in settings.DATABASES:
+            replica = connections[alias]
+            connections[alias] = connections['default']
+            self.addCleanup(connections.__setitem__, alias, replica)
+        self.usuario = Usuario.objects.create_user(
+            username='admin', password='admin', rol='ADMINISTRADOR'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+
+        categoria = Categoria.objects.create(nombre='Bebidas')
+        self.proveedor = Proveedor.objects.create(nombre='Distribuidora', email='p@ejemplo.cl')
+        self.productos = [
+            Producto.objects.create(
+                codigo=f'P{i}', nombre=f'Producto {i}', categoria=categoria,
+                proveedor=self.proveedor, costo=Decimal('100'), precio_venta=Decimal('150'),
+                stock_actual=2 if i == 0 else 20, stock_minimo=5
+            )
+            for i in range(3)
+        ]
+
+        ahora = timezone.now()
+        for dias in (0, 1):
+            venta = Venta.objects.create(fecha=ahora - timedelta(days=dias), usuario='admin')
+            for producto in self.productos:
+                DetalleVenta.objects.create(
+                    venta=venta, producto=producto, cantidad=2, precio_unitario=Decimal('150')
+                )
+            venta.total = venta.calcular_total()
+            venta.save()
+
+        compra = Compra.objects.create(proveedor=self.proveedor, fecha=ahora, usuario='admin')
+        for producto in self.productos:
+            DetalleCompra.objects.create(
+                compra=compra, producto=producto, cantidad=5, costo_unitario=Decimal('100')
+            )
+        compra.total = compra.calcular_total()
+        compra.save()
+
+        MovimientoStock.objects.create(
+            producto=self.productos[0], tipo='SALIDA', cantidad=2,
+            stock_anterior=2, stock_nuevo=0, motivo='Venta', usuario='admin'
+        )
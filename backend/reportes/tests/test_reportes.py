@@ -0,0 +1,424 @@
+import io
+from datetime import timedelta
+from decimal import Decimal
+from unittest import skipUnless
+
+from django.db import reset_queries
+from django.utils import timezone
+
+from inventario.models import Categoria, Producto, QuiebreStock
+from inventario.servicios import aplicar_deltas_stock, reconstruir_quiebres
+from ventas.models import Venta, DetalleVenta
+
+from ..cache import cache
+from ..columnar import PYARROW_AVAILABLE
+from ..models import VentaDiaProducto, VentaDiaUsuario, VentaHora
+from ..resumenes import reconstruir_ventas_dia, reconstruir_ventas_hora
+from .base import ReportesTestCase
+
+
+class ConsultasPorReporteTest(ReportesTestCase):
+    """Cada reporte se calcula con un número fijo de consultas, en cualquier formato"""
+
+    CONSULTAS = {
+        'ventas_diarias': 2,
+        'compras_mensuales': 2,
+        'reporte_proveedores': 1,
+        'reporte_productos': 3,
+        'ventas_semanales': 1,
+        'ventas_mensuales': 2,
+        'margen_productos': 1,
+        'rotacion_inventario': 1,
+        'quiebres_semana': 1,
+        'quiebres_stock': 1,
+        'mapa_calor_ventas': 1,
+        'abc_productos': 1,
+        'pronostico_demanda': 2,
+        'ventas/serie': 2,
+    }
+
+    def test_consultas_por_reporte(self):
+        for reporte, consultas in self.CONSULTAS.items():
+            for formato in ('json', 'csv', 'excel'):
+                with self.subTest(reporte=reporte, formato=formato):
+                    cache.clear()
+                    with self.assertNumQueries(consultas):
+                        response = self.client.get(f'/api/reportes/{reporte}/?formato={formato}')
+                    self.assertEqual(response.status_code, 200)
+
+    def test_reporte_en_cache_no_consulta(self):
+        for reporte in self.CONSULTAS:
+            with self.subTest(reporte=reporte):
+                self.client.get(f'/api/reportes/{reporte}/')
+                with self.assertNumQueries(0):
+                    response = self.client.get(f'/api/reportes/{reporte}/?formato=excel')
+                self.assertEqual(response.status_code, 200)
+
+    def test_totales_desde_una_sola_agrupacion(self):
+        response = self.client.get('/api/reportes/ventas_semanales/')
+        suma_dias = sum(dia['total_dia'] for dia in response.data['ventas_por_dia'])
+        self.assertEqual(Decimal(str(response.data['total_ventas'])), suma_dias)
+
+        response = self.client.get('/api/reportes/compras_mensuales/')
+        self.assertEqual(response.data['total_compras'], 1500.0)
+        self.assertEqual(response.data['cantidad_compras'], 1)
+
+
+class InvalidacionCacheReportesTest(ReportesTestCase):
+
+    def test_nueva_venta_invalida_reporte_diario(self):
+        total_inicial = self.client.get('/api/reportes/ventas_diarias/').data['total_ventas']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Venta.objects.create(usuario='admin', total=Decimal('1000'))
+
+        total = self.client.get('/api/reportes/ventas_diarias/').data['total_ventas']
+        self.assertEqual(total, total_inicial + 1000)
+
+    def test_mes_cerrado_se_invalida_al_mover_una_venta(self):
+        hoy = timezone.localdate()
+        inicio_mes = hoy.replace(day=1)
+        mes_anterior = inicio_mes - timedelta(days=1)
+        url = f'/api/reportes/ventas_mensuales/?año={mes_anterior.year}&mes={mes_anterior.month}'
+
+        self.assertEqual(self.client.get(url).data['cantidad_ventas'], 0)
+
+        venta = Venta.objects.order_by('id').first()
+        with self.captureOnCommitCallbacks(execute=True):
+            venta.fecha = timezone.make_aware(
+                timezone.datetime.combine(mes_anterior, timezone.datetime.min.time())
+            )
+            venta.save()
+
+        self.assertEqual(self.client.get(url).data['cantidad_ventas'], 1)
+
+    def test_periodo_cerrado_se_invalida_al_editar_el_catalogo(self):
+        ayer = timezone.localdate() - timedelta(days=1)
+        url = f'/api/reportes/ventas/serie/?desde={ayer}&hasta={ayer}&agrupar=categoria'
+        self.assertEqual(self.client.get(url).data['series'][0]['nombre'], 'Bebidas')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Categoria.objects.update(nombre='Bebestibles')
+            Categoria.objects.get().save()
+
+        self.assertEqual(self.client.get(url).data['series'][0]['nombre'], 'Bebestibles')
+
+    def test_reportes_sin_inventario_se_invalidan_al_renombrar_un_producto(self):
+        ayer = timezone.localdate() - timedelta(days=1)
+        url = f'/api/reportes/ventas_diarias/?fecha={ayer}'
+        nombres = lambda: {p['producto__nombre'] for p in self.client.get(url).data['detalle_productos']}
+        self.assertIn('Producto 0', nombres())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.productos[0].nombre = 'Agua mineral'
+            self.productos[0].save()
+
+        self.assertIn('Agua mineral', nombres())
+
+    def test_movimientos_de_stock_no_invalidan_otros_meses_cerrados(self):
+        mes_anterior = timezone.localdate().replace(day=1) - timedelta(days=1)
+        url = f'/api/reportes/ventas/serie/?desde={mes_anterior}&hasta={mes_anterior}&agrupar=producto'
+        self.client.get(url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            aplicar_deltas_stock({self.productos[1].id: -1}, 'Venta', 'admin')
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_nueva_venta_no_invalida_periodos_cerrados(self):
+        mes_anterior = timezone.localdate().replace(day=1) - timedelta(days=1)
+        url = f'/api/reportes/ventas_diarias/?fecha={mes_anterior}'
+        self.client.get(url)
+
+        # Guarda cada producto para descontar su stock: no cambia el catálogo
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/ventas/', {'items': [
+                {'producto': self.productos[1].id, 'cantidad': 1, 'precio_unitario': '150'}
+            ]}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+
+        reset_queries()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+
+class SumasSinMultiplicarFilasTest(ReportesTestCase):
+    """Las sumas de ventas y compras por producto/proveedor no se multiplican entre sí"""
+
+    def test_reporte_productos(self):
+        response = self.client.get('/api/reportes/reporte_productos/')
+        for producto in response.data['productos_mas_vendidos']:
+            self.assertEqual(producto['cantidad_vendida_30dias'], 4)
+            self.assertEqual(producto['cantidad_comprada_30dias'], 5)
+
+    def test_rotacion_inventario(self):
+        response = self.client.get('/api/reportes/rotacion_inventario/')
+        for producto in response.data['productos']:
+            self.assertEqual(producto['cantidad_vendida_30dias'], 4)
+
+    def test_reporte_proveedores(self):
+        response = self.client.get('/api/reportes/reporte_proveedores/')
+        proveedor = response.data['proveedores'][0]
+        self.assertEqual(proveedor['cantidad_productos'], 3)
+        self.assertEqual(proveedor['total_compras_30dias'], 1500.0)
+        self.assertEqual(proveedor['cantidad_compras_30dias'], 1)
+
+
+class MapaCalorVentasTest(ReportesTestCase):
+
+    def _resumen(self):
+        return sorted(
+            VentaHora.objects.filter(cantidad_ventas__gt=0)
+            .values_list('fecha', 'hora', 'cantidad_ventas', 'total')
+        )
+
+    def test_resumen_incremental_coincide_con_reconstruccion(self):
+        venta = Venta.objects.order_by('id').first()
+        venta.fecha = venta.fecha - timedelta(days=3, hours=5)
+        venta.total = Decimal('123.00')
+        venta.save()
+        Venta.objects.order_by('id').last().delete()
+        Venta.objects.create(usuario='admin', total=Decimal('50'))
+
+        incremental = self._resumen()
+        reconstruir_ventas_hora()
+        self.assertEqual(incremental, self._resumen())
+
+    def test_grilla(self):
+        response = self.client.get('/api/reportes/mapa_calor_ventas/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['cantidad_ventas']), 7)
+        self.assertEqual(len(response.data['cantidad_ventas'][0]), 24)
+        self.assertEqual(response.data['cantidad_periodo'], 2)
+        self.assertEqual(response.data['total_periodo'], 1800.0)
+
+        ahora = timezone.localtime()
+        self.assertGreaterEqual(response.data['cantidad_ventas'][ahora.weekday()][ahora.hour], 1)
+
+    def test_rango_invalido(self):
+        response = self.client.get(
+            '/api/reportes/mapa_calor_ventas/?fecha_desde=2025-02-01&fecha_hasta=2025-01-01'
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class ClasificacionAbcTest(ReportesTestCase):
+
+    def setUp(self):
+        super().setUp()
+        venta = Venta.objects.create(usuario='admin')
+        DetalleVenta.objects.create(
+            venta=venta, producto=self.productos[0], cantidad=100, precio_unitario=Decimal('150')
+        )
+
+    def test_clases_por_participacion_acumulada(self):
+        response = self.client.get('/api/reportes/abc_productos/')
+        self.assertEqual(response.status_code, 200)
+        clases = {p['codigo']: p['clase'] for p in response.data['productos']}
+        self.assertEqual(clases, {'P0': 'A', 'P1': 'B', 'P2': 'C'})
+        self.assertEqual(response.data['total_ingresos'], 16800.0)
+        self.assertEqual(response.data['productos'][-1]['participacion_acumulada'], 100.0)
+
+    def test_criterio_margen(self):
+        response = self.client.get('/api/reportes/abc_productos/?criterio=margen')
+        self.assertEqual(response.data['total_margen'], 5600.0)
+        self.assertEqual(response.data['productos'][0]['margen'], 5200.0)
+
+    def test_criterio_invalido(self):
+        response = self.client.get('/api/reportes/abc_productos/?criterio=otro')
+        self.assertEqual(response.status_code, 400)
+
+    def test_dias_fuera_de_rango(self):
+        for dias in ('0', '-5', '3651', '99999999'):
+            with self.subTest(dias=dias):
+                response = self.client.get(f'/api/reportes/abc_productos/?dias={dias}')
+                self.assertEqual(response.status_code, 400)
+
+
+class PronosticoDemandaTest(ReportesTestCase):
+
+    def test_demanda_constante(self):
+        producto = Producto.objects.create(
+            codigo='P9', nombre='Producto 9', costo=Decimal('100'),
+            precio_venta=Decimal('150'), stock_actual=20, stock_minimo=5
+        )
+        mediodia = timezone.localtime().replace(hour=12, minute=0, second=0, microsecond=0)
+        for dias in range(1, 15):
+            venta = Venta.objects.create(fecha=mediodia - timedelta(days=dias), usuario='admin')
+            DetalleVenta.objects.create(
+                venta=venta, producto=producto, cantidad=3, precio_unitario=Decimal('150')
+            )
+
+        response = self.client.get('/api/reportes/pronostico_demanda/?dias_historia=14')
+        self.assertEqual(response.status_code, 200)
+        pronostico = next(p for p in response.data['productos'] if p['codigo'] == 'P9')
+        self.assertEqual(pronostico['vendidas_historia'], 42)
+        self.assertEqual(pronostico['venta_diaria_estimada'], 3.0)
+        self.assertEqual(pronostico['dias_cobertura'], 6)
+        self.assertEqual(
+            pronostico['fecha_quiebre'], (timezone.localdate() + timedelta(days=6)).isoformat()
+        )
+
+    def test_parametros_invalidos(self):
+        response = self.client.get('/api/reportes/pronostico_demanda/?alfa=2')
+        self.assertEqual(response.status_code, 400)
+
+
+class MargenCostoHistoricoTest(ReportesTestCase):
+
+    def test_margen_no_cambia_con_el_costo_actual(self):
+        margen = self.client.get('/api/reportes/ventas_diarias/').data['detalle_productos'][0]['margen_ganancia']
+        self.assertEqual(margen, Decimal('100.00'))
+
+        Producto.objects.filter(id__in=[p.id for p in self.productos]).update(costo=Decimal('140'))
+        cache.clear()
+
+        margen = self.client.get('/api/reportes/ventas_diarias/').data['detalle_productos'][0]['margen_ganancia']
+        self.assertEqual(margen, Decimal('100.00'))
+
+
+class QuiebresStockTest(ReportesTestCase):
+
+    def _intervalos(self):
+        return list(QuiebreStock.objects.order_by('producto_id', 'inicio').values_list('producto_id', 'inicio', 'fin'))
+
+    def test_intervalos_incrementales_coinciden_con_reconstruccion(self):
+        producto = self.productos[1]
+        aplicar_deltas_stock({producto.id: -20}, motivo='Venta', usuario='admin', tipo_negativo='SALIDA')
+        aplicar_deltas_stock({producto.id: 5}, motivo='Compra', usuario='admin', tipo_positivo='ENTRADA')
+        aplicar_deltas_stock({producto.id: -5}, motivo='Venta', usuario='admin', tipo_negativo='SALIDA')
+
+        intervalos = QuiebreStock.objects.filter(producto=producto)
+        self.assertEqual(intervalos.count(), 2)
+        self.assertEqual(intervalos.filter(fin__isnull=True).count(), 1)
+
+        incremental = self._intervalos()
+        reconstruir_quiebres()
+        self.assertEqual(incremental, self._intervalos())
+
+    def test_tiempo_sin_stock_en_rango(self):
+        QuiebreStock.objects.all().delete()
+        hoy = timezone.localdate()
+        desde = hoy - timedelta(days=3)
+        inicio = timezone.make_aware(timezone.datetime.combine(desde, timezone.datetime.min.time()))
+        # Empieza antes del rango: solo cuentan las 12 horas dentro
+        QuiebreStock.objects.create(
+            producto=self.productos[1], inicio=inicio - timedelta(hours=12), fin=inicio + timedelta(hours=12)
+        )
+
+        response = self.client.get(
+            f'/api/reportes/quiebres_stock/?fecha_desde={desde}&fecha_hasta={hoy - timedelta(days=1)}'
+        )
+        self.assertEqual(response.status_code, 200)
+        quiebre = response.data['quiebres'][0]
+        self.assertEqual(quiebre['producto__codigo'], 'P1')
+        self.assertEqual(quiebre['horas_sin_stock'], 12.0)
+        # Periodo cerrado (en caché sin expiración): sin estado actual del producto
+        self.assertNotIn('sin_stock_actualmente', quiebre)
+        # 2 unidades vendidas ayer en 2,5 días con stock: 0,8 por día durante 0,5 días
+        self.assertEqual(quiebre['ventas_perdidas_estimadas'], 0.4)
+
+    def test_estado_actual_solo_en_periodos_abiertos(self):
+        hoy = timezone.localdate()
+        producto = self.productos[1]
+        aplicar_deltas_stock({producto.id: -20}, motivo='Venta', usuario='admin', tipo_negativo='SALIDA')
+        QuiebreStock.objects.filter(producto=producto).update(inicio=timezone.now() - timedelta(days=2))
+
+        url = f'/api/reportes/quiebres_stock/?fecha_desde={hoy - timedelta(days=2)}&fecha_hasta='
+        cerrado = self.client.get(f'{url}{hoy - timedelta(days=1)}').data['quiebres']
+        abierto = self.client.get(f'{url}{hoy}').data['quiebres']
+
+        self.assertIn('P1', [q['producto__codigo'] for q in cerrado])
+        self.assertFalse(any('sin_stock_actualmente' in q for q in cerrado))
+        self.assertTrue(next(q for q in abierto if q['producto__codigo'] == 'P1')['sin_stock_actualmente'])
+
+
+class DashboardTest(ReportesTestCase):
+
+    def test_secciones(self):
+        response = self.client.get('/api/reportes/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['ventas_hoy']['cantidad'], 1)
+        self.assertEqual(response.data['ventas_ayer']['total'], 900.0)
+        self.assertEqual(response.data['compras_hoy']['total'], 1500.0)
+        self.assertEqual(response.data['productos_activos']['cantidad'], 3)
+        self.assertEqual(response.data['bajo_stock']['cantidad'], 1)
+        self.assertEqual(response.data['bajo_stock']['productos'][0]['codigo'], 'P0')
+        for seccion in ('ventas_hoy', 'bajo_stock', 'quiebres_semana', 'rotacion', 'alertas'):
+            self.assertIn('actualizado', response.data[seccion])
+
+    def test_con_cache_solo_consulta_alertas(self):
+        self.client.get('/api/reportes/dashboard/')
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/reportes/dashboard/')
+        self.assertEqual(response.status_code, 200)
+
+
+class SerieVentasTest(ReportesTestCase):
+
+    def _resumenes(self):
+        return (
+            sorted(VentaDiaProducto.objects.exclude(unidades=0).values_list(
+                'fecha', 'producto_id', 'unidades', 'total', 'costo'
+            )),
+            sorted(VentaDiaUsuario.objects.exclude(cantidad_ventas=0).values_list(
+                'fecha', 'usuario', 'cantidad_ventas', 'total'
+            )),
+        )
+
+    def test_resumen_incremental_coincide_con_reconstruccion(self):
+        venta = Venta.objects.order_by('fecha').first()
+        detalle = venta.items.get(producto=self.productos[0])
+        detalle.cantidad = 5
+        detalle.save()
+        venta.items.get(producto=self.productos[1]).delete()
+        venta.fecha -= timedelta(days=3)
+        venta.save()
+        Venta.objects.order_by('fecha').last().delete()
+
+        incremental = self._resumenes()
+        reconstruir_ventas_dia()
+        self.assertEqual(incremental, self._resumenes())
+
+    def test_serie_densa_por_producto(self):
+        hoy = timezone.localdate()
+        response = self.client.get(
+            f'/api/reportes/ventas/serie/?desde={hoy - timedelta(days=3)}&hasta={hoy}&agrupar=producto&limite=2'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['periodos']), 4)
+        self.assertEqual(response.data['totales']['cantidad_ventas'], [0, 0, 1, 1])
+        self.assertEqual(response.data['totales']['total'], [0.0, 0.0, 900.0, 900.0])
+        self.assertEqual(response.data['totales']['margen'], [0.0, 0.0, 300.0, 300.0])
+        self.assertEqual(len(response.data['series']), 2)
+        self.assertEqual(response.data['cantidad_series'], 3)
+        self.assertEqual(response.data['series'][0]['unidades'], [0, 0, 2, 2])
+
+        response = self.client.get(f'/api/reportes/ventas/serie/?desde={hoy}&hasta={hoy}&granularidad=año')
+        self.assertEqual(response.status_code, 400)
+
+
+@skipUnless(PYARROW_AVAILABLE, 'requiere pyarrow')
+class ExportacionColumnarTest(ReportesTestCase):
+
+    def test_ventas_por_linea_en_parquet(self):
+        import pyarrow.parquet as pq
+
+        response = self.client.get('/api/ventas/exportar_csv/?formato=parquet')
+        self.assertEqual(response.status_code, 200)
+        tabla = pq.read_table(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(tabla.num_rows, 6)
+        self.assertEqual(str(tabla.schema.field('subtotal').type), 'decimal128(14, 2)')
+        self.assertEqual(sum(tabla.column('cantidad').to_pylist()), 12)
+
+    def test_tabla_de_reporte_en_arrow(self):
+        import pyarrow as pa
+
+        response = self.client.get('/api/reportes/reporte_productos/?formato=arrow&tabla=productos_mas_vendidos')
+        self.assertEqual(response.status_code, 200)
+        tabla = pa.ipc.open_stream(b''.join(response.streaming_content)).read_all()
+        self.assertEqual(tabla.num_rows, 3)
+
+        response = self.client.get('/api/reportes/reporte_productos/?formato=arrow&tabla=otra')
+        self.assertEqual(response.status_code, 400)
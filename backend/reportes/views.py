@@ -3,18 +3,22 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.http import HttpResponse
-from django.db.models import Sum, Count, F, Q, Avg, Min, Value
-from django.db.models.functions import TruncDate
+from django.db.models import Sum, Count, F, Avg, Min, Value, OuterRef, Subquery, IntegerField, DecimalField
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from datetime import datetime, timedelta
 import csv
 from decimal import Decimal
 from usuarios.permissions import PuedeReportes
 
-from ventas.models import Venta, DetalleVenta
+from ventas.models import DetalleVenta
 from compras.models import Compra, DetalleCompra
 from inventario.models import Producto, Proveedor
 
+from .cache import obtener_reporte
+from .columnar import FORMATOS_COLUMNARES, respuesta_columnar_registros
+from .series import AGRUPACIONES, GRANULARIDADES, periodos, serie_ventas, tablas_serie
+
 # Importar openpyxl para Excel
 try:
     from openpyxl import Workbook
@@ -24,10 +28,158 @@ try:
 except ImportError:
     OPENPYXL_AVAILABLE = False
 
+# Períodos máximos de una serie de ventas (p. ej. algo más de un año por día)
+MAX_PERIODOS_SERIE = 400
+
+DIAS_SEMANA = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
+
+
+def _suma_relacionada(modelo, campo_relacion, campo_fecha, desde, campo_suma='cantidad', output_field=None, hasta=None):
+    """
+    Subconsulta correlacionada con la suma de `campo_suma` de `modelo` por objeto externo.
+
+    A diferencia de Sum('relacion__campo') en un annotate, cada suma se calcula de
+    forma independiente: combinar varias no multiplica filas (ventas x compras).
+    """
+    output_field = output_field or IntegerField()
+    filtros = {campo_relacion: OuterRef('pk'), f'{campo_fecha}__gte': desde}
+    if hasta is not None:
+        filtros[f'{campo_fecha}__lte'] = hasta
+    subconsulta = modelo.objects.filter(**filtros).order_by().values(campo_relacion).annotate(total=Sum(campo_suma)).values('total')
+    return Coalesce(Subquery(subconsulta, output_field=output_field), Value(0), output_field=output_field)
+
 
 class ReportesViewSet(viewsets.ViewSet):
     """ViewSet para generar reportes"""
     permission_classes = [IsAuthenticated, PuedeReportes]  # Solo Administrador
+    # Solo lectura: todas las acciones pueden leer de la réplica (erp_minimarket.routers)
+    acciones_replica = '__all__'
+
+    @action(detail=False, methods=['get'])
+    def dashboard(self, request):
+        """
+        Indicadores de la pantalla de inicio en una sola respuesta.
+
+        Cada sección sale de un conjunto de datos en caché (compartido con el reporte
+        correspondiente cuando existe) e informa en 'actualizado' cuándo se calculó.
+        Solo las alertas no leídas se consultan en cada llamada.
+        """
+        from usuarios.models import AlertaStock
+
+        hoy = timezone.localdate()
+        ayer = hoy - timedelta(days=1)
+        lunes = hoy - timedelta(days=hoy.weekday())
+
+        ventas_hoy, actualizado_ventas_hoy = self._reporte_ventas_diarias(hoy, con_fecha=True)
+        ventas_ayer, actualizado_ventas_ayer = self._reporte_ventas_diarias(ayer, con_fecha=True)
+        compras_hoy, actualizado_compras = obtener_reporte(
+            'dashboard_compras',
+            {'fecha': hoy},
+            lambda: self._datos_dashboard_compras(hoy),
+            dominios=('compras',),
+            desde=hoy,
+            hasta=hoy,
+            con_fecha=True
+        )
+        inventario, actualizado_inventario = obtener_reporte(
+            'dashboard_inventario',
+            {},
+            self._datos_dashboard_inventario,
+            dominios=('inventario',),
+            con_fecha=True
+        )
+        quiebres, actualizado_quiebres = self._reporte_quiebres(
+            'quiebres_semana', lunes, lunes + timedelta(days=6), con_fecha=True
+        )
+        rotacion, actualizado_rotacion = self._reporte_rotacion(con_fecha=True)
+
+        alertas = list(
+            AlertaStock.objects.filter(leida=False, producto__activo=True)
+            .values_list('producto_id', flat=True)
+        )
+        con_alerta = set(alertas)
+
+        productos_rotacion = rotacion['productos']
+        rotacion_promedio = (
+            sum(p['rotacion'] for p in productos_rotacion) / len(productos_rotacion)
+            if productos_rotacion else 0
+        )
+
+        return Response({
+            'generado': timezone.now().isoformat(),
+            'ventas_hoy': {
+                'total': float(ventas_hoy['total_ventas']),
+                'cantidad': ventas_hoy['cantidad_ventas'],
+                'top_productos': ventas_hoy['detalle_productos'][:5],
+                'actualizado': actualizado_ventas_hoy.isoformat(),
+            },
+            'ventas_ayer': {
+                'total': float(ventas_ayer['total_ventas']),
+                'cantidad': ventas_ayer['cantidad_ventas'],
+                'actualizado': actualizado_ventas_ayer.isoformat(),
+            },
+            'compras_hoy': {
+                'total': float(compras_hoy['total']),
+                'cantidad': compras_hoy['cantidad'],
+                'actualizado': actualizado_compras.isoformat(),
+            },
+            'productos_activos': {
+                'cantidad': inventario['productos_activos'],
+                'actualizado': actualizado_inventario.isoformat(),
+            },
+            'bajo_stock': {
+                'cantidad': inventario['cantidad_bajo_stock'],
+                'productos': [
+                    dict(p, alerta_no_leida=p['id'] in con_alerta)
+                    for p in inventario['productos_bajo_stock']
+                ],
+                'actualizado': actualizado_inventario.isoformat(),
+            },
+            'alertas': {
+                'no_leidas': len(alertas),
+                'actualizado': timezone.now().isoformat(),
+            },
+            'quiebres_semana': {
+                'fecha_inicio': lunes.isoformat(),
+                'total': len(quiebres['quiebres']),
+                'quiebres': quiebres['quiebres'][:5],
+                'actualizado': actualizado_quiebres.isoformat(),
+            },
+            'rotacion': {
+                'promedio': round(rotacion_promedio, 2),
+                'productos': len(productos_rotacion),
+                'actualizado': actualizado_rotacion.isoformat(),
+            },
+        })
+
+    def _datos_dashboard_compras(self, fecha):
+        fecha_desde = timezone.make_aware(datetime.combine(fecha, datetime.min.time()))
+        fecha_hasta = timezone.make_aware(datetime.combine(fecha, datetime.max.time()))
+        resumen = Compra.objects.filter(
+            fecha__gte=fecha_desde, fecha__lte=fecha_hasta
+        ).aggregate(total=Sum('total'), cantidad=Count('id'))
+        return {
+            'total': resumen['total'] or Decimal('0.00'),
+            'cantidad': resumen['cantidad'],
+        }
+
+    def _datos_dashboard_inventario(self):
+        from django.db.models import Q
+
+        bajo_minimo = Q(stock_actual__lte=F('stock_minimo'))
+        conteos = Producto.objects.filter(activo=True).aggregate(
+            activos=Count('id'),
+            bajo_stock=Count('id', filter=bajo_minimo)
+        )
+        # Mismo filtro y orden que inventario.bajo_stock (índice parcial)
+        primeros = Producto.objects.filter(bajo_minimo, activo=True).order_by('nombre').values(
+            'id', 'codigo', 'nombre', 'stock_actual', 'stock_minimo'
+        )[:5]
+        return {
+            'productos_activos': conteos['activos'],
+            'cantidad_bajo_stock': conteos['bajo_stock'],
+            'productos_bajo_stock': list(primeros),
+        }
 
     @action(detail=False, methods=['get'])
     def ventas_diarias(self, request):
@@ -39,40 +191,57 @@ class ReportesViewSet(viewsets.ViewSet):
             else:
                 fecha_obj = timezone.now().date()
             
-            fecha_desde = timezone.make_aware(datetime.combine(fecha_obj, datetime.min.time()))
-            fecha_hasta = timezone.make_aware(datetime.combine(fecha_obj, datetime.max.time()))
         except ValueError:
             return Response(
                 {'error': 'Formato de fecha inválido. Use YYYY-MM-DD'},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        ventas = Venta.objects.filter(fecha__gte=fecha_desde, fecha__lte=fecha_hasta)
-        
-        total_ventas = ventas.aggregate(total=Sum('total'))['total'] or Decimal('0.00')
-        cantidad_ventas = ventas.count()
-        
-        # Detalle por producto
-        detalles = DetalleVenta.objects.filter(
-            venta__fecha__gte=fecha_desde,
-            venta__fecha__lte=fecha_hasta
-        ).values('producto__nombre', 'producto__codigo').annotate(
-            cantidad_vendida=Sum('cantidad'),
-            total_vendido=Sum(F('cantidad') * F('precio_unitario')),
-            margen_ganancia=Sum((F('cantidad') * F('precio_unitario')) - (F('producto__costo') * F('cantidad')))
-        ).order_by('-total_vendido')
+        datos = self._reporte_ventas_diarias(fecha_obj)
 
         formato = request.query_params.get('formato', 'json')
+        if formato in FORMATOS_COLUMNARES:
+            return self._exportar_tablas(request, formato, 'ventas_diarias', {'detalle_productos': datos['detalle_productos']})
         if formato == 'csv' or formato == 'excel':
-            return self._generar_excel_ventas_diarias(ventas, detalles, fecha_obj)
+            return self._generar_excel_ventas_diarias(datos)
 
         return Response({
-            'fecha': fecha_obj.isoformat(),
-            'total_ventas': float(total_ventas),
-            'cantidad_ventas': cantidad_ventas,
-            'detalle_productos': list(detalles)
+            'fecha': datos['fecha'].isoformat(),
+            'total_ventas': float(datos['total_ventas']),
+            'cantidad_ventas': datos['cantidad_ventas'],
+            'detalle_productos': datos['detalle_productos']
         })
 
+    def _reporte_ventas_diarias(self, fecha_obj, con_fecha=False):
+        return obtener_reporte(
+            'ventas_diarias',
+            {'fecha': fecha_obj},
+            lambda: self._datos_ventas_diarias(fecha_obj),
+            dominios=('ventas',),
+            desde=fecha_obj,
+            hasta=fecha_obj,
+            con_fecha=con_fecha
+        )
+
+    def _datos_ventas_diarias(self, fecha_obj):
+        serie = serie_ventas(fecha_obj, fecha_obj, 'dia', agrupar='producto')
+        return {
+            'fecha': fecha_obj,
+            'total_ventas': serie['totales']['total'][0],
+            'cantidad_ventas': serie['totales']['cantidad_ventas'][0],
+            'detalle_productos': [
+                {
+                    'producto__nombre': producto['nombre'],
+                    'producto__codigo': producto['codigo'],
+                    'cantidad_vendida': producto['unidades'][0],
+                    'total_vendido': producto['total'][0],
+                    # Costo guardado en cada línea: el margen no cambia con compras posteriores
+                    'margen_ganancia': producto['margen'][0],
+                }
+                for producto in serie['series']
+            ],
+        }
+
     @action(detail=False, methods=['get'])
     def compras_mensuales(self, request):
         """Reporte de compras mensuales"""
@@ -105,14 +274,43 @@ class ReportesViewSet(viewsets.ViewSet):
         else:
             fecha_fin = datetime(año, mes + 1, 1).date() - timedelta(days=1)
 
+        datos = obtener_reporte(
+            'compras_mensuales',
+            {'año': año, 'mes': mes},
+            lambda: self._datos_compras_mensuales(año, mes, fecha_inicio, fecha_fin),
+            dominios=('compras',),
+            desde=fecha_inicio,
+            hasta=fecha_fin
+        )
+
+        formato = request.query_params.get('formato', 'json')
+        if formato in FORMATOS_COLUMNARES:
+            return self._exportar_tablas(request, formato, f'compras_mensuales_{año}_{mes:02d}', {
+                'top_productos': datos['top_productos'],
+                'compras_por_proveedor': datos['compras_por_proveedor'],
+            })
+        if formato == 'csv':
+            return self._generar_csv_compras_mensuales(datos)
+        elif formato == 'excel':
+            return self._generar_excel_compras_mensuales(datos)
+
+        return Response({
+            'año': año,
+            'mes': mes,
+            'fecha_inicio': fecha_inicio.isoformat(),
+            'fecha_fin': fecha_fin.isoformat(),
+            'total_compras': float(datos['total_compras']),
+            'cantidad_compras': datos['cantidad_compras'],
+            'top_productos': datos['top_productos'],
+            'compras_por_proveedor': datos['compras_por_proveedor']
+        })
+
+    def _datos_compras_mensuales(self, año, mes, fecha_inicio, fecha_fin):
         fecha_desde = timezone.make_aware(datetime.combine(fecha_inicio, datetime.min.time()))
         fecha_hasta = timezone.make_aware(datetime.combine(fecha_fin, datetime.max.time()))
 
         compras = Compra.objects.filter(fecha__gte=fecha_desde, fecha__lte=fecha_hasta)
         
-        total_compras = compras.aggregate(total=Sum('total'))['total'] or Decimal('0.00')
-        cantidad_compras = compras.count()
-        
         # Top productos comprados
         top_productos = DetalleCompra.objects.filter(
             compra__fecha__gte=fecha_desde,
@@ -122,53 +320,62 @@ class ReportesViewSet(viewsets.ViewSet):
             total_comprado=Sum(F('cantidad') * F('costo_unitario'))
         ).order_by('-total_comprado')[:10]
 
-        # Compras por proveedor
-        compras_por_proveedor = compras.values('proveedor__nombre', 'proveedor__id').annotate(
+        # Compras por proveedor (los totales del mes se obtienen de esta misma agrupación)
+        compras_por_proveedor = list(compras.values('proveedor__nombre', 'proveedor__id').annotate(
             total_comprado=Sum('total'),
             cantidad_compras=Count('id')
-        ).order_by('-total_comprado')
+        ).order_by('-total_comprado'))
 
-        formato = request.query_params.get('formato', 'json')
-        if formato == 'csv':
-            return self._generar_csv_compras_mensuales(compras, top_productos, compras_por_proveedor, año, mes)
-        elif formato == 'excel':
-            return self._generar_excel_compras_mensuales(compras, top_productos, compras_por_proveedor, año, mes)
-
-        return Response({
+        return {
             'año': año,
             'mes': mes,
-            'fecha_inicio': fecha_inicio.isoformat(),
-            'fecha_fin': fecha_fin.isoformat(),
-            'total_compras': float(total_compras),
-            'cantidad_compras': cantidad_compras,
+            'total_compras': sum((p['total_comprado'] or 0 for p in compras_por_proveedor), Decimal('0.00')),
+            'cantidad_compras': sum(p['cantidad_compras'] for p in compras_por_proveedor),
             'top_productos': list(top_productos),
-            'compras_por_proveedor': list(compras_por_proveedor)
-        })
+            'compras_por_proveedor': compras_por_proveedor,
+        }
 
     @action(detail=False, methods=['get'])
     def reporte_proveedores(self, request):
         """Reporte de proveedores con estadísticas"""
+        datos = obtener_reporte(
+            'reporte_proveedores',
+            {'dia': timezone.localdate()},
+            self._datos_proveedores,
+            dominios=('compras', 'inventario')
+        )
+
+        formato = request.query_params.get('formato', 'json')
+        if formato in FORMATOS_COLUMNARES:
+            return self._exportar_tablas(request, formato, 'reporte_proveedores', {'proveedores': datos['proveedores']})
+        if formato == 'csv':
+            return self._generar_csv_proveedores(datos)
+        elif formato == 'excel':
+            return self._generar_excel_proveedores(datos)
+
+        return Response({
+            'proveedores': [
+                dict(p, total_compras_30dias=float(p['total_compras_30dias']))
+                for p in datos['proveedores']
+            ]
+        })
+
+    def _datos_proveedores(self):
         from inventario.models import Proveedor
         
+        desde = timezone.now() - timedelta(days=30)
         proveedores = Proveedor.objects.filter(activo=True).annotate(
             cantidad_productos=Count('producto', distinct=True),
-            total_compras=Sum(
-                'compra__total',
-                filter=Q(compra__fecha__gte=timezone.now() - timedelta(days=30))
+            total_compras=_suma_relacionada(
+                Compra, 'proveedor', 'fecha', desde, campo_suma='total',
+                output_field=DecimalField(max_digits=14, decimal_places=2)
             ),
-            cantidad_compras=Count(
-                'compra',
-                filter=Q(compra__fecha__gte=timezone.now() - timedelta(days=30))
+            cantidad_compras=_suma_relacionada(
+                Compra, 'proveedor', 'fecha', desde, campo_suma=Value(1)
             )
         ).order_by('-total_compras')
 
-        formato = request.query_params.get('formato', 'json')
-        if formato == 'csv':
-            return self._generar_csv_proveedores(proveedores)
-        elif formato == 'excel':
-            return self._generar_excel_proveedores(proveedores)
-
-        return Response({
+        return {
             'proveedores': [
                 {
                     'id': p.id,
@@ -178,58 +385,68 @@ class ReportesViewSet(viewsets.ViewSet):
                     'telefono': p.telefono or '',
                     'email': p.email or '',
                     'cantidad_productos': p.cantidad_productos or 0,
-                    'total_compras_30dias': float(p.total_compras or 0),
+                    'total_compras_30dias': p.total_compras or Decimal('0.00'),
                     'cantidad_compras_30dias': p.cantidad_compras or 0,
                 }
                 for p in proveedores
             ]
-        })
+        }
 
     @action(detail=False, methods=['get'])
     def reporte_productos(self, request):
         """Reporte de productos con estadísticas"""
-        productos = Producto.objects.filter(activo=True).select_related('categoria').annotate(
-            cantidad_vendida_30dias=Sum(
-                'detalleventa__cantidad',
-                filter=Q(detalleventa__venta__fecha__gte=timezone.now() - timedelta(days=30))
-            ),
-            cantidad_comprada_30dias=Sum(
-                'detallecompra__cantidad',
-                filter=Q(detallecompra__compra__fecha__gte=timezone.now() - timedelta(days=30))
-            )
+        datos = obtener_reporte(
+            'reporte_productos',
+            {'dia': timezone.localdate()},
+            self._datos_productos,
+            dominios=('ventas', 'compras', 'inventario')
         )
 
-        # Productos con stock bajo - QuerySet para Excel/CSV
-        productos_bajo_stock_qs = productos.filter(
-            stock_actual__lte=F('stock_minimo')
-        )
-        
-        # Productos más vendidos (30 días) - QuerySet para Excel/CSV
-        productos_mas_vendidos_qs = productos.filter(
-            cantidad_vendida_30dias__gt=0
-        ).order_by('-cantidad_vendida_30dias')[:10]
-
         formato = request.query_params.get('formato', 'json')
+        if formato in FORMATOS_COLUMNARES:
+            return self._exportar_tablas(request, formato, 'reporte_productos', {
+                'productos_bajo_stock': datos['productos_bajo_stock'],
+                'productos_mas_vendidos': datos['productos_mas_vendidos'],
+            })
         if formato == 'csv':
-            return self._generar_csv_productos(productos, productos_bajo_stock_qs, productos_mas_vendidos_qs)
+            return self._generar_csv_productos(datos)
         elif formato == 'excel':
-            return self._generar_excel_productos(productos, productos_bajo_stock_qs, productos_mas_vendidos_qs)
+            return self._generar_excel_productos(datos)
+
+        return Response({
+            'productos_bajo_stock': datos['productos_bajo_stock'],
+            'productos_mas_vendidos': datos['productos_mas_vendidos'],
+            'total_productos_activos': datos['total_productos_activos'],
+            'total_productos_bajo_stock': len(datos['productos_bajo_stock']),
+        })
+
+    def _datos_productos(self):
+        desde = timezone.now() - timedelta(days=30)
+        productos = Producto.objects.filter(activo=True).annotate(
+            cantidad_vendida_30dias=_suma_relacionada(DetalleVenta, 'producto', 'venta__fecha', desde),
+            cantidad_comprada_30dias=_suma_relacionada(DetalleCompra, 'producto', 'compra__fecha', desde)
+        )
 
-        # Para JSON, convertir a lista de diccionarios
-        productos_bajo_stock_list = list(productos_bajo_stock_qs.values(
+        # Productos con stock bajo (sin las sumas: se resuelve con el índice parcial)
+        productos_bajo_stock = Producto.objects.filter(
+            activo=True,
+            stock_actual__lte=F('stock_minimo')
+        ).values(
             'codigo', 'nombre', 'stock_actual', 'stock_minimo', 'categoria__nombre'
-        ))
+        )
         
-        productos_mas_vendidos_list = list(productos_mas_vendidos_qs.values(
-            'codigo', 'nombre', 'cantidad_vendida_30dias', 'precio_venta'
-        ))
+        # Productos más vendidos (30 días)
+        productos_mas_vendidos = productos.filter(
+            cantidad_vendida_30dias__gt=0
+        ).order_by('-cantidad_vendida_30dias').values(
+            'codigo', 'nombre', 'cantidad_vendida_30dias', 'cantidad_comprada_30dias', 'precio_venta'
+        )[:10]
 
-        return Response({
-            'productos_bajo_stock': productos_bajo_stock_list,
-            'productos_mas_vendidos': productos_mas_vendidos_list,
-            'total_productos_activos': productos.count(),
-            'total_productos_bajo_stock': len(productos_bajo_stock_list),
-        })
+        return {
+            'productos_bajo_stock': list(productos_bajo_stock),
+            'productos_mas_vendidos': list(productos_mas_vendidos),
+            'total_productos_activos': Producto.objects.filter(activo=True).count(),
+        }
 
     @action(detail=False, methods=['get'])
     def ventas_semanales(self, request):
@@ -249,36 +466,45 @@ class ReportesViewSet(viewsets.ViewSet):
             )
 
         fecha_fin = fecha_inicio + timedelta(days=6)
-        fecha_desde = timezone.make_aware(datetime.combine(fecha_inicio, datetime.min.time()))
-        fecha_hasta = timezone.make_aware(datetime.combine(fecha_fin, datetime.max.time()))
 
-        ventas = Venta.objects.filter(fecha__gte=fecha_desde, fecha__lte=fecha_hasta)
-        
-        total_ventas = ventas.aggregate(total=Sum('total'))['total'] or Decimal('0.00')
-        cantidad_ventas = ventas.count()
-        
-        # Ventas por día
-        ventas_por_dia = ventas.annotate(
-            dia=TruncDate('fecha')
-        ).values('dia').annotate(
-            total_dia=Sum('total'),
-            cantidad_dia=Count('id')
-        ).order_by('dia')
+        datos = obtener_reporte(
+            'ventas_semanales',
+            {'fecha_inicio': fecha_inicio},
+            lambda: self._datos_ventas_semanales(fecha_inicio, fecha_fin),
+            dominios=('ventas',),
+            desde=fecha_inicio,
+            hasta=fecha_fin
+        )
 
         formato = request.query_params.get('formato', 'json')
-        if formato == 'csv':
-            return self._generar_csv_ventas_semanales(ventas, ventas_por_dia, fecha_inicio, fecha_fin)
-        elif formato == 'excel':
-            return self._generar_excel_ventas_semanales(ventas, ventas_por_dia, fecha_inicio, fecha_fin)
+        if formato in FORMATOS_COLUMNARES:
+            return self._exportar_tablas(request, formato, f'ventas_semanales_{fecha_inicio}', {'ventas_por_dia': datos['ventas_por_dia']})
+        if formato == 'csv' or formato == 'excel':
+            return self._generar_csv_ventas_semanales(datos)
 
         return Response({
             'fecha_inicio': fecha_inicio.isoformat(),
             'fecha_fin': fecha_fin.isoformat(),
-            'total_ventas': float(total_ventas),
-            'cantidad_ventas': cantidad_ventas,
-            'ventas_por_dia': list(ventas_por_dia)
+            'total_ventas': float(datos['total_ventas']),
+            'cantidad_ventas': datos['cantidad_ventas'],
+            'ventas_por_dia': datos['ventas_por_dia']
         })
 
+    def _datos_ventas_semanales(self, fecha_inicio, fecha_fin):
+        serie = serie_ventas(fecha_inicio, fecha_fin, 'dia', solo_ventas=True)
+        totales = serie['totales']
+        return {
+            'fecha_inicio': fecha_inicio,
+            'fecha_fin': fecha_fin,
+            'total_ventas': sum(totales['total'], Decimal('0.00')),
+            'cantidad_ventas': sum(totales['cantidad_ventas']),
+            # Los siete días de la semana, también los que no tuvieron ventas
+            'ventas_por_dia': [
+                {'dia': dia, 'total_dia': total, 'cantidad_dia': cantidad}
+                for dia, total, cantidad in zip(serie['periodos'], totales['total'], totales['cantidad_ventas'])
+            ],
+        }
+
     @action(detail=False, methods=['get'])
     def ventas_mensuales(self, request):
         """Reporte de ventas mensuales"""
@@ -311,95 +537,293 @@ class ReportesViewSet(viewsets.ViewSet):
         else:
             fecha_fin = datetime(año, mes + 1, 1).date() - timedelta(days=1)
 
-        fecha_desde = timezone.make_aware(datetime.combine(fecha_inicio, datetime.min.time()))
-        fecha_hasta = timezone.make_aware(datetime.combine(fecha_fin, datetime.max.time()))
-
-        ventas = Venta.objects.filter(fecha__gte=fecha_desde, fecha__lte=fecha_hasta)
-        
-        total_ventas = ventas.aggregate(total=Sum('total'))['total'] or Decimal('0.00')
-        cantidad_ventas = ventas.count()
-
-        # Top productos
-        top_productos = DetalleVenta.objects.filter(
-            venta__fecha__gte=fecha_desde,
-            venta__fecha__lte=fecha_hasta
-        ).values('producto__nombre', 'producto__codigo').annotate(
-            cantidad_vendida=Sum('cantidad'),
-            total_vendido=Sum(F('cantidad') * F('precio_unitario'))
-        ).order_by('-total_vendido')[:10]
+        datos = obtener_reporte(
+            'ventas_mensuales',
+            {'año': año, 'mes': mes},
+            lambda: self._datos_ventas_mensuales(año, mes, fecha_inicio, fecha_fin),
+            dominios=('ventas',),
+            desde=fecha_inicio,
+            hasta=fecha_fin
+        )
 
         formato = request.query_params.get('formato', 'json')
+        if formato in FORMATOS_COLUMNARES:
+            return self._exportar_tablas(request, formato, f'ventas_mensuales_{año}_{mes:02d}', {'top_productos': datos['top_productos']})
         if formato == 'csv':
-            return self._generar_csv_ventas_mensuales(ventas, top_productos, año, mes)
+            return self._generar_csv_ventas_mensuales(datos)
         elif formato == 'excel':
-            return self._generar_excel_ventas_mensuales(ventas, top_productos, año, mes)
+            return self._generar_excel_ventas_mensuales(datos)
 
         return Response({
             'año': año,
             'mes': mes,
             'fecha_inicio': fecha_inicio.isoformat(),
             'fecha_fin': fecha_fin.isoformat(),
-            'total_ventas': float(total_ventas),
-            'cantidad_ventas': cantidad_ventas,
-            'top_productos': list(top_productos)
+            'total_ventas': float(datos['total_ventas']),
+            'cantidad_ventas': datos['cantidad_ventas'],
+            'top_productos': datos['top_productos']
+        })
+
+    def _datos_ventas_mensuales(self, año, mes, fecha_inicio, fecha_fin):
+        serie = serie_ventas(fecha_inicio, fecha_fin, 'mes', agrupar='producto', limite=10)
+        return {
+            'año': año,
+            'mes': mes,
+            'total_ventas': serie['totales']['total'][0],
+            'cantidad_ventas': serie['totales']['cantidad_ventas'][0],
+            'top_productos': [
+                {
+                    'producto__nombre': producto['nombre'],
+                    'producto__codigo': producto['codigo'],
+                    'cantidad_vendida': producto['unidades'][0],
+                    'total_vendido': producto['total'][0],
+                }
+                for producto in serie['series']
+            ],
+        }
+
+    @action(detail=False, methods=['get'], url_path='ventas/serie')
+    def ventas_serie(self, request):
+        """
+        Serie de tiempo de ventas entre desde y hasta (por defecto, los últimos 30 días).
+
+        Parámetros: granularidad (dia, semana o mes), agrupar (producto, categoria o
+        usuario) y limite (cantidad de series, por defecto 10; 0 = todas).
+        """
+        hoy = timezone.localdate()
+        try:
+            hasta = datetime.strptime(request.query_params['hasta'], '%Y-%m-%d').date() \
+                if request.query_params.get('hasta') else hoy
+            desde = datetime.strptime(request.query_params['desde'], '%Y-%m-%d').date() \
+                if request.query_params.get('desde') else hasta - timedelta(days=29)
+        except ValueError:
+            return Response(
+                {'error': 'Formato de fecha inválido. Use YYYY-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if desde > hasta:
+            return Response(
+                {'error': 'desde no puede ser posterior a hasta'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        granularidad = request.query_params.get('granularidad', 'dia')
+        if granularidad not in GRANULARIDADES:
+            return Response(
+                {'error': f"granularidad debe ser una de: {', '.join(GRANULARIDADES)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        agrupar = request.query_params.get('agrupar') or None
+        if agrupar is not None and agrupar not in AGRUPACIONES:
+            return Response(
+                {'error': f"agrupar debe ser una de: {', '.join(AGRUPACIONES)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            limite = int(request.query_params.get('limite', 10))
+            if limite < 0:
+                raise ValueError
+        except ValueError:
+            return Response(
+                {'error': 'limite debe ser un número entero no negativo'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(periodos(desde, hasta, granularidad)) > MAX_PERIODOS_SERIE:
+            return Response(
+                {'error': f'El rango supera {MAX_PERIODOS_SERIE} períodos; use una granularidad mayor'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        datos = obtener_reporte(
+            'serie_ventas',
+            {'desde': desde, 'hasta': hasta, 'granularidad': granularidad, 'agrupar': agrupar, 'limite': limite},
+            lambda: serie_ventas(desde, hasta, granularidad, agrupar, limite),
+            # Los nombres de productos y categorías vienen del inventario
+            dominios=('ventas', 'inventario') if agrupar in ('producto', 'categoria') else ('ventas',),
+            desde=desde,
+            hasta=hasta
+        )
+
+        formato = request.query_params.get('formato', 'json')
+        if formato in FORMATOS_COLUMNARES:
+            return self._exportar_tablas(request, formato, f'serie_ventas_{desde}_{hasta}', tablas_serie(datos))
+        if formato == 'csv' or formato == 'excel':
+            return self._generar_csv_serie_ventas(datos)
+
+        def numeros(valores):
+            return [float(v) if isinstance(v, Decimal) else v for v in valores]
+
+        return Response({
+            'desde': desde.isoformat(),
+            'hasta': hasta.isoformat(),
+            'granularidad': granularidad,
+            'agrupar': agrupar,
+            'periodos': [p.isoformat() for p in datos['periodos']],
+            'totales': {campo: numeros(valores) for campo, valores in datos['totales'].items()},
+            'series': [
+                {campo: numeros(valor) if isinstance(valor, list) else valor for campo, valor in serie.items()}
+                for serie in datos['series']
+            ],
+            'cantidad_series': datos['cantidad_series'],
         })
 
     @action(detail=False, methods=['get'])
     def margen_productos(self, request):
         """Reporte de margen por producto"""
-        productos = Producto.objects.filter(activo=True).annotate(
-            margen_calculado=((F('precio_venta') - F('costo')) / F('costo')) * 100,
-            ganancia_unitaria=F('precio_venta') - F('costo')
-        ).order_by('-margen_calculado')
+        datos = obtener_reporte(
+            'margen_productos',
+            {},
+            self._datos_margen_productos,
+            dominios=('inventario',)
+        )
 
         formato = request.query_params.get('formato', 'json')
+        if formato in FORMATOS_COLUMNARES:
+            return self._exportar_tablas(request, formato, 'margen_productos', {'productos': datos['productos']})
         if formato == 'csv':
-            return self._generar_csv_margen_productos(productos)
+            return self._generar_csv_margen_productos(datos)
         elif formato == 'excel':
-            return self._generar_excel_margen_productos(productos)
+            return self._generar_excel_margen_productos(datos)
 
         return Response({
             'productos': [
                 {
-                    'codigo': p.codigo,
-                    'nombre': p.nombre,
-                    'costo': float(p.costo),
-                    'precio_venta': float(p.precio_venta),
-                    'margen_porcentaje': float(p.margen_calculado),
-                    'ganancia_unitaria': float(p.ganancia_unitaria),
-                    'stock_actual': p.stock_actual
+                    'codigo': p['codigo'],
+                    'nombre': p['nombre'],
+                    'costo': float(p['costo']),
+                    'precio_venta': float(p['precio_venta']),
+                    'margen_porcentaje': float(p['margen_calculado']),
+                    'ganancia_unitaria': float(p['ganancia_unitaria']),
+                    'stock_actual': p['stock_actual']
                 }
-                for p in productos
+                for p in datos['productos']
             ]
         })
 
+    def _datos_margen_productos(self):
+        productos = Producto.objects.filter(activo=True).annotate(
+            margen_calculado=((F('precio_venta') - F('costo')) / F('costo')) * 100,
+            ganancia_unitaria=F('precio_venta') - F('costo')
+        ).order_by('-margen_calculado').values(
+            'codigo', 'nombre', 'costo', 'precio_venta',
+            'margen_calculado', 'ganancia_unitaria', 'stock_actual'
+        )
+
+        return {'productos': list(productos)}
+
     @action(detail=False, methods=['get'])
     def rotacion_inventario(self, request):
         """Reporte de rotación de inventario"""
-        productos = Producto.objects.filter(activo=True).annotate(
-            cantidad_vendida=Sum(
-                'detalleventa__cantidad',
-                filter=Q(detalleventa__venta__fecha__gte=timezone.now() - timedelta(days=30))
-            )
-        )
+        datos = self._reporte_rotacion()
 
         formato = request.query_params.get('formato', 'json')
+        if formato in FORMATOS_COLUMNARES:
+            return self._exportar_tablas(request, formato, 'rotacion_inventario', {'productos': datos['productos']})
         if formato == 'csv':
-            return self._generar_csv_rotacion(productos)
+            return self._generar_csv_rotacion(datos)
         elif formato == 'excel':
-            return self._generar_excel_rotacion(productos)
+            return self._generar_excel_rotacion(datos)
 
         return Response({
+            'productos': datos['productos']
+        })
+
+    def _reporte_rotacion(self, con_fecha=False):
+        return obtener_reporte(
+            'rotacion_inventario',
+            {'dia': timezone.localdate()},
+            self._datos_rotacion,
+            dominios=('ventas', 'inventario'),
+            con_fecha=con_fecha
+        )
+
+    def _datos_rotacion(self):
+        desde = timezone.now() - timedelta(days=30)
+        productos = Producto.objects.filter(activo=True, stock_actual__gt=0).annotate(
+            cantidad_vendida=_suma_relacionada(DetalleVenta, 'producto', 'venta__fecha', desde)
+        ).values('codigo', 'nombre', 'stock_actual', 'cantidad_vendida')
+
+        return {
             'productos': [
                 {
-                    'codigo': p.codigo,
-                    'nombre': p.nombre,
-                    'stock_actual': p.stock_actual,
-                    'cantidad_vendida_30dias': p.cantidad_vendida or 0,
-                    'rotacion': (p.cantidad_vendida or 0) / p.stock_actual if p.stock_actual > 0 else 0
+                    'codigo': p['codigo'],
+                    'nombre': p['nombre'],
+                    'stock_actual': p['stock_actual'],
+                    'cantidad_vendida_30dias': p['cantidad_vendida'] or 0,
+                    'rotacion': (p['cantidad_vendida'] or 0) / p['stock_actual']
                 }
-                for p in productos if p.stock_actual > 0
+                for p in productos
             ]
+        }
+
+    @action(detail=False, methods=['get'])
+    def pronostico_demanda(self, request):
+        """
+        Pronóstico de demanda, días de cobertura y fecha estimada de quiebre por producto.
+
+        Parámetros: dias_historia (56), horizonte (30), alfa (0.3), categoria, proveedor
+        y solo_quiebre=true para listar solo los que se agotan dentro del horizonte.
+        """
+        try:
+            dias_historia = int(request.query_params.get('dias_historia', 56))
+            horizonte = int(request.query_params.get('horizonte', 30))
+            alfa = float(request.query_params.get('alfa', 0.3))
+        except ValueError:
+            return Response(
+                {'error': 'dias_historia y horizonte deben ser enteros y alfa un número'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if not (7 <= dias_historia <= 365 and 1 <= horizonte <= 180 and 0 < alfa <= 1):
+            return Response(
+                {'error': 'Use dias_historia entre 7 y 365, horizonte entre 1 y 180 y alfa en (0, 1]'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        categoria = request.query_params.get('categoria', None)
+        proveedor = request.query_params.get('proveedor', None)
+        solo_quiebre = request.query_params.get('solo_quiebre', 'false').lower() == 'true'
+
+        def calcular():
+            from .pronostico import pronosticar_demanda
+
+            productos = Producto.objects.filter(activo=True)
+            if categoria:
+                productos = productos.filter(categoria_id=categoria)
+            if proveedor:
+                productos = productos.filter(proveedor_id=proveedor)
+            return pronosticar_demanda(productos, dias_historia, horizonte, alfa)
+
+        datos = obtener_reporte(
+            'pronostico_demanda',
+            {
+                'dia': timezone.localdate(), 'dias_historia': dias_historia,
+                'horizonte': horizonte, 'alfa': alfa,
+                'categoria': categoria, 'proveedor': proveedor,
+            },
+            calcular,
+            dominios=('ventas', 'inventario')
+        )
+        if solo_quiebre:
+            datos = dict(datos, productos=[
+                p for p in datos['productos'] if p['dias_cobertura'] is not None
+            ])
+
+        formato = request.query_params.get('formato', 'json')
+        if formato in FORMATOS_COLUMNARES:
+            return self._exportar_tablas(request, formato, 'pronostico_demanda', {'productos': datos['productos']})
+        if formato == 'csv':
+            return self._generar_csv_pronostico(datos)
+        elif formato == 'excel':
+            return self._generar_excel_pronostico(datos)
+
+        return Response({
+            'fecha': datos['fecha'].isoformat(),
+            'parametros': datos['parametros'],
+            'productos': [
+                dict(p, fecha_quiebre=p['fecha_quiebre'].isoformat() if p['fecha_quiebre'] else None)
+                for p in datos['productos']
+            ],
         })
 
     @action(detail=False, methods=['get'])
@@ -414,47 +838,411 @@ class ReportesViewSet(viewsets.ViewSet):
             fecha_inicio = today - timedelta(days=today.weekday())
 
         fecha_fin = fecha_inicio + timedelta(days=6)
-        fecha_desde = timezone.make_aware(datetime.combine(fecha_inicio, datetime.min.time()))
-        fecha_hasta = timezone.make_aware(datetime.combine(fecha_fin, datetime.max.time()))
+        return self._responder_quiebres(request, 'quiebres_semana', fecha_inicio, fecha_fin)
 
-        # Buscar productos que tuvieron stock 0 o negativo durante la semana
-        from inventario.models import MovimientoStock
-        
-        quiebres = MovimientoStock.objects.filter(
-            fecha__gte=fecha_desde,
-            fecha__lte=fecha_hasta,
-            stock_nuevo__lte=0
-        ).values('producto__codigo', 'producto__nombre').annotate(
-            cantidad_quiebres=Count('id'),
-            fecha_primer_quiebre=Min('fecha'),
-            stock_minimo_alcanzado=Min('stock_nuevo')
-        ).order_by('-cantidad_quiebres')
+    @action(detail=False, methods=['get'])
+    def quiebres_stock(self, request):
+        """
+        Tiempo sin stock y ventas perdidas estimadas por producto en cualquier rango.
+
+        Parámetros: fecha_desde y fecha_hasta (YYYY-MM-DD; por defecto los últimos 30 días).
+        """
+        try:
+            hoy = timezone.localdate()
+            fecha_hasta_str = request.query_params.get('fecha_hasta', None)
+            fecha_desde_str = request.query_params.get('fecha_desde', None)
+            fecha_fin = datetime.strptime(fecha_hasta_str, '%Y-%m-%d').date() if fecha_hasta_str else hoy
+            fecha_inicio = (
+                datetime.strptime(fecha_desde_str, '%Y-%m-%d').date() if fecha_desde_str
+                else fecha_fin - timedelta(days=29)
+            )
+        except ValueError:
+            return Response(
+                {'error': 'Formato de fecha inválido. Use YYYY-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if fecha_inicio > fecha_fin:
+            return Response(
+                {'error': 'fecha_desde no puede ser posterior a fecha_hasta'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return self._responder_quiebres(request, 'quiebres_stock', fecha_inicio, fecha_fin)
+
+    def _reporte_quiebres(self, nombre, fecha_inicio, fecha_fin, con_fecha=False):
+        return obtener_reporte(
+            nombre,
+            {'fecha_inicio': fecha_inicio, 'fecha_fin': fecha_fin},
+            lambda: self._datos_quiebres(fecha_inicio, fecha_fin),
+            dominios=('ventas', 'inventario'),
+            desde=fecha_inicio,
+            hasta=fecha_fin,
+            con_fecha=con_fecha
+        )
+
+    def _responder_quiebres(self, request, nombre, fecha_inicio, fecha_fin):
+        datos = self._reporte_quiebres(nombre, fecha_inicio, fecha_fin)
 
         formato = request.query_params.get('formato', 'json')
+        if formato in FORMATOS_COLUMNARES:
+            return self._exportar_tablas(request, formato, nombre, {'quiebres': datos['quiebres']})
         if formato == 'csv' or formato == 'excel':
-            return self._generar_excel_quiebres(quiebres, fecha_inicio, fecha_fin)
+            return self._generar_excel_quiebres(datos, archivo=nombre)
 
         return Response({
             'fecha_inicio': fecha_inicio.isoformat(),
             'fecha_fin': fecha_fin.isoformat(),
-            'total_quiebres': quiebres.count(),
-            'quiebres': list(quiebres)
+            'total_quiebres': len(datos['quiebres']),
+            'dias_sin_stock': datos['dias_sin_stock'],
+            'ventas_perdidas_estimadas': datos['ventas_perdidas_estimadas'],
+            'quiebres': datos['quiebres']
         })
 
-    def _generar_csv_ventas_diarias(self, ventas, detalles, fecha):
+    def _datos_quiebres(self, fecha_inicio, fecha_fin):
+        """
+        Intervalos de QuiebreStock que se solapan con el rango, agrupados por producto.
+
+        El tiempo sin stock es la parte de cada intervalo dentro del rango (los abiertos
+        cuentan hasta ahora) y las ventas perdidas se estiman con la venta diaria del
+        producto en los días del rango en que sí tuvo stock.
+
+        sin_stock_actualmente es estado actual, no del periodo: solo se incluye en
+        periodos abiertos, porque los cerrados se guardan en caché sin expiración.
+        """
+        from django.db.models import DurationField, ExpressionWrapper, Q
+        from django.db.models.functions import Greatest, Least
+
+        fecha_desde = timezone.make_aware(datetime.combine(fecha_inicio, datetime.min.time()))
+        fecha_hasta = min(fecha_desde + timedelta(days=(fecha_fin - fecha_inicio).days + 1), timezone.now())
+        dias_rango = max((fecha_hasta - fecha_desde).total_seconds() / 86400, 0)
+
+        tiempo_sin_stock = ExpressionWrapper(
+            Greatest(
+                Least(Coalesce('quiebres__fin', Value(fecha_hasta)), Value(fecha_hasta))
+                - Greatest('quiebres__inicio', Value(fecha_desde)),
+                Value(timedelta(0))
+            ),
+            output_field=DurationField()
+        )
+
+        # filter() antes de annotate(): los agregados usan solo los intervalos del rango
+        productos = Producto.objects.filter(
+            Q(quiebres__fin__isnull=True) | Q(quiebres__fin__gt=fecha_desde),
+            quiebres__inicio__lt=fecha_hasta
+        ).annotate(
+            cantidad_quiebres=Count('quiebres'),
+            fecha_primer_quiebre=Min('quiebres__inicio'),
+            tiempo_sin_stock=Sum(tiempo_sin_stock),
+            abiertos=Count('quiebres', filter=Q(quiebres__fin__isnull=True)),
+            cantidad_vendida=_suma_relacionada(
+                DetalleVenta, 'producto', 'venta__fecha', fecha_desde, hasta=fecha_hasta
+            ),
+        ).values(
+            'codigo', 'nombre', 'cantidad_quiebres', 'fecha_primer_quiebre',
+            'tiempo_sin_stock', 'abiertos', 'cantidad_vendida'
+        ).order_by('-tiempo_sin_stock', 'codigo')
+
+        cerrado = fecha_fin < timezone.localdate()
+        quiebres = []
+        for p in productos:
+            dias_sin_stock = min(p['tiempo_sin_stock'].total_seconds() / 86400, dias_rango)
+            dias_con_stock = dias_rango - dias_sin_stock
+            venta_diaria = p['cantidad_vendida'] / dias_con_stock if dias_con_stock >= 1 else 0
+            quiebre = {
+                'producto__codigo': p['codigo'],
+                'producto__nombre': p['nombre'],
+                'cantidad_quiebres': p['cantidad_quiebres'],
+                'fecha_primer_quiebre': p['fecha_primer_quiebre'],
+                'horas_sin_stock': round(dias_sin_stock * 24, 1),
+                'dias_sin_stock': round(dias_sin_stock, 2),
+                'ventas_perdidas_estimadas': round(venta_diaria * dias_sin_stock, 1),
+            }
+            if not cerrado:
+                quiebre['sin_stock_actualmente'] = p['abiertos'] > 0
+            quiebres.append(quiebre)
+
+        return {
+            'fecha_inicio': fecha_inicio,
+            'fecha_fin': fecha_fin,
+            'quiebres': quiebres,
+            'dias_sin_stock': round(sum(q['dias_sin_stock'] for q in quiebres), 2),
+            'ventas_perdidas_estimadas': round(sum(q['ventas_perdidas_estimadas'] for q in quiebres), 1),
+        }
+
+    @action(detail=False, methods=['get'])
+    def mapa_calor_ventas(self, request):
+        """
+        Ventas por día de la semana y hora (grilla 7x24) en un rango de fechas.
+
+        Se calcula desde el resumen VentaHora. Parámetros: fecha_desde y fecha_hasta
+        (YYYY-MM-DD; por defecto las últimas 4 semanas) y formato=json|excel.
+        """
+        try:
+            hoy = timezone.localdate()
+            fecha_hasta_str = request.query_params.get('fecha_hasta', None)
+            fecha_desde_str = request.query_params.get('fecha_desde', None)
+            fecha_hasta = datetime.strptime(fecha_hasta_str, '%Y-%m-%d').date() if fecha_hasta_str else hoy
+            fecha_desde = (
+                datetime.strptime(fecha_desde_str, '%Y-%m-%d').date() if fecha_desde_str
+                else fecha_hasta - timedelta(days=27)
+            )
+        except ValueError:
+            return Response(
+                {'error': 'Formato de fecha inválido. Use YYYY-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if fecha_desde > fecha_hasta:
+            return Response(
+                {'error': 'fecha_desde no puede ser posterior a fecha_hasta'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        datos = obtener_reporte(
+            'mapa_calor_ventas',
+            {'fecha_desde': fecha_desde, 'fecha_hasta': fecha_hasta},
+            lambda: self._datos_mapa_calor(fecha_desde, fecha_hasta),
+            dominios=('ventas',),
+            desde=fecha_desde,
+            hasta=fecha_hasta
+        )
+
+        formato = request.query_params.get('formato', 'json')
+        if formato in FORMATOS_COLUMNARES:
+            return self._exportar_tablas(request, formato, f'mapa_calor_ventas_{fecha_desde}_{fecha_hasta}', {'horas': [
+                {
+                    'dia_semana': dia, 'dia': DIAS_SEMANA[dia], 'hora': hora,
+                    'cantidad_ventas': datos['cantidad_ventas'][dia][hora],
+                    'total_ventas': datos['total_ventas'][dia][hora],
+                }
+                for dia in range(7) for hora in range(24)
+            ]})
+        if formato == 'csv' or formato == 'excel':
+            return self._generar_excel_mapa_calor(datos)
+
+        return Response({
+            'fecha_desde': fecha_desde.isoformat(),
+            'fecha_hasta': fecha_hasta.isoformat(),
+            'dias': DIAS_SEMANA,
+            'horas': list(range(24)),
+            'cantidad_ventas': datos['cantidad_ventas'],
+            'total_ventas': [[float(valor) for valor in fila] for fila in datos['total_ventas']],
+            'total_periodo': float(datos['total_periodo']),
+            'cantidad_periodo': datos['cantidad_periodo'],
+        })
+
+    def _datos_mapa_calor(self, fecha_desde, fecha_hasta):
+        from .models import VentaHora
+
+        cantidad = [[0] * 24 for _ in range(7)]
+        total = [[Decimal('0.00')] * 24 for _ in range(7)]
+
+        celdas = VentaHora.objects.filter(
+            fecha__gte=fecha_desde, fecha__lte=fecha_hasta
+        ).values('dia_semana', 'hora').annotate(
+            cantidad=Sum('cantidad_ventas'),
+            total=Sum('total')
+        ).order_by()
+
+        for celda in celdas:
+            cantidad[celda['dia_semana']][celda['hora']] = celda['cantidad']
+            total[celda['dia_semana']][celda['hora']] = celda['total']
+
+        return {
+            'fecha_desde': fecha_desde,
+            'fecha_hasta': fecha_hasta,
+            'cantidad_ventas': cantidad,
+            'total_ventas': total,
+            'cantidad_periodo': sum(sum(fila) for fila in cantidad),
+            'total_periodo': sum((sum(fila) for fila in total), Decimal('0.00')),
+        }
+
+    @action(detail=False, methods=['get'])
+    def abc_productos(self, request):
+        """
+        Clasificación ABC (Pareto) de los productos activos.
+
+        Ordena por ingresos o margen (criterio=ingresos|margen) en el periodo
+        fecha_desde..fecha_hasta (por defecto los últimos `dias`, 90) y asigna la clase
+        según la participación acumulada: A hasta 80%, B hasta 95%, C el resto.
+        """
+        criterio = request.query_params.get('criterio', 'ingresos')
+        if criterio not in ('ingresos', 'margen'):
+            return Response(
+                {'error': 'El criterio debe ser "ingresos" o "margen"'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            hoy = timezone.localdate()
+            fecha_hasta_str = request.query_params.get('fecha_hasta', None)
+            fecha_desde_str = request.query_params.get('fecha_desde', None)
+            dias = int(request.query_params.get('dias', 90))
+            if not 1 <= dias <= 3650:
+                raise ValueError(dias)
+            fecha_hasta = datetime.strptime(fecha_hasta_str, '%Y-%m-%d').date() if fecha_hasta_str else hoy
+            fecha_desde = (
+                datetime.strptime(fecha_desde_str, '%Y-%m-%d').date() if fecha_desde_str
+                else fecha_hasta - timedelta(days=dias - 1)
+            )
+        except ValueError:
+            return Response(
+                {'error': 'Parámetros inválidos. Use fechas YYYY-MM-DD y días enteros entre 1 y 3650'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if fecha_desde > fecha_hasta:
+            return Response(
+                {'error': 'fecha_desde no puede ser posterior a fecha_hasta'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        datos = obtener_reporte(
+            'abc_productos',
+            {'criterio': criterio, 'fecha_desde': fecha_desde, 'fecha_hasta': fecha_hasta},
+            lambda: self._datos_abc(criterio, fecha_desde, fecha_hasta),
+            dominios=('ventas', 'inventario'),
+            desde=fecha_desde,
+            hasta=fecha_hasta
+        )
+
+        formato = request.query_params.get('formato', 'json')
+        if formato in FORMATOS_COLUMNARES:
+            return self._exportar_tablas(request, formato, f'abc_productos_{criterio}', {'productos': datos['productos']})
+        if formato == 'csv':
+            return self._generar_csv_abc(datos)
+        elif formato == 'excel':
+            return self._generar_excel_abc(datos)
+
+        return Response({
+            'criterio': criterio,
+            'fecha_desde': fecha_desde.isoformat(),
+            'fecha_hasta': fecha_hasta.isoformat(),
+            'total_ingresos': float(datos['total_ingresos']),
+            'total_margen': float(datos['total_margen']),
+            'resumen': datos['resumen'],
+            'productos': [
+                dict(
+                    p,
+                    ingresos=float(p['ingresos']),
+                    margen=float(p['margen']),
+                )
+                for p in datos['productos']
+            ],
+        })
+
+    def _datos_abc(self, criterio, fecha_desde, fecha_hasta):
+        """
+        Una sola consulta: ingresos y margen por producto (subconsultas independientes)
+        y, con funciones de ventana, la suma acumulada y el total del criterio.
+        """
+        from django.db.models import Window
+        from django.db.models.expressions import RowRange
+
+        desde = timezone.make_aware(datetime.combine(fecha_desde, datetime.min.time()))
+        hasta = timezone.make_aware(datetime.combine(fecha_hasta, datetime.max.time()))
+        monto = DecimalField(max_digits=14, decimal_places=2)
+
+        productos = Producto.objects.filter(activo=True).annotate(
+            ingresos=_suma_relacionada(
+                DetalleVenta, 'producto', 'venta__fecha', desde, hasta=hasta,
+                campo_suma=F('cantidad') * F('precio_unitario'), output_field=monto
+            ),
+            margen=_suma_relacionada(
+                DetalleVenta, 'producto', 'venta__fecha', desde, hasta=hasta,
+                campo_suma=F('cantidad') * (F('precio_unitario') - F('costo_unitario')),
+                output_field=monto
+            ),
+        ).annotate(
+            acumulado=Window(
+                Sum(criterio),
+                order_by=[F(criterio).desc(), F('id').asc()],
+                frame=RowRange(start=None, end=0)
+            ),
+            total_criterio=Window(Sum(criterio)),
+            total_ingresos=Window(Sum('ingresos')),
+            total_margen=Window(Sum('margen')),
+        ).order_by(F(criterio).desc(), 'id').values(
+            'id', 'codigo', 'nombre', 'ingresos', 'margen',
+            'acumulado', 'total_criterio', 'total_ingresos', 'total_margen'
+        )
+
+        filas = list(productos)
+        total = filas[0]['total_criterio'] if filas else Decimal('0.00')
+        resumen = {clase: {'productos': 0, 'valor': Decimal('0.00')} for clase in 'ABC'}
+
+        resultado = []
+        for fila in filas:
+            valor = fila[criterio]
+            if total > 0 and valor > 0:
+                participacion = valor / total * 100
+                anterior = (fila['acumulado'] - valor) / total * 100
+                clase = 'A' if anterior < 80 else 'B' if anterior < 95 else 'C'
+            else:
+                participacion = anterior = Decimal('0')
+                clase = 'C'
+
+            resumen[clase]['productos'] += 1
+            resumen[clase]['valor'] += valor
+            resultado.append({
+                'id': fila['id'],
+                'codigo': fila['codigo'],
+                'nombre': fila['nombre'],
+                'ingresos': fila['ingresos'],
+                'margen': fila['margen'],
+                'participacion': round(float(participacion), 2),
+                'participacion_acumulada': round(float(anterior + participacion), 2),
+                'clase': clase,
+            })
+
+        return {
+            'criterio': criterio,
+            'fecha_desde': fecha_desde,
+            'fecha_hasta': fecha_hasta,
+            'total_ingresos': filas[0]['total_ingresos'] if filas else Decimal('0.00'),
+            'total_margen': filas[0]['total_margen'] if filas else Decimal('0.00'),
+            'resumen': {
+                clase: {
+                    'productos': datos['productos'],
+                    'valor': float(datos['valor']),
+                    'participacion': round(float(datos['valor'] / total * 100), 2) if total > 0 else 0,
+                }
+                for clase, datos in resumen.items()
+            },
+            'productos': resultado,
+        }
+
+    def _exportar_tablas(self, request, formato, nombre, tablas):
+        """
+        Exporta a Parquet/Arrow una tabla del reporte: la indicada en el parámetro
+        tabla o, por defecto, la primera.
+        """
+        tabla = request.query_params.get('tabla') or next(iter(tablas))
+        if tabla not in tablas:
+            return Response(
+                {'error': f"tabla debe ser una de: {', '.join(tablas)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        archivo = nombre if len(tablas) == 1 else f'{nombre}_{tabla}'
+        return respuesta_columnar_registros(tablas[tabla], formato, archivo)
+
+    def _generar_csv_ventas_diarias(self, datos):
         """Método legacy - ahora usa Excel"""
-        return self._generar_excel_ventas_diarias(ventas, detalles, fecha)
+        return self._generar_excel_ventas_diarias(datos)
     
-    def _generar_excel_ventas_diarias(self, ventas, detalles, fecha):
+    def _generar_excel_ventas_diarias(self, datos):
         """Generar Excel de ventas diarias con diseño profesional"""
+        fecha = datos['fecha']
+        detalles = datos['detalle_productos']
         if not OPENPYXL_AVAILABLE:
             response = HttpResponse(content_type='text/csv; charset=utf-8')
             response['Content-Disposition'] = f'attachment; filename="ventas_diarias_{fecha}.csv"'
             writer = csv.writer(response)
             writer.writerow(['Reporte de Ventas Diarias'])
             writer.writerow(['Fecha', fecha.isoformat()])
-            writer.writerow(['Total Ventas', f"${ventas.aggregate(total=Sum('total'))['total'] or Decimal('0.00'):,.0f}"])
-            writer.writerow(['Cantidad de Ventas', ventas.count()])
+            writer.writerow(['Total Ventas', f"${datos['total_ventas']:,.0f}"])
+            writer.writerow(['Cantidad de Ventas', datos['cantidad_ventas']])
             writer.writerow([])
             writer.writerow(['Código Producto', 'Nombre Producto', 'Cantidad Vendida', 'Total Vendido', 'Margen Ganancia'])
             for detalle in detalles:
@@ -471,12 +1259,12 @@ class ReportesViewSet(viewsets.ViewSet):
         ws = wb.active
         ws.title = "Ventas Diarias"
         
-        total_ventas = ventas.aggregate(total=Sum('total'))['total'] or Decimal('0.00')
-        cantidad_ventas = ventas.count()
+        total_ventas = datos['total_ventas']
+        cantidad_ventas = datos['cantidad_ventas']
         
         estilos = self._obtener_estilos_excel('1976D2')
         if not estilos:
-            return self._generar_csv_ventas_diarias(ventas, detalles, fecha)
+            return self._generar_csv_ventas_diarias(datos)
         
         row_start = self._aplicar_titulo_excel(
             ws, 
@@ -538,12 +1326,16 @@ class ReportesViewSet(viewsets.ViewSet):
         wb.save(response)
         return response
 
-    def _generar_csv_ventas_semanales(self, ventas, ventas_por_dia, fecha_inicio, fecha_fin):
+    def _generar_csv_ventas_semanales(self, datos):
+        fecha_inicio = datos['fecha_inicio']
+        fecha_fin = datos['fecha_fin']
+        ventas_por_dia = datos['ventas_por_dia']
+
         response = HttpResponse(content_type='text/csv; charset=utf-8')
         response['Content-Disposition'] = f'attachment; filename="ventas_semanales_{fecha_inicio}.csv"'
         
-        total_semana = ventas.aggregate(total=Sum('total'))['total'] or Decimal('0.00')
-        cantidad_semana = ventas.count()
+        total_semana = datos['total_ventas']
+        cantidad_semana = datos['cantidad_ventas']
         
         writer = csv.writer(response)
         writer.writerow(['Reporte de Ventas Semanales'])
@@ -562,12 +1354,15 @@ class ReportesViewSet(viewsets.ViewSet):
         
         return response
 
-    def _generar_csv_ventas_mensuales(self, ventas, top_productos, año, mes):
+    def _generar_csv_ventas_mensuales(self, datos):
+        año, mes = datos['año'], datos['mes']
+        top_productos = datos['top_productos']
+
         response = HttpResponse(content_type='text/csv; charset=utf-8')
         response['Content-Disposition'] = f'attachment; filename="ventas_mensuales_{año}_{mes:02d}.csv"'
         
-        total_mes = ventas.aggregate(total=Sum('total'))['total'] or Decimal('0.00')
-        cantidad_mes = ventas.count()
+        total_mes = datos['total_ventas']
+        cantidad_mes = datos['cantidad_ventas']
         
         writer = csv.writer(response)
         writer.writerow(['Reporte de Ventas Mensuales'])
@@ -587,7 +1382,40 @@ class ReportesViewSet(viewsets.ViewSet):
         
         return response
 
-    def _generar_csv_margen_productos(self, productos):
+    def _generar_csv_serie_ventas(self, datos):
+        desde, hasta = datos['desde'], datos['hasta']
+        totales = datos['totales']
+
+        response = HttpResponse(content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="serie_ventas_{desde}_{hasta}.csv"'
+
+        writer = csv.writer(response)
+        writer.writerow(['Serie de Ventas'])
+        writer.writerow(['Período', f'{desde} a {hasta}'])
+        writer.writerow(['Granularidad', datos['granularidad']])
+        if datos['agrupar']:
+            writer.writerow(['Agrupado por', datos['agrupar']])
+        writer.writerow([])
+
+        # Una fila por período; con agrupación, una columna de total por serie
+        writer.writerow(
+            ['Período', 'Cantidad Ventas', 'Total Ventas', 'Unidades', 'Margen']
+            + [str(serie['nombre']) for serie in datos['series']]
+        )
+        for i, periodo in enumerate(datos['periodos']):
+            writer.writerow([
+                periodo.isoformat(),
+                totales['cantidad_ventas'][i],
+                f"${float(totales['total'][i]):,.0f}",
+                totales['unidades'][i],
+                f"${float(totales['margen'][i]):,.0f}",
+            ] + [f"${float(serie['total'][i]):,.0f}" for serie in datos['series']])
+
+        return response
+
+    def _generar_csv_margen_productos(self, datos):
+        productos = datos['productos']
+
         response = HttpResponse(content_type='text/csv; charset=utf-8')
         response['Content-Disposition'] = 'attachment; filename="margen_productos.csv"'
         
@@ -596,57 +1424,85 @@ class ReportesViewSet(viewsets.ViewSet):
         
         for p in productos:
             writer.writerow([
-                p.codigo,
-                p.nombre,
-                p.costo,
-                p.precio_venta,
-                float(p.margen_calculado),
-                float(p.ganancia_unitaria),
-                p.stock_actual
+                p['codigo'],
+                p['nombre'],
+                p['costo'],
+                p['precio_venta'],
+                float(p['margen_calculado']),
+                float(p['ganancia_unitaria']),
+                p['stock_actual']
             ])
         
         return response
 
-    def _generar_csv_rotacion(self, productos):
+    def _generar_csv_rotacion(self, datos):
         response = HttpResponse(content_type='text/csv; charset=utf-8')
         response['Content-Disposition'] = 'attachment; filename="rotacion_inventario.csv"'
         
         writer = csv.writer(response)
         writer.writerow(['Código', 'Nombre', 'Stock Actual', 'Vendido 30 días', 'Rotación'])
         
-        for p in productos:
-            if p.stock_actual > 0:
-                rotacion = (p.cantidad_vendida or 0) / p.stock_actual
-                writer.writerow([
-                    p.codigo,
-                    p.nombre,
-                    p.stock_actual,
-                    p.cantidad_vendida or 0,
-                    rotacion
-                ])
+        for p in datos['productos']:
+            writer.writerow([
+                p['codigo'],
+                p['nombre'],
+                p['stock_actual'],
+                p['cantidad_vendida_30dias'],
+                p['rotacion']
+            ])
         
         return response
 
-    def _generar_csv_quiebres(self, quiebres, fecha_inicio, fecha_fin):
+    def _generar_csv_pronostico(self, datos):
+        response = HttpResponse(content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="pronostico_demanda_{datos["fecha"]}.csv"'
+
+        writer = csv.writer(response)
+        writer.writerow([
+            'Código', 'Nombre', 'Stock Actual', 'Venta Diaria Estimada',
+            f'Demanda {datos["parametros"]["horizonte"]} días', 'Días de Cobertura', 'Fecha de Quiebre'
+        ])
+
+        for p in datos['productos']:
+            writer.writerow([
+                p['codigo'],
+                p['nombre'],
+                p['stock_actual'],
+                p['venta_diaria_estimada'],
+                p['demanda_horizonte'],
+                p['dias_cobertura'] if p['dias_cobertura'] is not None else '',
+                p['fecha_quiebre'] or ''
+            ])
+
+        return response
+
+    def _generar_csv_quiebres(self, datos):
         """Método legacy - ahora usa Excel"""
-        return self._generar_excel_quiebres(quiebres, fecha_inicio, fecha_fin)
+        return self._generar_excel_quiebres(datos)
     
-    def _generar_excel_quiebres(self, quiebres, fecha_inicio, fecha_fin):
+    def _generar_excel_quiebres(self, datos, archivo='quiebres_semana'):
         """Generar Excel de quiebres de stock con diseño profesional"""
+        fecha_inicio = datos['fecha_inicio']
+        fecha_fin = datos['fecha_fin']
+        quiebres = datos['quiebres']
         if not OPENPYXL_AVAILABLE:
             response = HttpResponse(content_type='text/csv; charset=utf-8')
-            response['Content-Disposition'] = f'attachment; filename="quiebres_semana_{fecha_inicio}.csv"'
+            response['Content-Disposition'] = f'attachment; filename="{archivo}_{fecha_inicio}.csv"'
             writer = csv.writer(response)
             writer.writerow(['Reporte de Quiebres de Stock', f'{fecha_inicio} a {fecha_fin}'])
             writer.writerow([])
-            writer.writerow(['Código', 'Nombre Producto', 'Cantidad de Quiebres', 'Fecha Primer Quiebre', 'Stock Mínimo Alcanzado'])
+            writer.writerow([
+                'Código', 'Nombre Producto', 'Cantidad de Quiebres', 'Fecha Primer Quiebre',
+                'Horas sin Stock', 'Ventas Perdidas Est.'
+            ])
             for quiebre in quiebres:
                 writer.writerow([
                     quiebre.get('producto__codigo', ''),
                     quiebre.get('producto__nombre', ''),
                     quiebre.get('cantidad_quiebres', 0),
                     quiebre.get('fecha_primer_quiebre', ''),
-                    quiebre.get('stock_minimo_alcanzado', 0)
+                    quiebre.get('horas_sin_stock', 0),
+                    quiebre.get('ventas_perdidas_estimadas', 0)
                 ])
             return response
         
@@ -656,17 +1512,20 @@ class ReportesViewSet(viewsets.ViewSet):
         
         estilos = self._obtener_estilos_excel('1976D2')
         if not estilos:
-            return self._generar_csv_quiebres(quiebres, fecha_inicio, fecha_fin)
+            return self._generar_csv_quiebres(datos)
         
         row_start = self._aplicar_titulo_excel(
             ws, 
             f'REPORTE DE QUIEBRES DE STOCK',
-            f'Período: {fecha_inicio} a {fecha_fin} | Generado el: {timezone.now().strftime("%d/%m/%Y %H:%M:%S")} | Total de quiebres: {quiebres.count()}',
-            5,
+            f'Período: {fecha_inicio} a {fecha_fin} | Generado el: {timezone.now().strftime("%d/%m/%Y %H:%M:%S")} | Total de quiebres: {len(quiebres)}',
+            6,
             estilos
         )
         
-        headers = ['Código', 'Nombre Producto', 'Cantidad de Quiebres', 'Fecha Primer Quiebre', 'Stock Mínimo Alcanzado']
+        headers = [
+            'Código', 'Nombre Producto', 'Cantidad de Quiebres', 'Fecha Primer Quiebre',
+            'Horas sin Stock', 'Ventas Perdidas Est.'
+        ]
         self._aplicar_headers_excel(ws, headers, row_start, estilos)
         
         for idx, quiebre in enumerate(quiebres, row_start + 1):
@@ -706,37 +1565,46 @@ class ReportesViewSet(viewsets.ViewSet):
             cell.font = estilos['data_font']
             cell.alignment = estilos['center_align']
             
-            # Stock Mínimo Alcanzado
-            stock_min = quiebre.get('stock_minimo_alcanzado', 0)
-            cell = ws.cell(row=idx, column=5, value=stock_min)
+            # Horas sin Stock (en rojo si el producto sigue sin stock)
+            cell = ws.cell(row=idx, column=5, value=quiebre.get('horas_sin_stock', 0))
             cell.border = estilos['border_style']
             cell.font = Font(size=10, bold=True)
             cell.alignment = estilos['right_align']
-            if stock_min <= 0:
+            if quiebre.get('sin_stock_actualmente'):
                 cell.fill = PatternFill(start_color="FFCDD2", end_color="FFCDD2", fill_type="solid")
             else:
                 cell.fill = PatternFill(start_color="FFF9C4", end_color="FFF9C4", fill_type="solid")
             
+            # Ventas Perdidas Estimadas
+            cell = ws.cell(row=idx, column=6, value=quiebre.get('ventas_perdidas_estimadas', 0))
+            cell.border = estilos['border_style']
+            cell.font = estilos['number_font']
+            cell.alignment = estilos['right_align']
+            
             ws.row_dimensions[idx].height = 18
         
-        column_widths = [15, 35, 20, 20, 20]
+        column_widths = [15, 35, 20, 20, 18, 20]
         for col_num, width in enumerate(column_widths, 1):
             ws.column_dimensions[get_column_letter(col_num)].width = width
         
         response = HttpResponse(
             content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
         )
-        filename = f'quiebres_semana_{fecha_inicio.strftime("%Y%m%d")}.xlsx'
+        filename = f'{archivo}_{fecha_inicio.strftime("%Y%m%d")}.xlsx'
         response['Content-Disposition'] = f'attachment; filename="{filename}"'
         wb.save(response)
         return response
 
-    def _generar_csv_compras_mensuales(self, compras, top_productos, compras_por_proveedor, año, mes):
+    def _generar_csv_compras_mensuales(self, datos):
+        año, mes = datos['año'], datos['mes']
+        top_productos = datos['top_productos']
+        compras_por_proveedor = datos['compras_por_proveedor']
+
         response = HttpResponse(content_type='text/csv; charset=utf-8')
         response['Content-Disposition'] = f'attachment; filename="compras_mensuales_{año}_{mes:02d}.csv"'
         
-        total_mes = compras.aggregate(total=Sum('total'))['total'] or Decimal('0.00')
-        cantidad_mes = compras.count()
+        total_mes = datos['total_compras']
+        cantidad_mes = datos['cantidad_compras']
         
         writer = csv.writer(response)
         writer.writerow(['Reporte de Compras Mensuales'])
@@ -768,7 +1636,9 @@ class ReportesViewSet(viewsets.ViewSet):
         
         return response
 
-    def _generar_csv_proveedores(self, proveedores):
+    def _generar_csv_proveedores(self, datos):
+        proveedores = datos['proveedores']
+
         response = HttpResponse(content_type='text/csv; charset=utf-8')
         response['Content-Disposition'] = 'attachment; filename="reporte_proveedores.csv"'
         
@@ -780,19 +1650,19 @@ class ReportesViewSet(viewsets.ViewSet):
         
         for p in proveedores:
             writer.writerow([
-                p.nombre,
-                p.rut or '',
-                p.contacto or '',
-                p.telefono or '',
-                p.email or '',
-                p.cantidad_productos or 0,
-                f"${float(p.total_compras or 0):,.0f}",
-                p.cantidad_compras or 0
+                p['nombre'],
+                p['rut'],
+                p['contacto'],
+                p['telefono'],
+                p['email'],
+                p['cantidad_productos'],
+                f"${float(p['total_compras_30dias']):,.0f}",
+                p['cantidad_compras_30dias']
             ])
         
         return response
 
-    def _generar_csv_productos(self, productos, productos_bajo_stock, productos_mas_vendidos):
+    def _generar_csv_productos(self, datos):
         response = HttpResponse(content_type='text/csv; charset=utf-8')
         response['Content-Disposition'] = 'attachment; filename="reporte_productos.csv"'
         
@@ -803,7 +1673,7 @@ class ReportesViewSet(viewsets.ViewSet):
         writer.writerow(['Productos con Stock Bajo'])
         writer.writerow(['Código', 'Nombre', 'Stock Actual', 'Stock Mínimo', 'Categoría'])
         
-        for producto in productos_bajo_stock:
+        for producto in datos['productos_bajo_stock']:
             writer.writerow([
                 producto.get('codigo', ''),
                 producto.get('nombre', ''),
@@ -816,13 +1686,7 @@ class ReportesViewSet(viewsets.ViewSet):
         writer.writerow(['Productos Más Vendidos (30 días)'])
         writer.writerow(['Código', 'Nombre', 'Cantidad Vendida', 'Precio Venta'])
         
-        # Convertir QuerySet a lista de diccionarios si es necesario
-        if hasattr(productos_mas_vendidos, 'values'):
-            productos_mas_vendidos_list = list(productos_mas_vendidos.values(
-                'codigo', 'nombre', 'cantidad_vendida_30dias', 'precio_venta'
-            ))
-        else:
-            productos_mas_vendidos_list = productos_mas_vendidos
+        productos_mas_vendidos_list = datos['productos_mas_vendidos']
         
         for producto in productos_mas_vendidos_list:
             writer.writerow([
@@ -834,6 +1698,182 @@ class ReportesViewSet(viewsets.ViewSet):
         
         return response
 
+    def _generar_csv_mapa_calor(self, datos):
+        response = HttpResponse(content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="mapa_calor_ventas_{datos["fecha_desde"]}.csv"'
+
+        writer = csv.writer(response)
+        writer.writerow(['Mapa de Calor de Ventas', f'{datos["fecha_desde"]} a {datos["fecha_hasta"]}'])
+        writer.writerow([])
+        writer.writerow(['Cantidad de Ventas'])
+        writer.writerow(['Día'] + [f'{hora:02d}h' for hora in range(24)])
+        for dia, fila in zip(DIAS_SEMANA, datos['cantidad_ventas']):
+            writer.writerow([dia] + fila)
+        writer.writerow([])
+        writer.writerow(['Total Vendido'])
+        writer.writerow(['Día'] + [f'{hora:02d}h' for hora in range(24)])
+        for dia, fila in zip(DIAS_SEMANA, datos['total_ventas']):
+            writer.writerow([dia] + [f"{float(valor):.0f}" for valor in fila])
+
+        return response
+
+    def _generar_excel_mapa_calor(self, datos):
+        """Generar Excel del mapa de calor con una hoja por métrica y escala de color"""
+        if not OPENPYXL_AVAILABLE:
+            return self._generar_csv_mapa_calor(datos)
+
+        from openpyxl.formatting.rule import ColorScaleRule
+
+        estilos = self._obtener_estilos_excel('1976D2')
+        if not estilos:
+            return self._generar_csv_mapa_calor(datos)
+
+        wb = Workbook()
+        hojas = [
+            ('Cantidad Ventas', 'CANTIDAD DE VENTAS POR DÍA Y HORA', datos['cantidad_ventas'], False),
+            ('Total Vendido', 'TOTAL VENDIDO POR DÍA Y HORA', datos['total_ventas'], True),
+        ]
+
+        for numero, (titulo_hoja, titulo, grilla, es_monto) in enumerate(hojas):
+            ws = wb.active if numero == 0 else wb.create_sheet()
+            ws.title = titulo_hoja
+
+            row_start = self._aplicar_titulo_excel(
+                ws,
+                titulo,
+                f'Período: {datos["fecha_desde"].strftime("%d/%m/%Y")} a {datos["fecha_hasta"].strftime("%d/%m/%Y")} | '
+                f'Generado el: {timezone.now().strftime("%d/%m/%Y %H:%M:%S")} | '
+                f'Ventas: {datos["cantidad_periodo"]} | Total: ${float(datos["total_periodo"]):,.0f}',
+                25,
+                estilos
+            )
+
+            headers = ['Día'] + [f'{hora:02d}h' for hora in range(24)]
+            self._aplicar_headers_excel(ws, headers, row_start, estilos)
+
+            for idx, (dia, fila) in enumerate(zip(DIAS_SEMANA, grilla), row_start + 1):
+                cell = ws.cell(row=idx, column=1, value=dia)
+                cell.border = estilos['border_style']
+                cell.font = Font(size=10, bold=True)
+                cell.alignment = estilos['left_align']
+
+                for hora, valor in enumerate(fila, 2):
+                    cell = ws.cell(row=idx, column=hora, value=float(valor) if es_monto else valor)
+                    cell.border = estilos['border_style']
+                    cell.font = estilos['number_font']
+                    cell.alignment = estilos['center_align']
+                    if es_monto:
+                        cell.number_format = '"$"#,##0'
+
+                ws.row_dimensions[idx].height = 18
+
+            # Escala de color blanco -> verde sobre la grilla
+            rango = f'B{row_start + 1}:{get_column_letter(25)}{row_start + 7}'
+            ws.conditional_formatting.add(
+                rango,
+                ColorScaleRule(start_type='min', start_color='FFFFFF', end_type='max', end_color='2E7D32')
+            )
+
+            ws.column_dimensions['A'].width = 12
+            for col_num in range(2, 26):
+                ws.column_dimensions[get_column_letter(col_num)].width = 10 if es_monto else 6
+
+        response = HttpResponse(
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        )
+        filename = f'mapa_calor_ventas_{datos["fecha_desde"].strftime("%Y%m%d")}_{datos["fecha_hasta"].strftime("%Y%m%d")}.xlsx'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        wb.save(response)
+        return response
+
+    def _generar_csv_abc(self, datos):
+        response = HttpResponse(content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="abc_productos_{datos["criterio"]}_{datos["fecha_hasta"]}.csv"'
+
+        writer = csv.writer(response)
+        writer.writerow(['Clasificación ABC de Productos'])
+        writer.writerow(['Período', f'{datos["fecha_desde"]} a {datos["fecha_hasta"]}'])
+        writer.writerow(['Criterio', datos['criterio']])
+        writer.writerow([])
+        writer.writerow(['Clase', 'Productos', 'Participación %'])
+        for clase, resumen in datos['resumen'].items():
+            writer.writerow([clase, resumen['productos'], resumen['participacion']])
+        writer.writerow([])
+        writer.writerow(['Código', 'Nombre', 'Ingresos', 'Margen', 'Participación %', 'Acumulado %', 'Clase'])
+
+        for p in datos['productos']:
+            writer.writerow([
+                p['codigo'],
+                p['nombre'],
+                f"${float(p['ingresos']):,.0f}",
+                f"${float(p['margen']):,.0f}",
+                p['participacion'],
+                p['participacion_acumulada'],
+                p['clase']
+            ])
+
+        return response
+
+    def _generar_excel_abc(self, datos):
+        """Generar Excel de la clasificación ABC con diseño profesional"""
+        if not OPENPYXL_AVAILABLE:
+            return self._generar_csv_abc(datos)
+
+        estilos = self._obtener_estilos_excel('1976D2')
+        if not estilos:
+            return self._generar_csv_abc(datos)
+
+        wb = Workbook()
+        ws = wb.active
+        ws.title = "Clasificación ABC"
+
+        resumen = ' | '.join(
+            f'{clase}: {r["productos"]} productos ({r["participacion"]}%)'
+            for clase, r in datos['resumen'].items()
+        )
+        row_start = self._aplicar_titulo_excel(
+            ws,
+            f'CLASIFICACIÓN ABC DE PRODUCTOS POR {datos["criterio"].upper()}',
+            f'Período: {datos["fecha_desde"].strftime("%d/%m/%Y")} a {datos["fecha_hasta"].strftime("%d/%m/%Y")} | {resumen}',
+            7,
+            estilos
+        )
+
+        headers = ['Código', 'Nombre', 'Ingresos', 'Margen', 'Participación %', 'Acumulado %', 'Clase']
+        self._aplicar_headers_excel(ws, headers, row_start, estilos)
+
+        colores = {'A': 'C8E6C9', 'B': 'FFF9C4', 'C': 'FFCDD2'}
+        for idx, p in enumerate(datos['productos'], row_start + 1):
+            valores = [
+                (p['codigo'], estilos['data_font'], estilos['left_align']),
+                (p['nombre'], estilos['data_font'], estilos['left_align']),
+                (f"${float(p['ingresos']):,.0f}", Font(size=10, bold=True), estilos['right_align']),
+                (f"${float(p['margen']):,.0f}", Font(size=10, bold=True), estilos['right_align']),
+                (f"{p['participacion']:.2f}%", estilos['number_font'], estilos['right_align']),
+                (f"{p['participacion_acumulada']:.2f}%", estilos['number_font'], estilos['right_align']),
+                (p['clase'], Font(size=10, bold=True), estilos['center_align']),
+            ]
+            for col_num, (valor, fuente, alineacion) in enumerate(valores, 1):
+                cell = ws.cell(row=idx, column=col_num, value=valor)
+                cell.border = estilos['border_style']
+                cell.font = fuente
+                cell.alignment = alineacion
+
+            cell.fill = PatternFill(start_color=colores[p['clase']], end_color=colores[p['clase']], fill_type="solid")
+            ws.row_dimensions[idx].height = 18
+
+        column_widths = [15, 35, 18, 18, 16, 16, 10]
+        for col_num, width in enumerate(column_widths, 1):
+            ws.column_dimensions[get_column_letter(col_num)].width = width
+
+        response = HttpResponse(
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        )
+        filename = f'abc_productos_{datos["criterio"]}_{datos["fecha_hasta"].strftime("%Y%m%d")}.xlsx'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        wb.save(response)
+        return response
+
     # ========== MÉTODOS PARA GENERAR EXCEL CON DISEÑO PROFESIONAL ==========
     
     def _obtener_estilos_excel(self, color_tema='1976D2'):
@@ -912,24 +1952,27 @@ class ReportesViewSet(viewsets.ViewSet):
             cell.border = estilos['border_style']
         ws.row_dimensions[row_num].height = 20
     
-    def _generar_excel_ventas_mensuales(self, ventas, top_productos, año, mes):
+    def _generar_excel_ventas_mensuales(self, datos):
         """Generar Excel de ventas mensuales con diseño profesional"""
+        año, mes = datos['año'], datos['mes']
+        top_productos = datos['top_productos']
+
         if not OPENPYXL_AVAILABLE:
-            return self._generar_csv_ventas_mensuales(ventas, top_productos, año, mes)
+            return self._generar_csv_ventas_mensuales(datos)
         
         wb = Workbook()
         ws = wb.active
         ws.title = "Ventas Mensuales"
         
-        total_mes = ventas.aggregate(total=Sum('total'))['total'] or Decimal('0.00')
-        cantidad_mes = ventas.count()
+        total_mes = datos['total_ventas']
+        cantidad_mes = datos['cantidad_ventas']
         meses_nombres = ['', 'Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 
                         'Julio', 'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
         
         # Obtener estilos estándar
         estilos = self._obtener_estilos_excel('1976D2')
         if not estilos:
-            return self._generar_csv_ventas_mensuales(ventas, top_productos, año, mes)
+            return self._generar_csv_ventas_mensuales(datos)
         
         # Título y resumen
         row_start = self._aplicar_titulo_excel(
@@ -993,24 +2036,28 @@ class ReportesViewSet(viewsets.ViewSet):
         wb.save(response)
         return response
     
-    def _generar_excel_compras_mensuales(self, compras, top_productos, compras_por_proveedor, año, mes):
+    def _generar_excel_compras_mensuales(self, datos):
         """Generar Excel de compras mensuales con diseño profesional"""
+        año, mes = datos['año'], datos['mes']
+        top_productos = datos['top_productos']
+        compras_por_proveedor = datos['compras_por_proveedor']
+
         if not OPENPYXL_AVAILABLE:
-            return self._generar_csv_compras_mensuales(compras, top_productos, compras_por_proveedor, año, mes)
+            return self._generar_csv_compras_mensuales(datos)
         
         wb = Workbook()
         ws = wb.active
         ws.title = "Compras Mensuales"
         
-        total_mes = compras.aggregate(total=Sum('total'))['total'] or Decimal('0.00')
-        cantidad_mes = compras.count()
+        total_mes = datos['total_compras']
+        cantidad_mes = datos['cantidad_compras']
         meses_nombres = ['', 'Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 
                         'Julio', 'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
         
         # Obtener estilos estándar
         estilos = self._obtener_estilos_excel('1976D2')
         if not estilos:
-            return self._generar_csv_compras_mensuales(compras, top_productos, compras_por_proveedor, año, mes)
+            return self._generar_csv_compras_mensuales(datos)
         
         # Título y resumen
         row_start = self._aplicar_titulo_excel(
@@ -1134,10 +2181,12 @@ class ReportesViewSet(viewsets.ViewSet):
         wb.save(response)
         return response
     
-    def _generar_excel_proveedores(self, proveedores):
+    def _generar_excel_proveedores(self, datos):
         """Generar Excel de proveedores con diseño profesional"""
+        proveedores = datos['proveedores']
+
         if not OPENPYXL_AVAILABLE:
-            return self._generar_csv_proveedores(proveedores)
+            return self._generar_csv_proveedores(datos)
         
         wb = Workbook()
         ws = wb.active
@@ -1146,13 +2195,13 @@ class ReportesViewSet(viewsets.ViewSet):
         # Obtener estilos estándar
         estilos = self._obtener_estilos_excel('1976D2')
         if not estilos:
-            return self._generar_csv_proveedores(proveedores)
+            return self._generar_csv_proveedores(datos)
         
         # Título y resumen
         row_start = self._aplicar_titulo_excel(
             ws, 
             'REPORTE DE PROVEEDORES',
-            f'Generado el: {timezone.now().strftime("%d/%m/%Y %H:%M:%S")} | Total de proveedores activos: {proveedores.count()}',
+            f'Generado el: {timezone.now().strftime("%d/%m/%Y %H:%M:%S")} | Total de proveedores activos: {len(proveedores)}',
             8,
             estilos
         )
@@ -1164,50 +2213,50 @@ class ReportesViewSet(viewsets.ViewSet):
         # Datos
         for idx, p in enumerate(proveedores, row_start + 1):
             # Nombre
-            cell = ws.cell(row=idx, column=1, value=p.nombre)
+            cell = ws.cell(row=idx, column=1, value=p['nombre'])
             cell.border = estilos['border_style']
             cell.font = estilos['data_font']
             cell.alignment = estilos['left_align']
             
             # RUT
-            cell = ws.cell(row=idx, column=2, value=p.rut or '')
+            cell = ws.cell(row=idx, column=2, value=p['rut'])
             cell.border = estilos['border_style']
             cell.font = estilos['data_font']
             cell.alignment = estilos['left_align']
             
             # Contacto
-            cell = ws.cell(row=idx, column=3, value=p.contacto or '')
+            cell = ws.cell(row=idx, column=3, value=p['contacto'])
             cell.border = estilos['border_style']
             cell.font = estilos['data_font']
             cell.alignment = estilos['left_align']
             
             # Teléfono
-            cell = ws.cell(row=idx, column=4, value=p.telefono or '')
+            cell = ws.cell(row=idx, column=4, value=p['telefono'])
             cell.border = estilos['border_style']
             cell.font = estilos['data_font']
             cell.alignment = estilos['left_align']
             
             # Email
-            cell = ws.cell(row=idx, column=5, value=p.email or '')
+            cell = ws.cell(row=idx, column=5, value=p['email'])
             cell.border = estilos['border_style']
             cell.font = estilos['data_font']
             cell.alignment = estilos['left_align']
             
             # Cant. Productos
-            cell = ws.cell(row=idx, column=6, value=p.cantidad_productos or 0)
+            cell = ws.cell(row=idx, column=6, value=p['cantidad_productos'])
             cell.border = estilos['border_style']
             cell.font = estilos['number_font']
             cell.alignment = estilos['center_align']
             
             # Total Compras
-            total = float(p.total_compras or 0)
+            total = float(p['total_compras_30dias'])
             cell = ws.cell(row=idx, column=7, value=f"${total:,.0f}")
             cell.border = estilos['border_style']
             cell.font = Font(size=10, bold=True)
             cell.alignment = estilos['right_align']
             
             # Cant. Compras
-            cell = ws.cell(row=idx, column=8, value=p.cantidad_compras or 0)
+            cell = ws.cell(row=idx, column=8, value=p['cantidad_compras_30dias'])
             cell.border = estilos['border_style']
             cell.font = estilos['number_font']
             cell.alignment = estilos['center_align']
@@ -1228,29 +2277,23 @@ class ReportesViewSet(viewsets.ViewSet):
         wb.save(response)
         return response
     
-    def _generar_excel_productos(self, productos, productos_bajo_stock, productos_mas_vendidos):
+    def _generar_excel_productos(self, datos):
         """Generar Excel de productos con diseño profesional"""
         if not OPENPYXL_AVAILABLE:
-            return self._generar_csv_productos(productos, productos_bajo_stock, productos_mas_vendidos)
+            return self._generar_csv_productos(datos)
         
         wb = Workbook()
         
         # Obtener estilos estándar
         estilos = self._obtener_estilos_excel('1976D2')
         if not estilos:
-            return self._generar_csv_productos(productos, productos_bajo_stock, productos_mas_vendidos)
+            return self._generar_csv_productos(datos)
         
         # Hoja 1: Productos con Stock Bajo
         ws1 = wb.active
         ws1.title = "Stock Bajo"
         
-        # Convertir QuerySet a lista de diccionarios si es necesario
-        if hasattr(productos_bajo_stock, 'values'):
-            productos_bajo_stock_list = list(productos_bajo_stock.values(
-                'codigo', 'nombre', 'stock_actual', 'stock_minimo', 'categoria__nombre'
-            ))
-        else:
-            productos_bajo_stock_list = productos_bajo_stock
+        productos_bajo_stock_list = datos['productos_bajo_stock']
         
         row_start = self._aplicar_titulo_excel(
             ws1, 
@@ -1308,13 +2351,7 @@ class ReportesViewSet(viewsets.ViewSet):
         # Hoja 2: Productos Más Vendidos
         ws2 = wb.create_sheet(title="Más Vendidos")
         
-        # Convertir QuerySet a lista de diccionarios si es necesario
-        if hasattr(productos_mas_vendidos, 'values'):
-            productos_mas_vendidos_list = list(productos_mas_vendidos.values(
-                'codigo', 'nombre', 'cantidad_vendida_30dias', 'precio_venta'
-            ))
-        else:
-            productos_mas_vendidos_list = productos_mas_vendidos
+        productos_mas_vendidos_list = datos['productos_mas_vendidos']
         
         row_start2 = self._aplicar_titulo_excel(
             ws2, 
@@ -1374,10 +2411,12 @@ class ReportesViewSet(viewsets.ViewSet):
         wb.save(response)
         return response
     
-    def _generar_excel_margen_productos(self, productos):
+    def _generar_excel_margen_productos(self, datos):
         """Generar Excel de margen de productos con diseño profesional"""
+        productos = datos['productos']
+
         if not OPENPYXL_AVAILABLE:
-            return self._generar_csv_margen_productos(productos)
+            return self._generar_csv_margen_productos(datos)
         
         wb = Workbook()
         ws = wb.active
@@ -1386,12 +2425,12 @@ class ReportesViewSet(viewsets.ViewSet):
         # Obtener estilos estándar
         estilos = self._obtener_estilos_excel('1976D2')
         if not estilos:
-            return self._generar_csv_margen_productos(productos)
+            return self._generar_csv_margen_productos(datos)
         
         row_start = self._aplicar_titulo_excel(
             ws, 
             'REPORTE DE MARGEN DE GANANCIA POR PRODUCTO',
-            f'Generado el: {timezone.now().strftime("%d/%m/%Y %H:%M:%S")} | Total de productos: {productos.count()}',
+            f'Generado el: {timezone.now().strftime("%d/%m/%Y %H:%M:%S")} | Total de productos: {len(productos)}',
             7,
             estilos
         )
@@ -1401,31 +2440,31 @@ class ReportesViewSet(viewsets.ViewSet):
         
         for idx, p in enumerate(productos, row_start + 1):
             # Código
-            cell = ws.cell(row=idx, column=1, value=p.codigo)
+            cell = ws.cell(row=idx, column=1, value=p['codigo'])
             cell.border = estilos['border_style']
             cell.font = estilos['data_font']
             cell.alignment = estilos['left_align']
             
             # Nombre
-            cell = ws.cell(row=idx, column=2, value=p.nombre)
+            cell = ws.cell(row=idx, column=2, value=p['nombre'])
             cell.border = estilos['border_style']
             cell.font = estilos['data_font']
             cell.alignment = estilos['left_align']
             
             # Costo
-            cell = ws.cell(row=idx, column=3, value=f"${float(p.costo):,.0f}")
+            cell = ws.cell(row=idx, column=3, value=f"${float(p['costo']):,.0f}")
             cell.border = estilos['border_style']
             cell.font = Font(size=10, bold=True)
             cell.alignment = estilos['right_align']
             
             # Precio Venta
-            cell = ws.cell(row=idx, column=4, value=f"${float(p.precio_venta):,.0f}")
+            cell = ws.cell(row=idx, column=4, value=f"${float(p['precio_venta']):,.0f}")
             cell.border = estilos['border_style']
             cell.font = Font(size=10, bold=True)
             cell.alignment = estilos['right_align']
             
             # Margen % con color
-            margen = float(p.margen_calculado)
+            margen = float(p['margen_calculado'])
             cell = ws.cell(row=idx, column=5, value=f"{margen:.2f}%")
             cell.border = estilos['border_style']
             cell.font = Font(size=10, bold=True)
@@ -1441,13 +2480,13 @@ class ReportesViewSet(viewsets.ViewSet):
                 cell.fill = PatternFill(start_color="FFCDD2", end_color="FFCDD2", fill_type="solid")
             
             # Ganancia Unitaria
-            cell = ws.cell(row=idx, column=6, value=f"${float(p.ganancia_unitaria):,.0f}")
+            cell = ws.cell(row=idx, column=6, value=f"${float(p['ganancia_unitaria']):,.0f}")
             cell.border = estilos['border_style']
             cell.font = Font(size=10, bold=True)
             cell.alignment = estilos['right_align']
             
             # Stock
-            cell = ws.cell(row=idx, column=7, value=p.stock_actual)
+            cell = ws.cell(row=idx, column=7, value=p['stock_actual'])
             cell.border = estilos['border_style']
             cell.font = estilos['number_font']
             cell.alignment = estilos['right_align']
@@ -1466,10 +2505,74 @@ class ReportesViewSet(viewsets.ViewSet):
         wb.save(response)
         return response
     
-    def _generar_excel_rotacion(self, productos):
+    def _generar_excel_pronostico(self, datos):
+        """Generar Excel del pronóstico de demanda con diseño profesional"""
+        if not OPENPYXL_AVAILABLE:
+            return self._generar_csv_pronostico(datos)
+
+        estilos = self._obtener_estilos_excel('1976D2')
+        if not estilos:
+            return self._generar_csv_pronostico(datos)
+
+        wb = Workbook()
+        ws = wb.active
+        ws.title = "Pronóstico Demanda"
+
+        parametros = datos['parametros']
+        row_start = self._aplicar_titulo_excel(
+            ws,
+            'PRONÓSTICO DE DEMANDA Y QUIEBRES DE STOCK',
+            f'Fecha: {datos["fecha"].strftime("%d/%m/%Y")} | Historia: {parametros["dias_historia"]} días | '
+            f'Horizonte: {parametros["horizonte"]} días | Productos: {len(datos["productos"])}',
+            7,
+            estilos
+        )
+
+        headers = [
+            'Código', 'Nombre', 'Stock Actual', 'Venta Diaria Est.',
+            f'Demanda {parametros["horizonte"]} días', 'Días Cobertura', 'Fecha Quiebre'
+        ]
+        self._aplicar_headers_excel(ws, headers, row_start, estilos)
+
+        for idx, p in enumerate(datos['productos'], row_start + 1):
+            valores = [
+                (p['codigo'], estilos['left_align']),
+                (p['nombre'], estilos['left_align']),
+                (p['stock_actual'], estilos['right_align']),
+                (p['venta_diaria_estimada'], estilos['right_align']),
+                (p['demanda_horizonte'], estilos['right_align']),
+                (p['dias_cobertura'] if p['dias_cobertura'] is not None else '-', estilos['center_align']),
+                (p['fecha_quiebre'].strftime('%d/%m/%Y') if p['fecha_quiebre'] else '-', estilos['center_align']),
+            ]
+            for col_num, (valor, alineacion) in enumerate(valores, 1):
+                cell = ws.cell(row=idx, column=col_num, value=valor)
+                cell.border = estilos['border_style']
+                cell.font = estilos['data_font']
+                cell.alignment = alineacion
+
+            if p['dias_cobertura'] is not None and p['dias_cobertura'] <= 7:
+                for col_num in range(1, 8):
+                    ws.cell(row=idx, column=col_num).fill = PatternFill(
+                        start_color="FFCDD2", end_color="FFCDD2", fill_type="solid"
+                    )
+            ws.row_dimensions[idx].height = 18
+
+        column_widths = [15, 35, 14, 18, 18, 16, 16]
+        for col_num, width in enumerate(column_widths, 1):
+            ws.column_dimensions[get_column_letter(col_num)].width = width
+
+        response = HttpResponse(
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        )
+        filename = f'pronostico_demanda_{datos["fecha"].strftime("%Y%m%d")}.xlsx'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        wb.save(response)
+        return response
+
+    def _generar_excel_rotacion(self, datos):
         """Generar Excel de rotación de inventario con diseño profesional"""
         if not OPENPYXL_AVAILABLE:
-            return self._generar_csv_rotacion(productos)
+            return self._generar_csv_rotacion(datos)
         
         wb = Workbook()
         ws = wb.active
@@ -1478,9 +2581,9 @@ class ReportesViewSet(viewsets.ViewSet):
         # Obtener estilos estándar
         estilos = self._obtener_estilos_excel('1976D2')
         if not estilos:
-            return self._generar_csv_rotacion(productos)
+            return self._generar_csv_rotacion(datos)
         
-        productos_con_rotacion = [p for p in productos if p.stock_actual > 0]
+        productos_con_rotacion = datos['productos']
         
         row_start = self._aplicar_titulo_excel(
             ws, 
@@ -1495,32 +2598,32 @@ class ReportesViewSet(viewsets.ViewSet):
         
         for idx, p in enumerate(productos_con_rotacion, row_start + 1):
             # Código
-            cell = ws.cell(row=idx, column=1, value=p.codigo)
+            cell = ws.cell(row=idx, column=1, value=p['codigo'])
             cell.border = estilos['border_style']
             cell.font = estilos['data_font']
             cell.alignment = estilos['left_align']
             
             # Nombre
-            cell = ws.cell(row=idx, column=2, value=p.nombre)
+            cell = ws.cell(row=idx, column=2, value=p['nombre'])
             cell.border = estilos['border_style']
             cell.font = estilos['data_font']
             cell.alignment = estilos['left_align']
             
             # Stock Actual
-            cell = ws.cell(row=idx, column=3, value=p.stock_actual)
+            cell = ws.cell(row=idx, column=3, value=p['stock_actual'])
             cell.border = estilos['border_style']
             cell.font = estilos['number_font']
             cell.alignment = estilos['right_align']
             
             # Vendido 30 días
-            vendido = p.cantidad_vendida or 0
+            vendido = p['cantidad_vendida_30dias']
             cell = ws.cell(row=idx, column=4, value=vendido)
             cell.border = estilos['border_style']
             cell.font = estilos['number_font']
             cell.alignment = estilos['right_align']
             
             # Rotación con color
-            rotacion = vendido / p.stock_actual if p.stock_actual > 0 else 0
+            rotacion = p['rotacion']
             cell = ws.cell(row=idx, column=5, value=f"{rotacion:.2f}")
             cell.border = estilos['border_style']
             cell.font = Font(size=10, bold=True)
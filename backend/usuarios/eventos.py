@@ -0,0 +1,53 @@
+"""
+Alertas de stock en vivo (Server-Sent Events) para AlertaStockViewSet.eventos.
+
+Bajo ASGI cada cliente conectado es una corrutina que espera: no ocupa un hilo ni
+una conexión a la base de datos. Una sola consulta por proceso cada
+ALERTAS_EVENTOS_INTERVALO segundos sirve a todos los clientes, y solo se envía un
+evento cuando cambia la cantidad de alertas no leídas o llega una nueva.
+
+Cada conexión dura ALERTAS_EVENTOS_DURACION segundos y el navegador se reconecta
+solo (EventSource); así no se acumulan clientes que ya se fueron, porque Django
+4.2 no avisa cuando el cliente se desconecta.
+"""
+import asyncio
+
+from django.db.models import Count, Max
+
+from erp_minimarket.asincrono import SondeoCompartido, evento_sse
+
+from .models import AlertaStock
+
+# Comentario SSE para que proxies y balanceadores no cierren la conexión inactiva
+LATIDO_SEGUNDOS = 15
+
+
+def estado_alertas():
+    """Cantidad de alertas no leídas (de productos activos) y el id de la más reciente"""
+    return AlertaStock.objects.filter(
+        leida=False,
+        producto__activo=True
+    ).aggregate(cantidad=Count('id'), ultima=Max('id'))
+
+
+_sondeo = SondeoCompartido(estado_alertas)
+
+
+async def eventos_alertas(intervalo, duracion):
+    """Eventos 'alertas' con el estado_alertas() cada vez que cambia"""
+    loop = asyncio.get_running_loop()
+    fin = loop.time() + duracion
+    anterior, ultimo_envio = None, None
+    while True:
+        estado = await _sondeo.obtener(intervalo)
+        ahora = loop.time()
+        if estado != anterior:
+            # retry: pasado el tiempo de la conexión, reconectar tras un intervalo
+            yield evento_sse(estado, 'alertas', reintento=intervalo * 1000 if anterior is None else None)
+            anterior, ultimo_envio = estado, ahora
+        elif ahora - ultimo_envio >= LATIDO_SEGUNDOS:
+            yield b': latido\n\n'
+            ultimo_envio = ahora
+        if ahora + intervalo >= fin:
+            break
+        await asyncio.sleep(intervalo)
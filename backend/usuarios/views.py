@@ -1,11 +1,16 @@
 from django.shortcuts import render
 from django.middleware.csrf import get_token
+from django.http import StreamingHttpResponse, HttpResponse
 from rest_framework import viewsets, status, serializers
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from django.utils import timezone
 from django.contrib.auth import login, logout
+from rest_framework.settings import api_settings
+from erp_minimarket.asincrono import (
+    AccionesAsincronasMixin, EventosRenderer, es_asgi, evento_sse, liberar_conexiones
+)
 from .models import AlertaStock, Usuario, Configuracion
 from .serializers import UsuarioSerializer, LoginSerializer, RegistroSerializer, ConfiguracionSerializer
 from .permissions import (
@@ -111,7 +116,7 @@ class AlertaStockSerializer(serializers.ModelSerializer):
             return None
 
 
-class AlertaStockViewSet(viewsets.ReadOnlyModelViewSet):
+class AlertaStockViewSet(AccionesAsincronasMixin, viewsets.ReadOnlyModelViewSet):
     """ViewSet para gestionar alertas de stock bajo"""
     queryset = AlertaStock.objects.filter(producto__activo=True).select_related('producto')
     serializer_class = AlertaStockSerializer
@@ -194,6 +199,41 @@ class AlertaStockViewSet(viewsets.ReadOnlyModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    @action(
+        detail=False,
+        methods=['get'],
+        renderer_classes=[EventosRenderer, *api_settings.DEFAULT_RENDERER_CLASSES]
+    )
+    async def eventos(self, request):
+        """
+        Alertas no leídas en vivo (text/event-stream, para EventSource): un evento
+        'alertas' con {cantidad, ultima} al conectarse y cada vez que cambian.
+
+        Bajo WSGI la conexión ocuparía un worker: se responde solo el estado actual
+        y el navegador vuelve a preguntar a los 15 segundos, como con el sondeo.
+        """
+        from asgiref.sync import sync_to_async
+        from django.conf import settings
+        from .eventos import eventos_alertas, estado_alertas
+
+        if not es_asgi(request):
+            estado = await sync_to_async(estado_alertas)()
+            response = HttpResponse(
+                evento_sse(estado, 'alertas', reintento=15000),
+                content_type='text/event-stream'
+            )
+        else:
+            # La conexión de la autenticación no se usa más durante la transmisión
+            await sync_to_async(liberar_conexiones)()
+            response = StreamingHttpResponse(
+                eventos_alertas(settings.ALERTAS_EVENTOS_INTERVALO, settings.ALERTAS_EVENTOS_DURACION),
+                content_type='text/event-stream'
+            )
+        response['Cache-Control'] = 'no-cache'
+        # nginx: enviar cada evento apenas se genera
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
 
 class ConfiguracionViewSet(viewsets.ModelViewSet):
     """ViewSet para gestionar configuraciones del sistema"""
@@ -0,0 +1,93 @@
+# Generated by Django 4.2.7 on 2026-10-19 16:10
+
+from bisect import bisect_right
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import migrations, models
+
+
+def reconstruir_costos(apps, schema_editor):
+    """
+    Completa costo_unitario de las ventas existentes con el costo vigente a su fecha.
+
+    El costo promedio se reconstruye reproduciendo, por producto y en orden, las
+    entradas de stock de compras ('Compra #<id>'): stock anterior y cantidad salen del
+    movimiento y el costo unitario del detalle de la compra, igual que en
+    DetalleCompra.aplicar_compra. Antes de la primera compra registrada se usa el
+    costo de esa compra; los productos sin compras usan su costo actual.
+    """
+    DetalleVenta = apps.get_model('ventas', 'DetalleVenta')
+    DetalleCompra = apps.get_model('compras', 'DetalleCompra')
+    MovimientoStock = apps.get_model('inventario', 'MovimientoStock')
+    Producto = apps.get_model('inventario', 'Producto')
+
+    costos_compra = {
+        (compra_id, producto_id): costo
+        for compra_id, producto_id, costo in DetalleCompra.objects.values_list(
+            'compra_id', 'producto_id', 'costo_unitario'
+        )
+    }
+
+    # Por producto: fechas en que cambió el costo y el costo desde esa fecha
+    historial = {}
+    entradas = MovimientoStock.objects.filter(
+        tipo='ENTRADA', motivo__startswith='Compra #'
+    ).order_by('fecha', 'id').values_list(
+        'producto_id', 'motivo', 'fecha', 'stock_anterior', 'cantidad', 'stock_nuevo'
+    )
+    for producto_id, motivo, fecha, stock_anterior, cantidad, stock_nuevo in entradas.iterator():
+        try:
+            costo_compra = costos_compra.get((int(motivo.split('#', 1)[1]), producto_id))
+        except ValueError:
+            continue
+        if costo_compra is None:
+            continue
+
+        fechas, costos = historial.setdefault(producto_id, ([], []))
+        if not costos:
+            costo = costo_compra
+        elif stock_nuevo > 0:
+            costo = (costos[-1] * stock_anterior + costo_compra * cantidad) / stock_nuevo
+        else:
+            costo = costos[-1]
+        fechas.append(fecha)
+        costos.append(costo.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP))
+
+    costos_actuales = dict(Producto.objects.values_list('id', 'costo'))
+
+    pendientes = []
+    detalles = DetalleVenta.objects.filter(costo_unitario__isnull=True).values_list(
+        'id', 'producto_id', 'venta__fecha'
+    )
+    for detalle_id, producto_id, fecha in detalles.iterator():
+        if producto_id in historial:
+            fechas, costos = historial[producto_id]
+            costo = costos[max(bisect_right(fechas, fecha) - 1, 0)]
+        else:
+            costo = costos_actuales[producto_id]
+        pendientes.append(DetalleVenta(id=detalle_id, costo_unitario=costo))
+
+    DetalleVenta.objects.bulk_update(pendientes, ['costo_unitario'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0003_alter_venta_fecha'),
+        ('compras', '0004_add_subtotal_to_detallecompra'),
+        ('inventario', '0005_producto_bajo_stock_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='detalleventa',
+            name='costo_unitario',
+            field=models.DecimalField(decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.RunPython(reconstruir_costos, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='detalleventa',
+            name='costo_unitario',
+            field=models.DecimalField(decimal_places=2, max_digits=10),
+        ),
+    ]
@@ -50,6 +50,12 @@ class DetalleVenta(models.Model):
         null=False,
         blank=False
     )
+    # Costo del producto al momento de la venta: el costo promedio del producto cambia
+    # con cada compra y los márgenes históricos no deben cambiar con él
+    costo_unitario = models.DecimalField(
+        max_digits=10,
+        decimal_places=2
+    )
 
     class Meta:
         unique_together = ['venta', 'producto']
@@ -63,6 +69,8 @@ class DetalleVenta(models.Model):
         # Calcular subtotal antes de guardar
         if self.cantidad and self.precio_unitario:
             self.subtotal = Decimal(str(self.cantidad)) * Decimal(str(self.precio_unitario))
+        if self.costo_unitario is None:
+            self.costo_unitario = self.producto.costo
         super().save(*args, **kwargs)
 
     def calcular_subtotal(self):
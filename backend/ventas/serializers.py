@@ -1,25 +1,31 @@
 from rest_framework import serializers
 from django.db import transaction
+from erp_minimarket.campos import CamposDinamicosSerializerMixin
 from .models import Venta, DetalleVenta
 from inventario.models import Producto
+from inventario.serializers import ProductoEnLoteField
 
 
 class DetalleVentaSerializer(serializers.ModelSerializer):
     producto_nombre = serializers.CharField(source='producto.nombre', read_only=True)
     producto_codigo = serializers.CharField(source='producto.codigo', read_only=True)
     stock_disponible = serializers.IntegerField(source='producto.stock_actual', read_only=True)
-    producto = serializers.PrimaryKeyRelatedField(queryset=Producto.objects.all())
+    producto = ProductoEnLoteField(queryset=Producto.objects.all())
 
     class Meta:
         model = DetalleVenta
         fields = '__all__'
-        read_only_fields = ['subtotal', 'venta']
+        read_only_fields = ['subtotal', 'costo_unitario', 'venta']
 
 
-class VentaSerializer(serializers.ModelSerializer):
+class VentaSerializer(CamposDinamicosSerializerMixin, serializers.ModelSerializer):
     items = DetalleVentaSerializer(many=True, read_only=True)
     total_calculado = serializers.SerializerMethodField()
 
+    # Historial de ventas sin las líneas (se piden al abrir una venta)
+    perfiles = {'compacto': ['id', 'numero_boleta', 'fecha', 'total', 'usuario']}
+    columnas_campos = {'items': ('items__producto',), 'total_calculado': ('items',)}
+
     class Meta:
         model = Venta
         fields = '__all__'
@@ -48,6 +54,13 @@ class CrearVentaSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError({"items": "Debe agregar al menos un producto."})
         
         from decimal import Decimal
+
+        # Al editar, la cantidad ya vendida en la venta original vuelve a estar disponible
+        cantidades_actuales = {}
+        if self.instance is not None:
+            cantidades_actuales = dict(
+                self.instance.items.values_list('producto_id', 'cantidad')
+            )
         
         for item_data in items_data:
             producto = item_data.get('producto')
@@ -69,10 +82,11 @@ class CrearVentaSerializer(serializers.ModelSerializer):
             item_data['precio_unitario'] = precio_unitario_decimal
 
             # Validar stock suficiente
-            if not producto.tiene_stock_suficiente(cantidad):
+            disponible = producto.stock_actual + cantidades_actuales.get(producto.id, 0)
+            if disponible < cantidad:
                 raise serializers.ValidationError(
                     f"Stock insuficiente para {producto.nombre}. "
-                    f"Stock disponible: {producto.stock_actual}, solicitado: {cantidad}"
+                    f"Stock disponible: {disponible}, solicitado: {cantidad}"
                 )
 
             # Validar precio no menor al costo
@@ -128,7 +142,8 @@ class CrearVentaSerializer(serializers.ModelSerializer):
                         producto=producto,
                         cantidad=cantidad,
                         precio_unitario=precio_unitario,
-                        subtotal=subtotal_calculado  # Calcular explícitamente el subtotal
+                        subtotal=subtotal_calculado,  # Calcular explícitamente el subtotal
+                        costo_unitario=producto.costo
                     )
                     
                     # Aplicar la venta (descuenta stock)
@@ -148,36 +163,20 @@ class CrearVentaSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(f"Error al crear la venta: {str(e)}")
 
     def update(self, instance, validated_data):
-        """Actualizar una venta existente"""
+        """
+        Actualizar una venta existente.
+
+        Compara las líneas enviadas con las existentes por producto: solo se crean,
+        modifican o eliminan las líneas que cambiaron, y el stock se ajusta por la
+        diferencia neta de cada producto (un movimiento por producto afectado).
+        """
         items_data = validated_data.pop('items', None)
         usuario = self.context['request'].user.username if self.context['request'].user.is_authenticated else 'Cajero'
         
+        # Día en que están resumidas las líneas actuales (reportes.VentaDiaProducto)
+        fecha_guardada = instance.fecha
+
         with transaction.atomic():
-            # Revertir los cambios de stock de la venta original
-            for detalle in instance.items.all():
-                producto = detalle.producto
-                stock_actual = producto.stock_actual
-                stock_nuevo = stock_actual + detalle.cantidad  # Revertir: sumar lo que se había restado
-                
-                # Revertir stock
-                producto.stock_actual = stock_nuevo
-                producto.save()
-                
-                # Registrar movimiento de reversión
-                from inventario.models import MovimientoStock
-                MovimientoStock.objects.create(
-                    producto=producto,
-                    tipo='AJUSTE',
-                    cantidad=detalle.cantidad,  # Positivo porque estamos revirtiendo
-                    stock_anterior=stock_actual,
-                    stock_nuevo=stock_nuevo,
-                    motivo=f'Reversión de Venta #{instance.id}',
-                    usuario=usuario
-                )
-            
-            # Eliminar detalles antiguos
-            instance.items.all().delete()
-            
             # Actualizar datos de la venta
             numero_boleta = validated_data.get('numero_boleta')
             # Si no se proporciona un número de boleta y no existe uno previo, generarlo automáticamente
@@ -201,33 +200,106 @@ class CrearVentaSerializer(serializers.ModelSerializer):
             
             instance.observaciones = validated_data.get('observaciones', instance.observaciones)
             instance.usuario = usuario
-            instance.save()
-            
-            # Crear nuevos detalles
-            from decimal import Decimal
-            total = Decimal('0.00')
-            if items_data:
-                for item_data in items_data:
-                    producto = item_data['producto']
-                    cantidad = item_data['cantidad']
-                    precio_unitario = item_data['precio_unitario']
 
-                    # Calcular subtotal antes de crear el objeto
-                    subtotal_calculado = Decimal(str(cantidad)) * Decimal(str(precio_unitario))
-                    
-                    detalle = DetalleVenta.objects.create(
-                        venta=instance,
-                        producto=producto,
-                        cantidad=cantidad,
-                        precio_unitario=precio_unitario,
-                        subtotal=subtotal_calculado  # Calcular explícitamente el subtotal
-                    )
-                    detalle.aplicar_venta()
-                    # Usar el subtotal calculado
-                    total += subtotal_calculado
+            if items_data:
+                instance.total = self._sincronizar_items(instance, items_data, usuario, fecha_guardada)
 
-                instance.total = total
-                instance.save()
+            instance.save()
 
         return instance
 
+    def _sincronizar_items(self, instance, items_data, usuario, fecha_guardada):
+        """Aplica las diferencias entre las líneas actuales y las nuevas. Retorna el total."""
+        from decimal import Decimal
+        from inventario.servicios import aplicar_deltas_stock, StockInsuficienteError
+        from reportes.resumenes import acumular_lineas_venta
+
+        # Líneas nuevas agrupadas por producto (una venta no repite productos)
+        nuevas = {}
+        item_productos = {}
+        for item_data in items_data:
+            producto = item_data['producto']
+            item_productos[producto.id] = producto
+            if producto.id in nuevas:
+                nuevas[producto.id]['cantidad'] += item_data['cantidad']
+                nuevas[producto.id]['precio_unitario'] = item_data['precio_unitario']
+            else:
+                nuevas[producto.id] = {
+                    'cantidad': item_data['cantidad'],
+                    'precio_unitario': item_data['precio_unitario'],
+                }
+
+        actuales = {detalle.producto_id: detalle for detalle in instance.items.all()}
+
+        # Delta de stock por producto: lo que se devuelve menos lo que se vende de nuevo
+        deltas = {}
+        crear, modificar, eliminar = [], [], []
+        resumen_anterior = []
+
+        for producto_id, detalle in actuales.items():
+            if producto_id not in nuevas:
+                eliminar.append(detalle.id)
+                deltas[producto_id] = detalle.cantidad
+                resumen_anterior.append(
+                    (producto_id, detalle.cantidad, detalle.subtotal, detalle.costo_unitario)
+                )
+
+        total = Decimal('0.00')
+        for producto_id, datos in nuevas.items():
+            cantidad = datos['cantidad']
+            precio_unitario = Decimal(str(datos['precio_unitario']))
+            subtotal_calculado = Decimal(str(cantidad)) * precio_unitario
+            total += subtotal_calculado
+
+            detalle = actuales.get(producto_id)
+            if detalle is None:
+                crear.append(DetalleVenta(
+                    venta=instance,
+                    producto_id=producto_id,
+                    cantidad=cantidad,
+                    precio_unitario=precio_unitario,
+                    subtotal=subtotal_calculado,
+                    costo_unitario=item_productos[producto_id].costo
+                ))
+                deltas[producto_id] = -cantidad
+            elif detalle.cantidad != cantidad or detalle.precio_unitario != precio_unitario:
+                deltas[producto_id] = detalle.cantidad - cantidad
+                resumen_anterior.append(
+                    (producto_id, detalle.cantidad, detalle.subtotal, detalle.costo_unitario)
+                )
+                detalle.cantidad = cantidad
+                detalle.precio_unitario = precio_unitario
+                detalle.subtotal = subtotal_calculado
+                modificar.append(detalle)
+
+        try:
+            aplicar_deltas_stock(
+                deltas,
+                motivo=f'Modificación de Venta #{instance.id}',
+                usuario=usuario,
+                tipo_positivo='AJUSTE',
+                tipo_negativo='SALIDA'
+            )
+        except StockInsuficienteError as e:
+            raise serializers.ValidationError(
+                f'Stock insuficiente para {e.producto_nombre} ({e.stock_resultante}).'
+            )
+
+        if eliminar:
+            eliminadas = DetalleVenta.objects.filter(id__in=eliminar)
+            # Su resumen se descuenta abajo en bloque, no línea por línea en post_delete
+            eliminadas.resumen_ajustado = True
+            eliminadas.delete()
+        if modificar:
+            DetalleVenta.objects.bulk_update(modificar, ['cantidad', 'precio_unitario', 'subtotal'])
+        if crear:
+            DetalleVenta.objects.bulk_create(crear)
+
+        # bulk_update/bulk_create no envían señales: el resumen diario por producto se
+        # ajusta aquí, junto con el de las líneas eliminadas
+        acumular_lineas_venta(fecha_guardada, resumen_anterior, signo=-1)
+        acumular_lineas_venta(fecha_guardada, [
+            (d.producto_id, d.cantidad, d.subtotal, d.costo_unitario) for d in modificar + crear
+        ])
+
+        return total
@@ -0,0 +1,168 @@
+from decimal import Decimal
+
+from django.db import connection, reset_queries
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from inventario.models import MovimientoStock, Producto
+from usuarios.models import Usuario
+
+from reportes.models import VentaDiaProducto
+
+from .models import Venta
+
+
+class VentaApiTestCase(TestCase):
+    """Productos con stock 100 y un usuario que registra ventas por la API"""
+
+    url = '/api/ventas/'
+    lineas = 3
+
+    def setUp(self):
+        usuario = Usuario.objects.create_user(username='cajero', password='cajero', rol='ADMINISTRADOR')
+        self.client = APIClient()
+        self.client.force_authenticate(usuario)
+        self.productos = [
+            Producto.objects.create(
+                codigo=f'P{i}', nombre=f'Producto {i}', costo=Decimal('100'),
+                precio_venta=Decimal('150'), stock_actual=100
+            )
+            for i in range(2 * self.lineas)
+        ]
+
+    def crear_venta(self, lineas, cantidad=2):
+        response = self.client.post(self.url, {'items': [
+            {'producto': producto.id, 'cantidad': cantidad, 'precio_unitario': '150'}
+            for producto in self.productos[:lineas]
+        ]}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return Venta.objects.get(id=response.data['id'])
+
+    def actualizar(self, venta, cantidad):
+        return self.reemplazar_lineas(venta, dict.fromkeys(venta.items.values_list('producto_id', flat=True), cantidad))
+
+    def reemplazar_lineas(self, venta, cantidades):
+        """PUT de la venta con {producto_id: cantidad}"""
+        return self.client.put(f'{self.url}{venta.id}/', {'items': [
+            {'producto': producto_id, 'cantidad': cantidad, 'precio_unitario': '150'}
+            for producto_id, cantidad in cantidades.items()
+        ]}, format='json')
+
+    def stock(self, producto):
+        return Producto.objects.get(id=producto.id).stock_actual
+
+
+class ReversionVentaTest(VentaApiTestCase):
+    """Eliminar o editar una venta cuesta las mismas consultas con N o 2N líneas"""
+
+    def test_eliminar_con_consultas_constantes(self):
+        venta = self.crear_venta(self.lineas)
+        # request_started vacía el registro de consultas: partir de cero en ambas mediciones
+        reset_queries()
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(self.client.delete(f'{self.url}{venta.id}/').status_code, 200)
+        esperadas = len(consultas)
+
+        venta = self.crear_venta(2 * self.lineas)
+        reset_queries()
+        with self.assertNumQueries(esperadas):
+            self.assertEqual(self.client.delete(f'{self.url}{venta.id}/').status_code, 200)
+
+        self.assertFalse(Venta.objects.exists())
+        self.assertEqual(
+            set(Producto.objects.values_list('stock_actual', flat=True)), {100}
+        )
+
+    def test_actualizar_con_consultas_constantes(self):
+        venta = self.crear_venta(self.lineas)
+        # request_started vacía el registro de consultas: partir de cero en ambas mediciones
+        reset_queries()
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(self.actualizar(venta, 5).status_code, 200)
+        esperadas = len(consultas)
+
+        venta = self.crear_venta(2 * self.lineas)
+        reset_queries()
+        with self.assertNumQueries(esperadas):
+            response = self.actualizar(venta, 5)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['cantidad'] for item in response.data['items']], [5] * 2 * self.lineas)
+
+        # 5 de la primera venta y 5 de la segunda en los productos que comparten
+        stock = dict(Producto.objects.values_list('id', 'stock_actual'))
+        self.assertEqual(stock[self.productos[0].id], 90)
+        self.assertEqual(stock[self.productos[-1].id], 95)
+
+    def test_stock_insuficiente_no_modifica_la_venta(self):
+        venta = self.crear_venta(self.lineas)
+        movimientos = MovimientoStock.objects.count()
+
+        response = self.actualizar(venta, 500)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(venta.items.values_list('cantidad', flat=True)), [2] * self.lineas)
+        self.assertEqual(Producto.objects.get(id=self.productos[0].id).stock_actual, 98)
+        self.assertEqual(MovimientoStock.objects.count(), movimientos)
+
+
+class SincronizacionLineasVentaTest(VentaApiTestCase):
+    """Editar una venta solo escribe las líneas y movimientos que cambiaron"""
+
+    def movimientos_nuevos(self, desde):
+        return list(
+            MovimientoStock.objects.filter(id__gt=desde).order_by('producto_id')
+            .values_list('producto_id', 'tipo', 'cantidad')
+        )
+
+    def test_lineas_sin_cambios_no_registran_movimientos(self):
+        venta = self.crear_venta(self.lineas)
+        ultimo = MovimientoStock.objects.latest('id').id
+
+        self.assertEqual(self.actualizar(venta, 2).status_code, 200)
+
+        self.assertEqual(self.movimientos_nuevos(ultimo), [])
+        self.assertEqual(self.stock(self.productos[0]), 98)
+
+    def test_cantidades_modificadas_registran_solo_la_diferencia(self):
+        venta = self.crear_venta(self.lineas)
+        primero, segundo, tercero = self.productos[:3]
+        ultimo = MovimientoStock.objects.latest('id').id
+
+        response = self.reemplazar_lineas(venta, {primero.id: 5, segundo.id: 1, tercero.id: 2})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.movimientos_nuevos(ultimo), [
+            (primero.id, 'SALIDA', 3), (segundo.id, 'AJUSTE', 1)
+        ])
+        self.assertEqual([self.stock(p) for p in (primero, segundo, tercero)], [95, 99, 98])
+
+    def test_lineas_eliminadas_devuelven_su_stock(self):
+        venta = self.crear_venta(self.lineas)
+        primero, segundo, tercero = self.productos[:3]
+        ultimo = MovimientoStock.objects.latest('id').id
+
+        response = self.reemplazar_lineas(venta, {primero.id: 2})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(venta.items.values_list('producto_id', flat=True)), [primero.id])
+        self.assertEqual(self.movimientos_nuevos(ultimo), [
+            (segundo.id, 'AJUSTE', 2), (tercero.id, 'AJUSTE', 2)
+        ])
+        self.assertEqual([self.stock(p) for p in (primero, segundo, tercero)], [98, 100, 100])
+        self.assertEqual(
+            dict(VentaDiaProducto.objects.values_list('producto_id', 'unidades')),
+            {primero.id: 2, segundo.id: 0, tercero.id: 0}
+        )
+
+    def test_eliminar_lineas_con_consultas_constantes(self):
+        venta = self.crear_venta(self.lineas)
+        reset_queries()
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(self.reemplazar_lineas(venta, {self.productos[0].id: 2}).status_code, 200)
+        esperadas = len(consultas)
+
+        venta = self.crear_venta(2 * self.lineas)
+        reset_queries()
+        with self.assertNumQueries(esperadas):
+            self.assertEqual(self.reemplazar_lineas(venta, {self.productos[0].id: 2}).status_code, 200)
@@ -3,13 +3,14 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.db import transaction
-from django.core.cache import cache
+from inventario.cache import cache
+from erp_minimarket.campos import CamposDinamicosMixin
 from usuarios.permissions import PuedeVentas
 from .models import Venta, DetalleVenta
 from .serializers import VentaSerializer, CrearVentaSerializer
 
 
-class VentaViewSet(viewsets.ModelViewSet):
+class VentaViewSet(CamposDinamicosMixin, viewsets.ModelViewSet):
     queryset = Venta.objects.prefetch_related('items__producto').all()
     serializer_class = VentaSerializer
     search_fields = ['numero_boleta']
@@ -52,6 +53,11 @@ class VentaViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(instance, data=request.data, partial=False)
         serializer.is_valid(raise_exception=True)
         venta = serializer.save()
+
+        # Las líneas se modificaron en la base; volver a precargarlas para la respuesta
+        from django.db.models import prefetch_related_objects
+        venta._prefetched_objects_cache = {}
+        prefetch_related_objects([venta], 'items__producto')
         
         return Response(
             VentaSerializer(venta).data,
@@ -65,28 +71,14 @@ class VentaViewSet(viewsets.ModelViewSet):
             instance = self.get_object()
             usuario = request.user.username if request.user.is_authenticated else 'Cajero'
             
-            # Revertir los cambios de stock de cada item
-            from inventario.models import MovimientoStock
-            
-            for detalle in instance.items.all():
-                producto = detalle.producto
-                stock_actual = producto.stock_actual
-                stock_nuevo = stock_actual + detalle.cantidad  # Revertir: sumar lo que se había restado
-                
-                # Revertir stock
-                producto.stock_actual = stock_nuevo
-                producto.save()
-                
-                # Registrar movimiento de reversión
-                MovimientoStock.objects.create(
-                    producto=producto,
-                    tipo='AJUSTE',
-                    cantidad=detalle.cantidad,  # Positivo porque estamos revirtiendo
-                    stock_anterior=stock_actual,
-                    stock_nuevo=stock_nuevo,
-                    motivo=f'Eliminación de Venta #{instance.id}',
-                    usuario=usuario
-                )
+            # Revertir los cambios de stock de todos los items en bloque
+            from inventario.servicios import aplicar_deltas_stock, deltas_de_detalles
+
+            aplicar_deltas_stock(
+                deltas_de_detalles(instance.items.all(), signo=1),
+                motivo=f'Eliminación de Venta #{instance.id}',
+                usuario=usuario
+            )
             
             # Eliminar la venta (los detalles se eliminan en cascada)
             self.perform_destroy(instance)
@@ -103,7 +95,13 @@ class VentaViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'])
     def exportar_csv(self, request):
-        """Exportar ventas a Excel con diseño mejorado"""
+        """Exportar ventas a Excel con diseño mejorado (o por línea en Parquet/Arrow con formato=parquet|arrow)"""
+        from reportes.columnar import FORMATOS_COLUMNARES
+
+        formato = request.query_params.get('formato')
+        if formato in FORMATOS_COLUMNARES:
+            return self._exportar_columnar(formato)
+
         from openpyxl import Workbook
         from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
         from openpyxl.utils import get_column_letter
@@ -231,3 +229,21 @@ class VentaViewSet(viewsets.ModelViewSet):
         wb.save(response)
         return response
 
+    def _exportar_columnar(self, formato):
+        """Una fila por línea de venta, con los datos de su venta, para análisis"""
+        from datetime import datetime
+        from reportes.columnar import respuesta_columnar
+
+        ventas = self.get_queryset().order_by().values('id')
+        filas = DetalleVenta.objects.filter(venta__in=ventas).order_by('venta__fecha', 'venta_id', 'id').values_list(
+            'venta_id', 'venta__numero_boleta', 'venta__fecha', 'venta__usuario',
+            'producto_id', 'producto__codigo', 'producto__nombre',
+            'cantidad', 'precio_unitario', 'subtotal', 'costo_unitario'
+        )
+        return respuesta_columnar(filas, [
+            ('venta_id', 'entero'), ('numero_boleta', 'texto'), ('fecha', 'fecha_hora'), ('usuario', 'texto'),
+            ('producto_id', 'entero'), ('producto_codigo', 'texto'), ('producto_nombre', 'texto'),
+            ('cantidad', 'entero'), ('precio_unitario', 'decimal'), ('subtotal', 'decimal'),
+            ('costo_unitario', 'decimal'),
+        ], formato, f'ventas_{datetime.now().strftime("%Y%m%d_%H%M%S")}')
+
@@ -29,12 +29,30 @@ function AlertasNotificacion() {
   const [snackbar, setSnackbar] = React.useState({ open: false, message: '', cantidad: 0 });
   const cantidadAnteriorRef = useRef(0);
   const queryClient = useQueryClient();
+  // Con la conexión de eventos abierta el servidor avisa los cambios: no hace falta sondear
+  const [enVivo, setEnVivo] = React.useState(false);
+
+  useEffect(() => {
+    if (typeof EventSource === 'undefined') {
+      return undefined;
+    }
+    const fuente = new EventSource(alertasService.eventosUrl(), { withCredentials: true });
+    fuente.onopen = () => setEnVivo(true);
+    // EventSource se reconecta solo; mientras tanto se vuelve al sondeo
+    fuente.onerror = () => setEnVivo(false);
+    fuente.addEventListener('alertas', (evento) => {
+      const { cantidad } = JSON.parse(evento.data);
+      queryClient.setQueryData('cantidad-alertas', { data: { cantidad } });
+      queryClient.invalidateQueries('alertas-no-leidas');
+    });
+    return () => fuente.close();
+  }, [queryClient]);
 
   const { data: alertasNoLeidas } = useQuery(
     'alertas-no-leidas',
     () => alertasService.noLeidas(),
     {
-      refetchInterval: 15000, // Refrescar cada 15 segundos (más frecuente)
+      refetchInterval: enVivo ? false : 15000, // Refrescar cada 15 segundos si no hay eventos en vivo
       staleTime: 30 * 1000, // 30 segundos
       retry: 2,
       retryDelay: 1000,
@@ -48,7 +66,7 @@ function AlertasNotificacion() {
     'cantidad-alertas',
     () => alertasService.contarNoLeidas(),
     {
-      refetchInterval: 15000, // Refrescar cada 15 segundos
+      refetchInterval: enVivo ? false : 15000, // Refrescar cada 15 segundos si no hay eventos en vivo
       staleTime: 30 * 1000,
       retry: 2,
       retryDelay: 1000,
@@ -85,6 +103,7 @@ function AlertasNotificacion() {
       onSuccess: () => {
         queryClient.invalidateQueries('alertas-no-leidas');
         queryClient.invalidateQueries('cantidad-alertas');
+        queryClient.invalidateQueries('dashboard');
       },
     }
   );
@@ -95,6 +114,7 @@ function AlertasNotificacion() {
       onSuccess: () => {
         queryClient.invalidateQueries('alertas-no-leidas');
         queryClient.invalidateQueries('cantidad-alertas');
+        queryClient.invalidateQueries('dashboard');
       },
     }
   );
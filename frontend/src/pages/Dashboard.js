@@ -1,4 +1,4 @@
-import React, { useMemo } from 'react';
+import React from 'react';
 import { useQuery } from 'react-query';
 import { useNavigate } from 'react-router-dom';
 import {
@@ -31,10 +31,8 @@ import {
   LocalShipping as ShippingIcon,
   Assessment as AssessmentIcon,
 } from '@mui/icons-material';
-import { productosService } from '../services/productos';
 import { ventasService } from '../services/ventas';
 import { comprasService } from '../services/compras';
-import { alertasService } from '../services/alertas';
 import { reportesService } from '../services/reportes';
 import { useThemeSettings } from '../context/ThemeContext';
 import { formatearPesosChilenos } from '../utils/formato';
@@ -43,62 +41,18 @@ function Dashboard() {
   const { settings } = useThemeSettings();
   const navigate = useNavigate();
   
-  // Obtener fecha de hoy y ayer
-  const hoy = useMemo(() => {
-    const date = new Date();
-    date.setHours(0, 0, 0, 0);
-    return date.toISOString().split('T')[0];
-  }, []);
-
-  const ayer = useMemo(() => {
-    const date = new Date();
-    date.setDate(date.getDate() - 1);
-    date.setHours(0, 0, 0, 0);
-    return date.toISOString().split('T')[0];
-  }, []);
-
-  // Productos con stock bajo
-  const { data: productos, isLoading: productosLoading } = useQuery(
-    'productos-bajo-stock',
-    () => productosService.bajoStock(),
+  // Indicadores del dashboard (ventas, compras, stock, alertas, quiebres y rotación)
+  // en una sola llamada; cada sección viene de un reporte en caché en el backend
+  const { data: dashboard, isLoading: dashboardLoading } = useQuery(
+    'dashboard',
+    () => reportesService.dashboard(),
     {
       refetchInterval: 30000, // Actualizar cada 30 segundos
       staleTime: 30 * 1000,
       cacheTime: 2 * 60 * 1000,
     }
   );
-
-  // Alertas no leídas
-  const { data: alertas, isLoading: alertasLoading } = useQuery(
-    'alertas-no-leidas',
-    () => alertasService.noLeidas(),
-    {
-      refetchInterval: 30000,
-      staleTime: 30 * 1000,
-      cacheTime: 2 * 60 * 1000,
-    }
-  );
-
-  // Ventas de hoy
-  const { data: ventasHoy, isLoading: ventasHoyLoading } = useQuery(
-    ['ventas-diarias', hoy],
-    () => reportesService.ventasDiarias(hoy),
-    {
-      refetchInterval: 60000, // Actualizar cada minuto
-      staleTime: 60 * 1000,
-      cacheTime: 5 * 60 * 1000,
-    }
-  );
-
-  // Ventas de ayer (para comparación)
-  const { data: ventasAyer } = useQuery(
-    ['ventas-diarias', ayer],
-    () => reportesService.ventasDiarias(ayer),
-    {
-      staleTime: 10 * 60 * 1000,
-      cacheTime: 15 * 60 * 1000,
-    }
-  );
+  const resumen = dashboard?.data;
 
   // Ventas recientes (últimas 5)
   const { data: ventas, isLoading: ventasLoading } = useQuery(
@@ -120,86 +74,38 @@ function Dashboard() {
     }
   );
 
-  // Compras de hoy
-  const { data: comprasHoyData, isLoading: comprasHoyLoading } = useQuery(
-    ['compras-hoy', hoy],
-    () => comprasService.getAll({ 
-      fecha_desde: `${hoy}T00:00:00`,
-      fecha_hasta: `${hoy}T23:59:59`,
-    }),
-    {
-      refetchInterval: 60000,
-      staleTime: 60 * 1000,
-      cacheTime: 5 * 60 * 1000,
-    }
-  );
-
-  // Total de productos activos
-  const { data: productosActivos, isLoading: productosActivosLoading } = useQuery(
-    'productos-activos',
-    () => productosService.getAll({ activo: true, page_size: 1 }),
-    {
-      staleTime: 5 * 60 * 1000,
-      cacheTime: 10 * 60 * 1000,
-    }
-  );
-
-  // Obtener fecha de inicio de semana (lunes)
-  const getMonday = (date) => {
-    const d = new Date(date);
-    const day = d.getDay();
-    const diff = d.getDate() - day + (day === 0 ? -6 : 1);
-    return new Date(d.setDate(diff)).toISOString().split('T')[0];
-  };
-
-  const fechaInicioSemana = useMemo(() => getMonday(new Date()), []);
-
-  // Quiebres de stock esta semana
-  const { data: quiebres, isLoading: quiebresLoading } = useQuery(
-    ['quiebres-semana', fechaInicioSemana],
-    () => reportesService.quiebresSemana(fechaInicioSemana),
-    {
-      staleTime: 5 * 60 * 1000,
-      cacheTime: 10 * 60 * 1000,
-    }
-  );
-
-  // Rotación de inventario
-  const { data: rotacion, isLoading: rotacionLoading } = useQuery(
-    'rotacion-inventario',
-    () => reportesService.rotacionInventario(),
-    {
-      staleTime: 10 * 60 * 1000,
-      cacheTime: 15 * 60 * 1000,
-    }
-  );
-
   // Cálculos
-  const totalVentasHoy = ventasHoy?.data?.total_ventas || 0;
-  const cantidadVentasHoy = ventasHoy?.data?.cantidad_ventas || 0;
-  const totalVentasAyer = ventasAyer?.data?.total_ventas || 0;
+  const ventasHoyLoading = dashboardLoading;
+  const productosLoading = dashboardLoading;
+  const comprasHoyLoading = dashboardLoading;
+  const productosActivosLoading = dashboardLoading;
+  const quiebresLoading = dashboardLoading;
+  const rotacionLoading = dashboardLoading;
+
+  const totalVentasHoy = resumen?.ventas_hoy?.total || 0;
+  const cantidadVentasHoy = resumen?.ventas_hoy?.cantidad || 0;
+  const totalVentasAyer = resumen?.ventas_ayer?.total || 0;
   const diferenciaVentas = totalVentasHoy - totalVentasAyer;
   const porcentajeCambioVentas = totalVentasAyer > 0 
     ? ((diferenciaVentas / totalVentasAyer) * 100).toFixed(1)
     : totalVentasHoy > 0 ? 100 : 0;
 
-  const comprasHoy = comprasHoyData?.data?.results || [];
-  const totalComprasHoy = comprasHoy.reduce((sum, c) => sum + parseFloat(c.total || 0), 0);
-  const cantidadComprasHoy = comprasHoy.length;
+  const totalComprasHoy = resumen?.compras_hoy?.total || 0;
+  const cantidadComprasHoy = resumen?.compras_hoy?.cantidad || 0;
 
-  const cantidadProductosBajoStock = productos?.data?.length || 0;
-  const cantidadAlertas = alertas?.data?.length || 0;
-  const totalQuiebresSemana = quiebres?.data?.total_quiebres || 0;
-  const totalProductosActivos = productosActivos?.data?.count || productosActivos?.data?.results?.length || 0;
+  const productosBajoStock = resumen?.bajo_stock?.productos || [];
+  const cantidadProductosBajoStock = resumen?.bajo_stock?.cantidad || 0;
+  const cantidadAlertas = resumen?.alertas?.no_leidas || 0;
+  const quiebresSemana = resumen?.quiebres_semana?.quiebres || [];
+  const totalQuiebresSemana = resumen?.quiebres_semana?.total || 0;
+  const totalProductosActivos = resumen?.productos_activos?.cantidad || 0;
   
-  // Calcular rotación promedio
-  const productosConRotacion = rotacion?.data?.productos || [];
-  const rotacionPromedio = productosConRotacion.length > 0
-    ? productosConRotacion.reduce((sum, p) => sum + (p.rotacion || 0), 0) / productosConRotacion.length
-    : 0;
+  // Rotación promedio (calculada en el backend)
+  const productosConRotacion = resumen?.rotacion?.productos || 0;
+  const rotacionPromedio = resumen?.rotacion?.promedio || 0;
 
   // Top productos vendidos hoy
-  const topProductosHoy = ventasHoy?.data?.detalle_productos?.slice(0, 5) || [];
+  const topProductosHoy = resumen?.ventas_hoy?.top_productos || [];
 
   return (
     <Box>
@@ -428,9 +334,9 @@ function Dashboard() {
                       ? 'Buena rotación' 
                       : 'Rotación baja - Revisar inventario'}
                   </Typography>
-                  {productosConRotacion.length > 0 && (
+                  {productosConRotacion > 0 && (
                     <Typography variant="caption" color="text.secondary" sx={{ display: 'block' }}>
-                      Basado en {productosConRotacion.length} productos activos
+                      Basado en {productosConRotacion} productos activos
                     </Typography>
                   )}
                 </Box>
@@ -464,12 +370,12 @@ function Dashboard() {
                       <Typography variant="body2" color="text.secondary" sx={{ mb: 2 }}>
                         Productos con stock agotado
                       </Typography>
-                      {quiebres?.data?.quiebres?.length > 0 && (
+                      {quiebresSemana.length > 0 && (
                         <Box>
                           <Typography variant="subtitle2" fontWeight="bold" sx={{ mb: 1 }}>
                             Más afectados:
                           </Typography>
-                          {quiebres.data.quiebres.slice(0, 2).map((q, idx) => (
+                          {quiebresSemana.slice(0, 2).map((q, idx) => (
                             <Typography key={idx} variant="body2" color="text.secondary" sx={{ mb: 0.5 }}>
                               • {q.producto__nombre} ({q.cantidad_quiebres}x)
                             </Typography>
@@ -561,7 +467,7 @@ function Dashboard() {
                     />
                   )}
                 </Box>
-                {productos?.data?.length > 0 && (
+                {cantidadProductosBajoStock > 0 && (
                   <Button
                     size="small"
                     endIcon={<ArrowForwardIcon />}
@@ -578,10 +484,10 @@ function Dashboard() {
                 </Box>
               ) : (
                 <Box>
-                  {productos?.data?.length > 0 ? (
+                  {productosBajoStock.length > 0 ? (
                     <>
-                      {productos.data.slice(0, 5).map((producto, index) => {
-                        const tieneAlerta = alertas?.data?.some(a => a.producto_codigo === producto.codigo);
+                      {productosBajoStock.map((producto, index) => {
+                        const tieneAlerta = producto.alerta_no_leida;
                         const porcentajeStock = (producto.stock_actual / producto.stock_minimo) * 100;
                         return (
                           <Box key={producto.id}>
@@ -650,13 +556,13 @@ function Dashboard() {
                           </Box>
                         );
                       })}
-                      {productos.data.length > 5 && (
+                      {cantidadProductosBajoStock > 5 && (
                         <Box sx={{ textAlign: 'center', mt: 2 }}>
                           <Button
                             size="small"
                             onClick={() => navigate('/productos')}
                           >
-                            Ver {productos.data.length - 5} más
+                            Ver {cantidadProductosBajoStock - 5} más
                           </Button>
                         </Box>
                       )}
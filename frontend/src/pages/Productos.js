@@ -298,6 +298,7 @@ function Productos() {
         queryClient.invalidateQueries('productos');
         queryClient.invalidateQueries('productos-bajo-stock');
         queryClient.invalidateQueries('alertas-no-leidas');
+        queryClient.invalidateQueries('dashboard');
         setSnackbar({ 
           open: true, 
           message: `Stock ajustado: ${response.data.stock_anterior} → ${response.data.stock_nuevo}`, 
@@ -7,6 +7,8 @@ export const alertasService = {
   contarNoLeidas: () => api.get('/usuarios/alertas/contar_no_leidas/'),
   marcarLeida: (id) => api.post(`/usuarios/alertas/${id}/marcar_leida/`),
   marcarTodasLeidas: () => api.post('/usuarios/alertas/marcar_todas_leidas/'),
+  // Server-Sent Events: para EventSource, no para axios
+  eventosUrl: () => `${api.defaults.baseURL}/usuarios/alertas/eventos/`,
 };
 
 
@@ -79,7 +79,9 @@ export const productosService = {
       cantidad,
       motivo: motivo || 'Ajuste manual',
     }),
-  bajoStock: () => api.get('/inventario/productos/bajo_stock/'),
+  // Sincronización incremental: guardar response.data.version y enviarla como desde
+  cambios: (desde = 0) => api.get('/inventario/productos/cambios/', { params: { desde } }),
+  bajoStock: () => api.get('/inventario/productos/bajo_stock/', { params: { compacto: true } }),
   exportarCSV: (params = {}) => 
     api.get('/inventario/productos/exportar_csv/', { 
       params,
@@ -1,6 +1,8 @@
 import api from './api';
 
 export const reportesService = {
+  dashboard: () => api.get('/reportes/dashboard/'),
+
   ventasDiarias: (fecha, formato = 'json') => {
     const params = formato === 'csv' ? { fecha, formato: 'csv' } : { fecha };
     if (formato === 'csv') {
@@ -100,6 +102,61 @@ export const reportesService = {
     return api.get('/reportes/reporte_productos/', { params });
   },
   
+  mapaCalorVentas: (fechaDesde, fechaHasta, formato = 'json') => {
+    const params = { fecha_desde: fechaDesde, fecha_hasta: fechaHasta };
+    if (formato === 'excel') {
+      return api.get('/reportes/mapa_calor_ventas/', {
+        params: { ...params, formato },
+        responseType: 'blob'
+      });
+    }
+    return api.get('/reportes/mapa_calor_ventas/', { params });
+  },
+
+  abcProductos: (criterio = 'ingresos', dias = 90, formato = 'json') => {
+    const params = { criterio, dias };
+    if (formato === 'excel') {
+      return api.get('/reportes/abc_productos/', {
+        params: { ...params, formato },
+        responseType: 'blob'
+      });
+    }
+    return api.get('/reportes/abc_productos/', { params });
+  },
+
+  pronosticoDemanda: (params = {}, formato = 'json') => {
+    if (formato === 'excel') {
+      return api.get('/reportes/pronostico_demanda/', {
+        params: { ...params, formato },
+        responseType: 'blob'
+      });
+    }
+    return api.get('/reportes/pronostico_demanda/', { params });
+  },
+
+  quiebresStock: (fechaDesde, fechaHasta, formato = 'json') => {
+    const params = { fecha_desde: fechaDesde, fecha_hasta: fechaHasta };
+    if (formato === 'excel') {
+      return api.get('/reportes/quiebres_stock/', {
+        params: { ...params, formato },
+        responseType: 'blob'
+      });
+    }
+    return api.get('/reportes/quiebres_stock/', { params });
+  },
+
+  // granularidad: 'dia' | 'semana' | 'mes'; agrupar: 'producto' | 'categoria' | 'usuario'
+  ventasSerie: ({ desde, hasta, granularidad = 'dia', agrupar, limite } = {}, formato = 'json') => {
+    const params = { desde, hasta, granularidad, agrupar, limite };
+    if (formato === 'csv') {
+      return api.get('/reportes/ventas/serie/', {
+        params: { ...params, formato },
+        responseType: 'blob'
+      });
+    }
+    return api.get('/reportes/ventas/serie/', { params });
+  },
+
   descargarCSV: (blob, nombreArchivo) => {
     const url = window.URL.createObjectURL(blob);
     const link = document.createElement('a');